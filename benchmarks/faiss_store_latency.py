@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : faiss_store_latency.py
+@Desc    : Query latency of the FAISS index types used by `FaissStore`, on corpora embedded with the deterministic
+        `LocalEmbedding`, so results are reproducible and need no network.
+
+    python benchmarks/faiss_store_latency.py --sizes=10000,100000,1000000 --queries=200
+"""
+import random
+import time
+
+import fire
+import numpy as np
+
+from metagpt.document_store.faiss_store import build_index, choose_index_type
+from metagpt.utils.embedding import LocalEmbedding
+
+VOCABULARY_SIZE = 5000
+WORDS_PER_TEXT = 12
+
+
+def make_texts(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(VOCABULARY_SIZE)]
+    return [" ".join(rng.choices(vocabulary, k=WORDS_PER_TEXT)) for _ in range(n)]
+
+
+def embed(embedding: LocalEmbedding, texts: list[str]) -> np.ndarray:
+    return np.array(embedding.embed_documents(texts), dtype=np.float32)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def main(sizes="10000,100000,1000000", queries: int = 200, k: int = 5, dim: int = 256, index_types="flat,hnsw,ivf"):
+    sizes = [int(i) for i in str(sizes).split(",")] if isinstance(sizes, str) else list(sizes)
+    index_types = index_types.split(",") if isinstance(index_types, str) else list(index_types)
+    embedding = LocalEmbedding(dim=dim)
+    query_vectors = embed(embedding, make_texts(queries, seed=1))
+
+    print(f"{'size':>9} {'index':>6} {'auto':>5} {'build s':>9} {'p50 ms':>8} {'p99 ms':>8} {'recall@k':>9}")
+    for size in sizes:
+        vectors = embed(embedding, make_texts(size, seed=0))
+        labels = np.arange(size, dtype=np.int64)
+        truth = None
+        for index_type in index_types:
+            start = time.perf_counter()
+            index = build_index(vectors, index_type)
+            index.add_with_ids(vectors, labels)
+            build_seconds = time.perf_counter() - start
+
+            latencies = []
+            found = []
+            for query in query_vectors:
+                start = time.perf_counter()
+                _, ids = index.search(query.reshape(1, -1), k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(ids[0])
+            found = np.array(found)
+            if truth is None and index_type == "flat":
+                truth = found
+            recall = f"{recall_at_k(truth, found):.3f}" if truth is not None else "-"
+            auto = "*" if choose_index_type(size) == index_type else ""
+            print(
+                f"{size:>9} {index_type:>6} {auto:>5} {build_seconds:>9.2f} "
+                f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} {recall:>9}"
+            )
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
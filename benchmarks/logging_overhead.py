@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : logging_overhead.py
+@Desc    : Overhead of logging on the event loop under many concurrent streaming roles. Each role streams `chunks`
+        chunks through `log_llm_stream`, one every `interval_ms`, and logs records in between, in its own
+        `log_context`. The pipelines compared are:
+            none     nothing is logged, the baseline of the others
+            sync     loguru sinks written in the logging call and chunks printed to stdout, as before
+            enqueue  loguru sinks written by the queue of loguru (`enqueue=True`), chunks by `StreamMultiplexer`
+            queued   loguru sinks written by `QueuedStream`, JSON log file, chunks by `StreamMultiplexer`
+            sampled  queued, with the streams of 10% of the roles shown
+            off      queued, with the streams dropped
+        stdout and the console sink are redirected to line-buffered temporary files, which are written on each line
+        like a terminal, without adding the latency of one.
+        The CPU time of the event loop thread, and its overhead per chunk over the baseline, are reported.
+
+    python benchmarks/logging_overhead.py --n_roles=100 --chunks=200
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import fire
+
+from metagpt.logs import (
+    QueuedStream,
+    StreamMultiplexer,
+    _json_format,
+    _patch_record,
+    log_context,
+    log_llm_stream,
+    logger,
+    set_llm_stream_logfunc,
+)
+
+PIPELINES = ["none", "sync", "enqueue", "queued", "sampled", "off"]
+
+
+def configure(pipeline: str, directory: Path, stdout) -> StreamMultiplexer:
+    """Set up the sinks and the stream function of `pipeline`, return the multiplexer it streams to."""
+    logger.remove()
+    logger.configure(patcher=_patch_record)
+    multiplexer = StreamMultiplexer(mode="off")
+    if pipeline == "none":
+        set_llm_stream_logfunc(lambda msg: None)
+        return multiplexer
+    if pipeline == "sync":
+        logger.add(stdout, level="INFO")
+        logger.add(directory / f"{pipeline}.txt", level="DEBUG")
+        set_llm_stream_logfunc(partial(print, end=""))
+        return multiplexer
+    if pipeline == "enqueue":
+        logger.add(stdout, level="INFO", enqueue=True)
+        logger.add(directory / f"{pipeline}.jsonl", level="DEBUG", enqueue=True, format=_json_format)
+    else:
+        logger.add(QueuedStream(stdout), level="INFO")
+        logger.add(QueuedStream(path=directory / f"{pipeline}.jsonl"), level="DEBUG", format=_json_format)
+    multiplexer.mode = "off" if pipeline == "off" else "lines"
+    multiplexer.sample_rate = 0.1 if pipeline == "sampled" else 1.0
+    set_llm_stream_logfunc(multiplexer.write)
+    return multiplexer
+
+
+async def stream_role(index: int, chunks: int, interval: float, log_every: int):
+    with log_context(role=f"Role{index}", action="WriteCode"):
+        logger.info(f"Role{index} starts streaming")
+        for i in range(chunks):
+            log_llm_stream(f"token{i} " if i % 12 else f"token{i}\n")
+            if i % log_every == 0:
+                logger.debug(f"Role{index} received {i} chunks")
+            await asyncio.sleep(interval)
+        log_llm_stream("\n")
+        logger.info(f"Role{index} finished streaming")
+
+
+async def run_roles(n_roles: int, chunks: int, interval: float, log_every: int):
+    await asyncio.gather(*[stream_role(i, chunks, interval, log_every) for i in range(n_roles)])
+
+
+def measure(pipeline: str, n_roles: int, chunks: int, interval_ms: float, log_every: int, directory: Path) -> dict:
+    for path in directory.glob(f"{pipeline}.*"):
+        path.unlink()
+    stdout_path = directory / f"{pipeline}.out"
+    with open(stdout_path, "w", encoding="utf-8", buffering=1) as stdout:
+        sys.stdout, original = stdout, sys.stdout
+        try:
+            multiplexer = configure(pipeline, directory, stdout)
+            cpu, wall = time.thread_time(), time.perf_counter()
+            asyncio.run(run_roles(n_roles, chunks, interval_ms / 1000, log_every))
+            cpu, wall = time.thread_time() - cpu, time.perf_counter() - wall
+            drain = time.perf_counter()
+            multiplexer.drain()
+            logger.complete()
+            logger.remove()  # which drains the queued streams
+            drain = time.perf_counter() - drain
+        finally:
+            sys.stdout = original
+    written = sum(i.stat().st_size for i in directory.glob(f"{pipeline}.*"))
+    return {"wall": wall, "loop_cpu": cpu, "drain": drain, "written_kb": written / 1024}
+
+
+def main(n_roles: int = 100, chunks: int = 200, interval_ms: float = 1.0, log_every: int = 20, repeat: int = 3):
+    """
+    :param n_roles: Roles streaming concurrently.
+    :param chunks: Chunks streamed by each role.
+    :param interval_ms: Simulated time between two chunks of a role.
+    :param log_every: A record is logged every this many chunks.
+    :param repeat: Runs of each pipeline, the fastest is reported.
+    """
+    total_chunks = n_roles * chunks
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for pipeline in PIPELINES:
+            runs = [measure(pipeline, n_roles, chunks, interval_ms, log_every, Path(directory)) for _ in range(repeat)]
+            results[pipeline] = min(runs, key=lambda i: i["loop_cpu"])
+    set_llm_stream_logfunc(partial(print, end=""))
+
+    baseline = results["none"]["loop_cpu"]
+    print(f"{n_roles} roles x {chunks} chunks, {interval_ms} ms apart, a record every {log_every} chunks\n")
+    print(f"{'pipeline':<10}{'wall(s)':>10}{'loop cpu(s)':>13}{'us/chunk':>10}{'drain(s)':>10}{'written(KB)':>13}")
+    for pipeline, result in results.items():
+        overhead = (result["loop_cpu"] - baseline) / total_chunks * 1e6
+        print(
+            f"{pipeline:<10}{result['wall']:>10.3f}{result['loop_cpu']:>13.3f}{overhead:>10.2f}"
+            f"{result['drain']:>10.3f}{result['written_kb']:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : sd_engine_throughput.py
+@Desc    : Throughput of `SDEngine.run_t2i` against a local fake Stable Diffusion server, which renders `capacity`
+        requests at a time in `render_ms` each and answers with real PNG images, so no GPU is needed.
+
+    python benchmarks/sd_engine_throughput.py --prompts=32 --capacity=4 --concurrency=1,2,4,8
+"""
+import asyncio
+import base64
+import io
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+import fire
+from aiohttp import web
+from PIL import Image
+
+from metagpt.config import CONFIG
+from metagpt.tools.sd_engine import SDEngine
+
+T2I_API = "/sdapi/v1/txt2img"
+
+
+def make_image(width: int, height: int) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color=(80, 120, 160)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def create_fake_sd_app(capacity: int = 1, render_ms: int = 200) -> web.Application:
+    """An aiohttp app serving the txt2img API of stable-diffusion-webui, `capacity` renders at a time."""
+    gpu = asyncio.Semaphore(capacity)
+    images = {}
+
+    async def txt2img(request: web.Request) -> web.Response:
+        payload = await request.json()
+        size = (payload.get("width", 512), payload.get("height", 512))
+        async with gpu:
+            await asyncio.sleep(render_ms / 1000)
+        if size not in images:
+            images[size] = make_image(*size)
+        return web.json_response({"images": [images[size]] * payload.get("batch_size", 1), "parameters": payload})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post(T2I_API, txt2img)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(prompts: int, capacity: int, render_ms: int, concurrency: list[int], size: int):
+    runner = web.AppRunner(create_fake_sd_app(capacity, render_ms))
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    CONFIG.SD_URL = f"http://127.0.0.1:{port}"
+    CONFIG.SD_T2I_API = T2I_API
+
+    print(f"{'concurrency':>11} {'seconds':>8} {'images/s':>9}")
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            CONFIG.workspace_path = Path(workspace)
+            for max_concurrency in concurrency:
+                async with SDEngine(max_concurrency=max_concurrency) as engine:
+                    payloads = [
+                        engine.construct_payload(f"prompt {i}", width=size, height=size) for i in range(prompts)
+                    ]
+                    start = time.perf_counter()
+                    await engine.run_t2i(payloads)
+                    seconds = time.perf_counter() - start
+                print(f"{max_concurrency:>11} {seconds:>8.2f} {prompts / seconds:>9.2f}")
+    finally:
+        await runner.cleanup()
+
+
+def main(prompts: int = 32, capacity: int = 4, render_ms: int = 200, concurrency="1,2,4,8", size: int = 512):
+    concurrency = [int(i) for i in str(concurrency).split(",")] if isinstance(concurrency, str) else list(concurrency)
+    asyncio.run(run(prompts, capacity, render_ms, concurrency, size))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : software_company_sop.py
+@Desc    : Overhead of the framework on the whole software company SOP, apart from the LLM: the team of `metagpt`
+        runs end to end on `MockLLM`, which answers every action with scripted, schema-valid content after a
+        simulated latency. Wall-clock, CPU time, memory and file I/O are reported for each phase, a round of the team
+        named after the actions run in it. Save a run with `--save` and compare the next ones to it with `--baseline`,
+        which exits with 1 when the CPU time of a phase grew by more than `--tolerance`.
+
+    python benchmarks/software_company_sop.py --latency_ms=0 --code_lines=200 --save=baseline.json
+    python benchmarks/software_company_sop.py --latency_ms=0 --code_lines=200 --baseline=baseline.json
+"""
+import asyncio
+import hashlib
+import json
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import fire
+
+from metagpt.config import CONFIG, LLMProviderEnum
+from metagpt.logs import logger, set_llm_stream_logfunc
+from metagpt.provider.mock_llm_api import MockLLM, echo_format_example
+from metagpt.roles import Architect, Engineer, ProductManager, ProjectManager
+from metagpt.team import Team
+from metagpt.utils.common import any_to_str, any_to_str_set
+
+IDEA = "Create a 2048 game"
+PROJECT_NAME = "game_2048"
+PROC_IO = Path("/proc/self/io")
+PROC_STATM = Path("/proc/self/statm")
+
+
+def generate_code(filename: str, lines: int) -> str:
+    """A valid python module of about `lines` lines, the same for the same file."""
+    seed = int(hashlib.md5(filename.encode("utf-8")).hexdigest()[:8], 16)
+    body = [f'"""{filename}"""', "from dataclasses import dataclass", ""]
+    index = 0
+    while len(body) < lines:
+        body += [
+            "",
+            f"def step_{index}(value: int = {seed % 97}) -> int:",
+            f'    """Step {index} of {filename}."""',
+            f"    return value * {index + 1} + {seed % (index + 7)}",
+        ]
+        index += 1
+    return "\n".join(body) + "\n"
+
+
+class SOPResponder:
+    """Scripted answers of the actions of the SOP. ActionNode prompts get their own format example, which is valid
+    for their schema, with the project name, language and files of a python project of `n_files` files; the others
+    get the answer they parse: code, reviews, summaries and checks."""
+
+    def __init__(self, code_lines: int = 100, n_files: int = 5, rewrite_rate: float = 0.0):
+        self.code_lines = code_lines
+        self.rewrite_rate = rewrite_rate
+        files = [f"module_{i}.py" for i in range(1, n_files)] + ["main.py"]
+        self.node_values = {
+            "Project Name": PROJECT_NAME,
+            "Project name": PROJECT_NAME,
+            "Programming Language": "Python",
+            "File list": files,
+            "Task list": files,
+            "Logic Analysis": [[i, f"Implements the steps of {i}"] for i in files],
+            "Required Python packages": [],
+            "Required C++/header packages": [],
+        }
+
+    def __call__(self, messages: list[dict]) -> str:
+        prompt = messages[-1]["content"]
+        if "[CONTENT]" in prompt:
+            return self._node(echo_format_example(messages))
+        if "# Instruction: rewrite code based on the Code Review" in prompt:
+            filename = re.findall(r"// (\S+)", prompt)[-1]
+            return self._code(filename)
+        if "## Code Review Result" in prompt:
+            return self._review(re.search(r"## Code to be Reviewed: (\S+)", prompt).group(1))
+        if "Write code with triple quoto" in prompt:
+            return self._code(re.search(r"Code: (\S+)\. Write code with triple quoto", prompt).group(1))
+        if "Code Review All" in prompt:
+            return "## Code Review All\nNo issues.\n\n## Summary\nAll files are implemented.\n\n## TODOs\n{}\n"
+        if "Does the above log indicate anything that needs to be done?" in prompt:
+            return '{"status": "YES"}\nYES'
+        if "Just answer a number" in prompt:
+            return "0"
+        return ""
+
+    def _node(self, example: str) -> str:
+        content = json.loads(example.removeprefix("[CONTENT]").removesuffix("[/CONTENT]"))
+        content.update({k: v for k, v in self.node_values.items() if k in content})
+        return f"[CONTENT]\n{json.dumps(content)}\n[/CONTENT]"
+
+    def _code(self, filename: str) -> str:
+        return f"## Code: {filename}\n```python\n{generate_code(filename, self.code_lines)}```\n"
+
+    def _review(self, filename: str) -> str:
+        draw = int(hashlib.md5(filename.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        result = "LBTM" if draw < self.rewrite_rate else "LGTM"
+        return f"## Code Review: {filename}\n1. Yes.\n\n## Actions\npass\n\n## Code Review Result\n{result}\n"
+
+
+def read_io() -> dict:
+    """Bytes and calls of reads and writes of the process, from blocks read and written without procfs."""
+    if PROC_IO.exists():
+        counters = dict(line.split(": ") for line in PROC_IO.read_text().splitlines())
+        return {
+            "read_kb": int(counters["rchar"]) / 1024,
+            "write_kb": int(counters["wchar"]) / 1024,
+            "io_calls": int(counters["syscr"]) + int(counters["syscw"]),
+        }
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {"read_kb": usage.ru_inblock * 0.5, "write_kb": usage.ru_oublock * 0.5, "io_calls": 0}
+
+
+def read_rss_mb() -> float:
+    if PROC_STATM.exists():
+        return int(PROC_STATM.read_text().split()[1]) * resource.getpagesize() / 2**20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+class Meter:
+    """Resources used between `start` and `stop`."""
+
+    def start(self):
+        self.io = read_io()
+        self.rss = read_rss_mb()
+        self.calls = MockLLM.calls
+        self.llm_seconds = MockLLM.simulated_seconds
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+
+    def stop(self) -> dict:
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        io = read_io()
+        result = {
+            "wall": wall,
+            "cpu": cpu,
+            "llm_calls": MockLLM.calls - self.calls,
+            "llm_wait": MockLLM.simulated_seconds - self.llm_seconds,
+            "rss_mb": read_rss_mb() - self.rss,
+            **{k: v - self.io[k] for k, v in io.items()},
+        }
+        if tracemalloc.is_tracing():
+            result["alloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        return result
+
+
+def memory_sizes(team: Team) -> dict:
+    return {name: len(role.rc.memory.get()) for name, role in team.env.get_roles().items()}
+
+
+def actions_since(team: Team, sizes: dict) -> list[str]:
+    """The role and action of the messages the roles put in their memories since `sizes` were taken."""
+    names = []
+    for name, role in team.env.get_roles().items():
+        own = any_to_str_set(role.actions)
+        for msg in role.rc.memory.get()[sizes[name] :]:
+            item = f"{role.profile}:{msg.cause_by.split('.')[-1]}"
+            if (msg.cause_by in own or msg.sent_from == any_to_str(role)) and item not in names:
+                names.append(item)
+    return names
+
+
+async def run_sop(n_round: int, code_review: bool, n_borg: int) -> list[tuple[str, dict]]:
+    team = Team()
+    team.hire([ProductManager(), Architect(), ProjectManager(), Engineer(n_borg=n_borg, use_code_review=code_review)])
+    team.invest(3.0)
+    team.run_project(IDEA)
+
+    phases = []
+    meter = Meter()
+    for _ in range(n_round):
+        sizes = memory_sizes(team)
+        meter.start()
+        await team.env.run()
+        metrics = meter.stop()
+        names = actions_since(team, sizes)
+        if names or metrics["llm_calls"]:  # skip the idle rounds
+            phases.append((" + ".join(names) or "other", metrics))
+    meter.start()
+    team.env.archive(True)
+    phases.append(("archive", meter.stop()))
+    return phases
+
+
+def report(phases: list[tuple[str, dict]], totals: dict):
+    columns = ["wall", "cpu", "llm_wait", "llm_calls", "rss_mb", "read_kb", "write_kb", "io_calls"]
+    if "alloc_peak_mb" in totals:
+        columns.append("alloc_peak_mb")
+    print(f"{'phase':<48}" + "".join(f"{i:>14}" for i in columns))
+    for name, metrics in phases + [("total", totals)]:
+        cells = "".join(
+            f"{metrics[i]:>14d}" if isinstance(metrics[i], int) else f"{metrics[i]:>14.3f}" for i in columns
+        )
+        print(f"{name[:47]:<48}{cells}")
+
+
+def cpu_by_phase(result: dict) -> dict:
+    """CPU time of each phase name, summed over its rounds, and of the whole run."""
+    cpu = {"total": result["total"]["cpu"]}
+    for name, metrics in result["phases"]:
+        cpu[name] = cpu.get(name, 0) + metrics["cpu"]
+    return cpu
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """The phases whose CPU time grew by more than `tolerance` from the baseline."""
+    regressions = []
+    current = cpu_by_phase(result)
+    for name, before in cpu_by_phase(baseline).items():
+        if name not in current or before < 0.05:
+            continue  # too short to compare
+        growth = current[name] / before - 1
+        if growth > tolerance:
+            regressions.append(f"{name}: cpu {before:.3f}s -> {current[name]:.3f}s (+{growth:.0%})")
+    return regressions
+
+
+def main(
+    latency_ms: float = 0,
+    ms_per_token: float = 0,
+    code_lines: int = 100,
+    n_files: int = 5,
+    rewrite_rate: float = 0.0,
+    n_round: int = 10,
+    code_review: bool = True,
+    n_borg: int = 5,
+    trace_malloc: bool = False,
+    save: str = "",
+    baseline: str = "",
+    tolerance: float = 0.2,
+):
+    """
+    :param latency_ms: Simulated latency of each LLM call.
+    :param ms_per_token: Simulated generation time of each completion token.
+    :param code_lines: Lines of each code file written by the mock.
+    :param n_files: Files of the project designed by the mock.
+    :param rewrite_rate: Share of the files the mock reviews as LBTM, so that they are rewritten.
+    :param trace_malloc: Also report the peak of python allocations of each phase, at the cost of a slower run.
+    :param save: Save the results in this JSON file.
+    :param baseline: Compare the CPU time of each phase to the results saved in this JSON file.
+    :param tolerance: The growth of CPU time over the baseline reported as a regression.
+    """
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    set_llm_stream_logfunc(lambda msg: None)
+    CONFIG.DEFAULT_PROVIDER = LLMProviderEnum.MOCK.value
+    CONFIG.mmdc = "mmdc-disabled"  # do not render charts, which is done by an external process
+    MockLLM.configure(
+        responder=SOPResponder(code_lines=code_lines, n_files=n_files, rewrite_rate=rewrite_rate),
+        latency_ms=latency_ms,
+        ms_per_token=ms_per_token,
+    )
+    if trace_malloc:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        CONFIG.workspace_path = Path(workspace)
+        meter = Meter()
+        meter.start()
+        phases = asyncio.run(run_sop(n_round=n_round, code_review=code_review, n_borg=n_borg))
+        totals = meter.stop()
+        if trace_malloc:  # the meter of the total is reset by the phases
+            totals["alloc_peak_mb"] = max(i["alloc_peak_mb"] for _, i in phases)
+        src_files = list(Path(workspace).rglob("*.py"))
+
+    report(phases, totals)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    print(f"\n{len(src_files)} python files written, max RSS {max_rss:.1f} MB")
+    result = {"phases": phases, "total": totals}
+    if save:
+        Path(save).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if baseline:
+        regressions = compare(result, json.loads(Path(baseline).read_text(encoding="utf-8")), tolerance)
+        for i in regressions:
+            print(f"REGRESSION {i}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
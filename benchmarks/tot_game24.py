@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : tot_game24.py
+@Desc    : LLM calls, wall-clock and success rate of the BFS/DFS/MCTS tree-of-thought solvers on the Game of 24,
+        answered by a deterministic mock llm: it proposes arithmetic steps in a seeded order and values states with
+        an exact solver, misjudging a seeded share of them, so runs are reproducible and need no network. Like a real
+        model, it tends to propose the steps that keep the game solvable first, but not always.
+
+    python benchmarks/tot_game24.py --latency_ms=50 --error_rate=0.1
+"""
+import asyncio
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import random
+import re
+import sys
+import time
+from fractions import Fraction
+from functools import lru_cache
+
+import fire
+
+from metagpt.logs import logger
+from metagpt.provider.base_llm import BaseLLM
+from metagpt.strategy.base import BaseEvaluator, BaseParser
+from metagpt.strategy.tot import BFSSolver, DFSSolver, MCTSSolver
+from metagpt.strategy.tot_schema import Strategy, ThoughtSolverConfig
+
+GAMES = [
+    "4 5 6 10",
+    "1 2 4 7",
+    "2 3 5 12",
+    "3 3 8 8",
+    "1 1 4 6",
+    "2 2 6 6",
+    "1 5 5 5",
+    "4 4 10 10",
+    "2 5 8 11",
+    "1 3 4 6",
+]
+VALUES = {"sure": 20, "likely": 1, "impossible": 0.001}
+SOLVERS = {Strategy.BFS: BFSSolver, Strategy.DFS: DFSSolver, Strategy.MCTS: MCTSSolver}
+
+
+def fmt(number: Fraction) -> str:
+    return str(number.numerator) if number.denominator == 1 else f"{number.numerator}/{number.denominator}"
+
+
+def parse_numbers(text: str) -> list[Fraction]:
+    return [Fraction(i) for i in re.findall(r"-?\d+(?:/\d+)?", text)]
+
+
+@lru_cache(maxsize=None)
+def solvable(numbers: tuple[Fraction, ...]) -> bool:
+    if len(numbers) == 1:
+        return numbers[0] == 24
+    return any(solvable(rest + (result,)) for _, result, rest in next_steps(numbers))
+
+
+def next_steps(numbers: tuple[Fraction, ...]):
+    for i, j in itertools.permutations(range(len(numbers)), 2):
+        a, b = numbers[i], numbers[j]
+        rest = tuple(n for k, n in enumerate(numbers) if k not in (i, j))
+        candidates = [("+", a + b), ("-", a - b), ("*", a * b)] if i < j else [("-", a - b)]
+        if b != 0:
+            candidates.append(("/", a / b))
+        for op, result in candidates:
+            yield f"{fmt(a)} {op} {fmt(b)} = {fmt(result)}", result, rest
+
+
+def seeded(text: str) -> random.Random:
+    return random.Random(int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16))
+
+
+class Game24Parser(BaseParser):
+    def __call__(self, input_text: str) -> str:
+        match = re.search(r"\(left: (.*)\)", input_text)
+        return match.group(1) if match else input_text
+
+    def propose(self, current_state: str, **kwargs) -> str:
+        return f"Propose {kwargs.get('n_generate_sample', 5)} next steps.\nInput: {current_state}"
+
+    def value(self, input: str = "", **kwargs) -> str:
+        return f"Evaluate if the numbers can reach 24 (sure/likely/impossible).\nNumbers: {self(input)}"
+
+
+class Game24Evaluator(BaseEvaluator):
+    def __call__(self, evaluation: str, **kwargs) -> float:
+        return VALUES.get(evaluation.strip().split()[-1].lower(), VALUES["impossible"])
+
+    def status_verify(self, value: float) -> bool:
+        return value > VALUES["impossible"]
+
+
+class MockGame24LLM(BaseLLM):
+    def __init__(self, latency_ms: int = 50, error_rate: float = 0.1, insight: float = 0.3):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.insight = insight  # chance that a step keeping the game solvable is proposed first
+        self.calls = 0
+
+    async def acompletion(self, messages: list[dict], timeout=3) -> dict:
+        text = await self.acompletion_text(messages, timeout=timeout)
+        return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+
+    async def acompletion_text(self, messages: list[dict], stream=False, timeout=3) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Propose"):
+            return self._propose(prompt)
+        return self._value(prompt)
+
+    def _propose(self, prompt: str) -> str:
+        n_sample = int(re.search(r"Propose (\d+)", prompt).group(1))
+        numbers = tuple(parse_numbers(prompt.split("Input:")[1]))
+        rng = seeded(prompt)
+        steps = list(next_steps(numbers))
+        rng.shuffle(steps)
+        steps.sort(key=lambda x: not (solvable(x[2] + (x[1],)) and rng.random() < self.insight))
+        nodes = [
+            {"node_id": str(i), "node_state_instruction": f"{step} (left: {' '.join(fmt(n) for n in rest + (r,))})"}
+            for i, (step, r, rest) in enumerate(steps[:n_sample])
+        ]
+        return f"```json\n{json.dumps(nodes)}\n```"
+
+    def _value(self, prompt: str) -> str:
+        numbers = tuple(parse_numbers(prompt.split("Numbers:")[1]))
+        if len(numbers) == 1:
+            return "sure" if numbers[0] == 24 else "impossible"
+        answer = "sure" if solvable(numbers) else "impossible"
+        if seeded(prompt).random() < self.error_rate:
+            answer = "likely"  # an unsure judgement, right or wrong
+        return answer
+
+
+def is_solution(path: list[str]) -> bool:
+    return len(path) == 4 and path[-1].endswith("(left: 24)")
+
+
+async def run(strategy: Strategy, game: str, config: ThoughtSolverConfig, latency_ms: int, error_rate: float):
+    llm = MockGame24LLM(latency_ms=latency_ms, error_rate=error_rate)
+    solver = SOLVERS[strategy](config=config, llm=llm)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = await solver.solve(init_prompt=game)
+    return is_solution(path), llm.calls, time.perf_counter() - start
+
+
+async def benchmark(latency_ms: int, error_rate: float, n_generate_sample: int, n_simulations: int):
+    common = dict(max_steps=3, n_generate_sample=n_generate_sample, parser=Game24Parser(), evaluator=Game24Evaluator())
+    configs = {
+        Strategy.BFS: ThoughtSolverConfig(n_select_sample=5, **common),
+        Strategy.DFS: ThoughtSolverConfig(n_solution_sample=1, value_threshold=VALUES["likely"], **common),
+        Strategy.MCTS: ThoughtSolverConfig(n_simulations=n_simulations, max_concurrency=4, **common),
+    }
+    print(f"{'solver':>6} {'solved':>7} {'llm calls':>10} {'seconds':>8}")
+    for strategy, config in configs.items():
+        results = [await run(strategy, game, config, latency_ms, error_rate) for game in GAMES]
+        solved = sum(r[0] for r in results)
+        calls = sum(r[1] for r in results) / len(results)
+        seconds = sum(r[2] for r in results) / len(results)
+        print(f"{strategy.value:>6} {solved:>3}/{len(GAMES):<3} {calls:>10.1f} {seconds:>8.2f}")
+
+
+def main(latency_ms: int = 50, error_rate: float = 0.1, n_generate_sample: int = 8, n_simulations: int = 24):
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    asyncio.run(benchmark(latency_ms, error_rate, n_generate_sample, n_simulations))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
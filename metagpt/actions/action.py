@@ -10,7 +10,7 @@ from __future__ import annotations
 
 from typing import Optional, Union
 
-from pydantic import ConfigDict, Field, model_validator
+from pydantic import ConfigDict, Field, PrivateAttr, model_validator
 
 from metagpt.actions.action_node import ActionNode
 from metagpt.llm import LLM
@@ -22,6 +22,18 @@ from metagpt.schema import (
     SerializationMixin,
     TestingContext,
 )
+from metagpt.utils.context_window import ContextWindow
+from metagpt.utils.cost_manager import scoped
+from metagpt.utils.tracing import traced
+
+
+def _action_name(action: "Action", *args, **kwargs) -> str:
+    return action.name or type(action).__name__
+
+
+def _instrument(run):
+    """Trace `run` and account its LLM calls to the action."""
+    return scoped(action=_action_name)(traced("action", name=_action_name)(run))
 
 
 class Action(SerializationMixin, is_polymorphic_base=True):
@@ -34,6 +46,13 @@ class Action(SerializationMixin, is_polymorphic_base=True):
     desc: str = ""  # for skill manager
     node: ActionNode = Field(default=None, exclude=True)
 
+    _context_window: ContextWindow = PrivateAttr(default_factory=ContextWindow.from_config)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "run" in cls.__dict__:  # instrument the `run` of every action, a `super().run` stays in the same span
+            cls.run = _instrument(cls.run)
+
     @model_validator(mode="before")
     def set_name_if_empty(cls, values):
         if "name" not in values or not values["name"]:
@@ -68,11 +87,14 @@ class Action(SerializationMixin, is_polymorphic_base=True):
 
     async def _run_action_node(self, *args, **kwargs):
         """Run action node"""
-        msgs = args[0]
+        msgs, summary = await self._context_window.build(args[0], self.llm)
         context = "## History Messages\n"
         context += "\n".join([f"{idx}: {i}" for idx, i in enumerate(reversed(msgs))])
+        if summary:
+            context += f"\n{len(msgs)}: Summary of the earlier messages: {summary}"
         return await self.node.fill(context=context, llm=self.llm)
 
+    @_instrument
     async def run(self, *args, **kwargs):
         """Run action"""
         if self.node:
@@ -19,6 +19,7 @@ from metagpt.llm import BaseLLM
 from metagpt.logs import logger
 from metagpt.provider.postprocess.llm_output_postprocess import llm_output_postprocess
 from metagpt.utils.common import OutputParser, general_after_log
+from metagpt.utils.tracing import add_event, traced
 
 TAG = "CONTENT"
 
@@ -267,15 +268,19 @@ class ActionNode:
         logger.debug(f"llm raw output:\n{content}")
         output_class = self.create_model_class(output_class_name, output_data_mapping)
 
-        if schema == "json":
-            parsed_data = llm_output_postprocess(
-                output=content, schema=output_class.model_json_schema(), req_key=f"[/{TAG}]"
-            )
-        else:  # using markdown parser
-            parsed_data = OutputParser.parse_data_with_mapping(content, output_data_mapping)
-
-        logger.debug(f"parsed_data:\n{parsed_data}")
-        instruct_content = output_class(**parsed_data)
+        try:
+            if schema == "json":
+                parsed_data = llm_output_postprocess(
+                    output=content, schema=output_class.model_json_schema(), req_key=f"[/{TAG}]"
+                )
+            else:  # using markdown parser
+                parsed_data = OutputParser.parse_data_with_mapping(content, output_data_mapping)
+
+            logger.debug(f"parsed_data:\n{parsed_data}")
+            instruct_content = output_class(**parsed_data)
+        except Exception as e:
+            add_event("parse_failure", output_class=output_class_name, error=f"{type(e).__name__}: {e}"[:500])
+            raise
         return content, instruct_content
 
     def get(self, key):
@@ -307,6 +312,7 @@ class ActionNode:
 
         return self
 
+    @traced("node", name=lambda self, *args, **kwargs: self.key)
     async def fill(self, context, llm, schema="json", mode="auto", strgy="simple", timeout=CONFIG.timeout, exclude=[]):
         """Fill the node(s) with mode.
 
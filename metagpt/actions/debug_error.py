@@ -9,6 +9,7 @@
         2. According to Section 2.2.3.1 of RFC 135, replace file data in the message with the file name.
 """
 import re
+from typing import Dict, List, Optional, Tuple
 
 from pydantic import Field
 
@@ -16,7 +17,7 @@ from metagpt.actions.action import Action
 from metagpt.config import CONFIG
 from metagpt.const import TEST_CODES_FILE_REPO, TEST_OUTPUTS_FILE_REPO
 from metagpt.logs import logger
-from metagpt.schema import RunCodeContext, RunCodeResult
+from metagpt.schema import Document, RunCodeContext, RunCodeResult
 from metagpt.utils.common import CodeParser
 from metagpt.utils.file_repository import FileRepository
 
@@ -46,36 +47,105 @@ Now you should start rewriting the code in C++:
 file name of the code to rewrite: Write code with triple quote. Do your best to implement THIS IN ONLY ONE FILE.
 """
 
+BATCH_PROMPT_TEMPLATE = """
+NOTICE
+1. Role: You are a Development Engineer or QA engineer;
+2. Task: You received this message from another Development Engineer or QA engineer who ran or tested your code.
+Several test files failed. Based on the message, first, figure out your own role, i.e. Engineer or QaEngineer,
+then rewrite the test code of each failed test in C++ based on your role, the error, and the summary, such that all bugs are fixed and the code performs well.
+Attention: Use '##' to split sections, not '#'. Answer one section per test file, titled '## <test file name>' and followed by the whole rewritten test code in triple quotes.
+The message is as follows:
+{failures}
+Now you should start rewriting the test code in C++, the test files to rewrite: {filenames}
+"""
+
+FAILURE_TEMPLATE = """
+# Test file: {test_filename}
+## Legacy Code
+```cpp
+{code}
+```
+---
+## Unit Test Code
+{test_code}
+---
+## Console logs
+```text
+{logs}
+```
+---
+"""
+
+
 class DebugError(Action):
     name: str = "DebugError"
     context: RunCodeContext = Field(default_factory=RunCodeContext)
 
     async def run(self, *args, **kwargs) -> str:
+        failure = await self._load_failure(self.context)
+        if not failure:
+            return ""
+        code_doc, test_doc, logs = failure
+        logger.info(f"Debug and rewrite {self.context.test_filename}")
+        prompt = PROMPT_TEMPLATE.format(code=code_doc.content, test_code=test_doc.content, logs=logs)
+
+        rsp = await self._aask(prompt)
+        code = CodeParser.parse_code(block="", text=rsp)
+
+        return code
+
+    async def run_batch(self, contexts: List[RunCodeContext]) -> Dict[str, str]:
+        """Debug the failed tests of `contexts` in one LLM call, return their rewritten code by test filename. A test
+        missing from the answer is debugged alone."""
+        failures = {}
+        for context in contexts:
+            failure = await self._load_failure(context)
+            if failure:
+                failures[context.test_filename] = (context, *failure)
+        if len(failures) <= 1:
+            return {i[0].test_filename: await DebugError(context=i[0], llm=self.llm).run() for i in failures.values()}
+
+        logger.info(f"Debug and rewrite {', '.join(failures)}")
+        prompt = BATCH_PROMPT_TEMPLATE.format(
+            failures="".join(
+                FAILURE_TEMPLATE.format(
+                    test_filename=name, code=code_doc.content, test_code=test_doc.content, logs=logs
+                )
+                for name, (_, code_doc, test_doc, logs) in failures.items()
+            ),
+            filenames=", ".join(failures),
+        )
+        rsp = await self._aask(prompt)
+        blocks = CodeParser.parse_blocks(rsp)
+        codes = {}
+        for name, (context, *_) in failures.items():
+            block = blocks.get(name, "")
+            match = re.search(r"```.*?\s+(.*?)```", block, re.DOTALL)
+            if match:
+                codes[name] = match.group(1)
+            else:
+                logger.warning(f"{name} is missing from the answer, debug it alone")
+                codes[name] = await DebugError(context=context, llm=self.llm).run()
+        return codes
+
+    @staticmethod
+    async def _load_failure(context: RunCodeContext) -> Optional[Tuple[Document, Document, str]]:
+        """The source, the test code and the logs of a failed test, None if it passed or its files are gone."""
         output_doc = await FileRepository.get_file(
-            filename=self.context.output_filename, relative_path=TEST_OUTPUTS_FILE_REPO
+            filename=context.output_filename, relative_path=TEST_OUTPUTS_FILE_REPO
         )
         if not output_doc:
-            return ""
+            return None
         output_detail = RunCodeResult.loads(output_doc.content)
         pattern = r"Ran (\d+) tests in ([\d.]+)s\n\nOK"
         matches = re.search(pattern, output_detail.stderr)
         if matches:
-            return ""
+            return None
 
-        logger.info(f"Debug and rewrite {self.context.test_filename}")
-        code_doc = await FileRepository.get_file(
-            filename=self.context.code_filename, relative_path=CONFIG.src_workspace
-        )
+        code_doc = await FileRepository.get_file(filename=context.code_filename, relative_path=CONFIG.src_workspace)
         if not code_doc:
-            return ""
-        test_doc = await FileRepository.get_file(
-            filename=self.context.test_filename, relative_path=TEST_CODES_FILE_REPO
-        )
+            return None
+        test_doc = await FileRepository.get_file(filename=context.test_filename, relative_path=TEST_CODES_FILE_REPO)
         if not test_doc:
-            return ""
-        prompt = PROMPT_TEMPLATE.format(code=code_doc.content, test_code=test_doc.content, logs=output_detail.stderr)
-
-        rsp = await self._aask(prompt)
-        code = CodeParser.parse_code(block="", text=rsp)
-
-        return code
+            return None
+        return code_doc, test_doc, output_detail.stderr
@@ -13,11 +13,14 @@ import json
 from pathlib import Path
 from typing import Optional
 
+from pydantic import Field
+
 from metagpt.actions import Action, ActionOutput
 from metagpt.actions.design_api_an import DESIGN_API_NODE
 from metagpt.config import CONFIG
 from metagpt.const import (
     DATA_API_DESIGN_FILE_REPO,
+    DEFAULT_INC_MAX_CONCURRENCY,
     PRDS_FILE_REPO,
     SEQ_FLOW_FILE_REPO,
     SYSTEM_DESIGN_FILE_REPO,
@@ -25,6 +28,7 @@ from metagpt.const import (
 )
 from metagpt.logs import logger
 from metagpt.schema import Document, Documents, Message
+from metagpt.utils.common import run_concurrently
 from metagpt.utils.file_repository import FileRepository
 from metagpt.utils.mermaid import mermaid_to_file
 
@@ -45,6 +49,7 @@ class WriteDesign(Action):
         "data structures, library tables, processes, and paths. Please provide your design, feedback "
         "clearly and in detail."
     )
+    max_concurrency: int = Field(default_factory=lambda: int(CONFIG.INC_MAX_CONCURRENCY or DEFAULT_INC_MAX_CONCURRENCY))
 
     async def run(self, with_messages: Message, schema: str = CONFIG.prompt_schema):
         # Use `git status` to identify which PRD documents have been modified in the `docs/prds` directory.
@@ -55,21 +60,19 @@ class WriteDesign(Action):
         system_design_file_repo = CONFIG.git_repo.new_file_repository(SYSTEM_DESIGN_FILE_REPO)
         changed_system_designs = system_design_file_repo.changed_files
 
-        # For those PRDs and design documents that have undergone changes, regenerate the design content.
-        changed_files = Documents()
-        for filename in changed_prds.keys():
-            doc = await self._update_system_design(
-                filename=filename, prds_file_repo=prds_file_repo, system_design_file_repo=system_design_file_repo
-            )
-            changed_files.docs[filename] = doc
-
-        for filename in changed_system_designs.keys():
-            if filename in changed_files.docs:
-                continue
-            doc = await self._update_system_design(
-                filename=filename, prds_file_repo=prds_file_repo, system_design_file_repo=system_design_file_repo
-            )
-            changed_files.docs[filename] = doc
+        # For those PRDs and design documents that have undergone changes, regenerate the design content, several
+        # documents at a time.
+        filenames = list(dict.fromkeys([*changed_prds.keys(), *changed_system_designs.keys()]))
+        docs = await run_concurrently(
+            [
+                lambda filename=filename: self._update_system_design(
+                    filename=filename, prds_file_repo=prds_file_repo, system_design_file_repo=system_design_file_repo
+                )
+                for filename in filenames
+            ],
+            max_concurrency=self.max_concurrency,
+        )
+        changed_files = Documents(docs=dict(zip(filenames, docs)))
         if not changed_files.docs:
             logger.info("Nothing has changed.")
         # Wait until all files under `docs/system_designs/` are processed before sending the publish message,
@@ -8,17 +8,23 @@
 @Describe : Actions of the invoice ocr assistant.
 """
 
+import asyncio
+import atexit
+import math
+import multiprocessing
 import os
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
-from paddleocr import PaddleOCR
 from pydantic import Field
 
 from metagpt.actions import Action
+from metagpt.config import CONFIG
 from metagpt.const import INVOICE_OCR_TABLE_PATH
 from metagpt.llm import LLM
 from metagpt.logs import logger
@@ -27,9 +33,90 @@ from metagpt.prompts.invoice_ocr import (
     REPLY_OCR_QUESTION_PROMPT,
 )
 from metagpt.provider.base_llm import BaseLLM
-from metagpt.utils.common import OutputParser
+from metagpt.utils.common import OutputParser, run_concurrently
 from metagpt.utils.file import File
 
+INVOICE_SUFFIXES = [".zip", ".pdf", ".png", ".jpg"]
+# Pages sent to an OCR worker per task, to amortize the inter-process round trip.
+OCR_BATCH_SIZE = 8
+# Pages of a pdf invoice recognized by default, the first one as PaddleOCR with `page_num=1`.
+OCR_PDF_PAGES = 1
+
+# The PaddleOCR engine of the current OCR worker process, loaded once by `_init_ocr_worker`.
+_ocr_engine = None
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_ocr_worker():
+    global _ocr_engine
+    from paddleocr import PaddleOCR
+
+    _ocr_engine = PaddleOCR(use_angle_cls=True, lang="ch", page_num=1)
+
+
+def _ocr_pages(pages: list[tuple[str, int]]) -> list:
+    """OCR the pages, given by file and page index, and return the result of each page. The pages of pdf files are
+    rendered here as PaddleOCR renders them, so that the pages of a file can be spread over the workers."""
+    results = []
+    pdfs = {}
+    try:
+        for file_path, index in pages:
+            if Path(file_path).suffix != ".pdf":
+                results.append(_ocr_engine.ocr(file_path, cls=True)[0])
+                continue
+            import fitz  # PyMuPDF, installed with paddleocr
+
+            if file_path not in pdfs:
+                pdfs[file_path] = fitz.open(file_path)
+            page = pdfs[file_path][index]
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+            if pixmap.width > 2000 or pixmap.height > 2000:
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+            # RGB samples to the BGR image PaddleOCR expects
+            image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, 3)[:, :, ::-1]
+            results.append(_ocr_engine.ocr(np.ascontiguousarray(image), cls=True)[0])
+    finally:
+        for pdf in pdfs.values():
+            pdf.close()
+    return results
+
+
+def _count_pages(file_path: Path) -> int:
+    """The pages of the file to recognize, up to `OCR_PDF_PAGES` in config for pdf files."""
+    if file_path.suffix != ".pdf":
+        return 1
+    import fitz
+
+    with fitz.open(str(file_path)) as pdf:
+        return min(pdf.page_count, int(CONFIG.OCR_PDF_PAGES or OCR_PDF_PAGES))
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Return the process-wide OCR worker pool, each worker keeping its own PaddleOCR models loaded.
+
+    The number of workers is `OCR_WORKERS` in config, the number of CPU cores up to 4 by default, as every worker
+    holds a full copy of the detection and recognition models.
+    """
+    global _ocr_pool
+    if _ocr_pool is None:
+        # spawn keeps the workers clear of the threads and locks of the event loop process
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=ocr_workers(), mp_context=multiprocessing.get_context("spawn"), initializer=_init_ocr_worker
+        )
+    return _ocr_pool
+
+
+def ocr_workers() -> int:
+    return int(CONFIG.OCR_WORKERS or min(os.cpu_count() or 1, 4))
+
+
+@atexit.register
+def shutdown_ocr_pool():
+    global _ocr_pool
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(cancel_futures=True)
+        _ocr_pool = None
+
 
 class InvoiceOCR(Action):
     """Action class for performing OCR on invoice files, including zip, PDF, png, and jpg files.
@@ -57,7 +144,7 @@ class InvoiceOCR(Action):
             Exception: If the file format is not zip, pdf, png, or jpg.
         """
         ext = file_path.suffix
-        if ext not in [".zip", ".pdf", ".png", ".jpg"]:
+        if ext not in INVOICE_SUFFIXES:
             raise Exception("The invoice format is not zip, pdf, png, or jpg")
 
         return ext
@@ -86,9 +173,29 @@ class InvoiceOCR(Action):
 
     @staticmethod
     async def _ocr(invoice_file_path: Path):
-        ocr = PaddleOCR(use_angle_cls=True, lang="ch", page_num=1)
-        ocr_result = ocr.ocr(str(invoice_file_path), cls=True)
-        return ocr_result
+        ocr_results = await InvoiceOCR._ocr_many([invoice_file_path])
+        return ocr_results[0]
+
+    @staticmethod
+    async def _ocr_many(invoice_file_paths: list[Path]) -> list:
+        """OCR the pages of the files in batches spread over the worker pool, so that a long pdf is shared by the
+        workers as well. Return the results of the files in their order, each one a list of its pages."""
+        # opening a pdf blocks, the files are counted in threads not to stall the event loop
+        counts = await asyncio.gather(*(asyncio.to_thread(_count_pages, i) for i in invoice_file_paths))
+        pages = [(str(path), index) for path, count in zip(invoice_file_paths, counts) for index in range(count)]
+        if not pages:
+            return [[] for _ in invoice_file_paths]
+        pool = get_ocr_pool()
+        batch_size = min(OCR_BATCH_SIZE, math.ceil(len(pages) / ocr_workers()))
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(
+            *(
+                loop.run_in_executor(pool, _ocr_pages, pages[i : i + batch_size])
+                for i in range(0, len(pages), batch_size)
+            )
+        )
+        page_results = iter([page_result for batch in batches for page_result in batch])
+        return [[next(page_results) for _ in range(count)] for count in counts]
 
     async def run(self, file_path: Path, *args, **kwargs) -> list:
         """Execute the action to identify invoice files through OCR.
@@ -104,15 +211,13 @@ class InvoiceOCR(Action):
         if file_ext == ".zip":
             # OCR recognizes zip batch files
             unzip_path = await self._unzip(file_path)
-            ocr_list = []
+            invoice_file_paths = []
             for root, _, files in os.walk(unzip_path):
-                for filename in files:
-                    invoice_file_path = Path(root) / Path(filename)
+                for filename in sorted(files):
                     # Identify files that match the type
-                    if Path(filename).suffix in [".zip", ".pdf", ".png", ".jpg"]:
-                        ocr_result = await self._ocr(str(invoice_file_path))
-                        ocr_list.append(ocr_result)
-            return ocr_list
+                    if Path(filename).suffix in INVOICE_SUFFIXES:
+                        invoice_file_paths.append(Path(root) / Path(filename))
+            return await self._ocr_many(invoice_file_paths)
 
         else:
             #  OCR identifies single file
@@ -133,6 +238,7 @@ class GenerateTable(Action):
     context: Optional[str] = None
     llm: BaseLLM = Field(default_factory=LLM)
     language: str = "ch"
+    max_concurrency: int = 8  # invoices extracted by the LLM at a time
 
     async def run(self, ocr_results: list, filename: str, *args, **kwargs) -> dict[str, str]:
         """Processes OCR results, extracts invoice information, generates a table, and saves it as an Excel file.
@@ -145,17 +251,16 @@ class GenerateTable(Action):
             A dictionary containing the invoice information.
 
         """
-        table_data = []
         pathname = INVOICE_OCR_TABLE_PATH
         pathname.mkdir(parents=True, exist_ok=True)
 
-        for ocr_result in ocr_results:
-            # Extract invoice OCR main information
-            prompt = EXTRACT_OCR_MAIN_INFO_PROMPT.format(ocr_result=ocr_result, language=self.language)
-            ocr_info = await self._aask(prompt=prompt)
-            invoice_data = OutputParser.extract_struct(ocr_info, dict)
-            if invoice_data:
-                table_data.append(invoice_data)
+        # Extract the main information of the invoices concurrently, the rows keep the order of the invoices
+        invoices = await run_concurrently(
+            [lambda ocr_result=ocr_result: self._extract(ocr_result) for ocr_result in ocr_results],
+            max_concurrency=self.max_concurrency,
+            max_retries=1,
+        )
+        table_data = [invoice_data for invoice_data in invoices if invoice_data]
 
         # Generate Excel file
         filename = f"{filename.split('.')[0]}.xlsx"
@@ -164,6 +269,11 @@ class GenerateTable(Action):
         df.to_excel(full_filename, index=False)
         return table_data
 
+    async def _extract(self, ocr_result) -> dict:
+        prompt = EXTRACT_OCR_MAIN_INFO_PROMPT.format(ocr_result=ocr_result, language=self.language)
+        ocr_info = await self._aask(prompt=prompt)
+        return OutputParser.extract_struct(ocr_info, dict)
+
 
 class ReplyQuestion(Action):
     """Action class for generating replies to questions based on OCR results.
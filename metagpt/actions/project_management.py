@@ -13,11 +13,14 @@
 import json
 from typing import Optional
 
+from pydantic import Field
+
 from metagpt.actions import ActionOutput
 from metagpt.actions.action import Action
 from metagpt.actions.project_management_an import PM_NODE
 from metagpt.config import CONFIG
 from metagpt.const import (
+    DEFAULT_INC_MAX_CONCURRENCY,
     PACKAGE_REQUIREMENTS_FILENAME,
     SYSTEM_DESIGN_FILE_REPO,
     TASK_FILE_REPO,
@@ -25,6 +28,7 @@ from metagpt.const import (
 )
 from metagpt.logs import logger
 from metagpt.schema import Document, Documents
+from metagpt.utils.common import run_concurrently
 from metagpt.utils.file_repository import FileRepository
 
 NEW_REQ_TEMPLATE = """
@@ -39,6 +43,7 @@ NEW_REQ_TEMPLATE = """
 class WriteTasks(Action):
     name: str = "CreateTasks"
     context: Optional[str] = None
+    max_concurrency: int = Field(default_factory=lambda: int(CONFIG.INC_MAX_CONCURRENCY or DEFAULT_INC_MAX_CONCURRENCY))
 
     async def run(self, with_messages, schema=CONFIG.prompt_schema):
         system_design_file_repo = CONFIG.git_repo.new_file_repository(SYSTEM_DESIGN_FILE_REPO)
@@ -46,23 +51,22 @@ class WriteTasks(Action):
 
         tasks_file_repo = CONFIG.git_repo.new_file_repository(TASK_FILE_REPO)
         changed_tasks = tasks_file_repo.changed_files
-        change_files = Documents()
-        # Rewrite the system designs that have undergone changes based on the git head diff under
-        # `docs/system_designs/`.
-        for filename in changed_system_designs:
-            task_doc = await self._update_tasks(
-                filename=filename, system_design_file_repo=system_design_file_repo, tasks_file_repo=tasks_file_repo
-            )
-            change_files.docs[filename] = task_doc
-
-        # Rewrite the task files that have undergone changes based on the git head diff under `docs/tasks/`.
-        for filename in changed_tasks:
-            if filename in change_files.docs:
-                continue
-            task_doc = await self._update_tasks(
-                filename=filename, system_design_file_repo=system_design_file_repo, tasks_file_repo=tasks_file_repo
-            )
-            change_files.docs[filename] = task_doc
+        # Rewrite the task files of the system designs that have undergone changes based on the git head diff under
+        # `docs/system_designs/`, and the task files changed under `docs/tasks/`, several at a time.
+        filenames = list(dict.fromkeys([*changed_system_designs, *changed_tasks]))
+        task_docs = await run_concurrently(
+            [
+                lambda filename=filename: self._update_tasks(
+                    filename=filename, system_design_file_repo=system_design_file_repo, tasks_file_repo=tasks_file_repo
+                )
+                for filename in filenames
+            ],
+            max_concurrency=self.max_concurrency,
+        )
+        change_files = Documents(docs=dict(zip(filenames, task_docs)))
+        # `requirements.txt` is shared by all task files, so it is updated one task file after another.
+        for task_doc in task_docs:
+            await self._update_requirements(task_doc)
 
         if not change_files.docs:
             logger.info("Nothing has changed.")
@@ -83,7 +87,6 @@ class WriteTasks(Action):
         await tasks_file_repo.save(
             filename=filename, content=task_doc.content, dependencies={system_design_doc.root_relative_path}
         )
-        await self._update_requirements(task_doc)
         await self._save_pdf(task_doc=task_doc)
         return task_doc
 
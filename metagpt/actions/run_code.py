@@ -15,7 +15,11 @@
             5. Merged the `Config` class of send18:dev branch to take over the set/get operations of the Environment
             class.
 """
+import asyncio
+import hashlib
 import subprocess
+import threading
+from pathlib import Path
 from typing import Tuple
 
 from pydantic import Field
@@ -74,6 +78,11 @@ standard errors:
 ```
 """
 
+# Requirements already installed, keyed by working directory and content hash, so that the tests of a round, run
+# concurrently, install them once
+_installed_requirements = set()
+_install_lock = threading.Lock()
+
 
 class RunCode(Action):
     name: str = "RunCode"
@@ -109,7 +118,9 @@ class RunCode(Action):
         return namespace.get("result", ""), ""
 
     @classmethod
-    async def run_script(cls, working_directory, additional_python_paths=[], command=[]) -> Tuple[str, str]:
+    async def run_script(
+        cls, working_directory, additional_python_paths=[], command=[], timeout: int = 10
+    ) -> Tuple[str, str]:
         working_directory = str(working_directory)
         additional_python_paths = [str(path) for path in additional_python_paths]
 
@@ -120,21 +131,21 @@ class RunCode(Action):
         additional_python_paths = [working_directory] + additional_python_paths
         additional_python_paths = ":".join(additional_python_paths)
         env["PYTHONPATH"] = additional_python_paths + ":" + env.get("PYTHONPATH", "")
-        RunCode._install_dependencies(working_directory=working_directory, env=env)
+        await asyncio.to_thread(RunCode._install_dependencies, working_directory=working_directory, env=env)
 
-        # Start the subprocess
-        process = subprocess.Popen(
-            command, cwd=working_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+        # Start the subprocess, without blocking the event loop so that several tests can run at the same time
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=working_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
         )
         logger.info(" ".join(command))
 
         try:
             # Wait for the process to complete, with a timeout
-            stdout, stderr = process.communicate(timeout=10)
-        except subprocess.TimeoutExpired:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
             logger.info("The command did not complete within the given timeout.")
             process.kill()  # Kill the process if it times out
-            stdout, stderr = process.communicate()
+            stdout, stderr = await process.communicate()
         return stdout.decode("utf-8"), stderr.decode("utf-8")
 
     async def run(self, *args, **kwargs) -> RunCodeResult:
@@ -144,6 +155,7 @@ class RunCode(Action):
                 command=self.context.command,
                 working_directory=self.context.working_directory,
                 additional_python_paths=self.context.additional_python_paths,
+                timeout=self.context.timeout,
             )
         elif self.context.script_language == "cpp":
             outs, errs = await self.run_cpp_code(
@@ -177,6 +189,17 @@ class RunCode(Action):
 
     @staticmethod
     def _install_dependencies(working_directory, env):
+        requirements = Path(working_directory) / "requirements.txt"
+        content = requirements.read_bytes() if requirements.exists() else b""
+        key = (str(working_directory), hashlib.sha256(content).hexdigest())
+        with _install_lock:
+            if key in _installed_requirements:
+                return
+            RunCode._install_requirements(working_directory=working_directory, env=env)
+            _installed_requirements.add(key)
+
+    @staticmethod
+    def _install_requirements(working_directory, env):
         install_command = ["python", "-m", "pip", "install", "-r", "requirements.txt"]
         logger.info(" ".join(install_command))
         RunCode._install_via_subprocess(install_command, check=True, cwd=working_directory, env=env)
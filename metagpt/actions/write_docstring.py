@@ -7,7 +7,8 @@ Usage:
     python3 -m metagpt.actions.write_docstring <filename> [--overwrite] [--style=<docstring_style>]
 
 Arguments:
-    filename           The path to the Python file for which you want to generate docstrings.
+    filename           The path to the Python file for which you want to generate docstrings, or to a directory to
+                       document all the Python files below it.
 
 Options:
     --overwrite        If specified, overwrite the original file with the code containing docstrings.
@@ -17,6 +18,7 @@ Options:
 
 Example:
     python3 -m metagpt.actions.write_docstring ./metagpt/startup.py --overwrite False --style=numpy
+    python3 -m metagpt.actions.write_docstring ./metagpt/utils --overwrite
 
 This script uses the 'fire' library to create a command-line interface. It generates docstrings for the given Python code using
 the specified docstring style and adds them to the code.
@@ -24,12 +26,28 @@ the specified docstring style and adds them to the code.
 from __future__ import annotations
 
 import ast
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Dict, Literal, Optional
 
 from metagpt.actions.action import Action
-from metagpt.utils.common import OutputParser, aread, awrite
-from metagpt.utils.pycst import merge_docstring
+from metagpt.const import DATA_PATH
+from metagpt.logs import logger
+from metagpt.utils.common import OutputParser, aread, awrite, run_concurrently
+from metagpt.utils.pycst import (
+    apply_docstrings,
+    collect_docstrings,
+    merge_docstring,
+    split_code,
+)
+
+# Longest code sent in one request when documenting a repository, longer modules are split into classes and functions
+DEFAULT_MAX_UNIT_CHARS = 12000
 
 PYTHON_DOCSTRING_SYSTEM = """### Requirements
 1. Add docstrings to the given code following the {style} style.
@@ -176,21 +194,160 @@ class WriteDocstring(Action):
             The Python code with docstrings added.
         """
         system_text = system_text.format(style=style, example=_python_docstring_style[style])
+        documented_code = await self._document(code, system_text)
+        return merge_docstring(code, documented_code)
+
+    async def _document(self, code: str, system_text: str) -> str:
         simplified_code = _simplify_python_code(code)
         documented_code = await self._aask(f"```python\n{simplified_code}\n```", [system_text])
-        documented_code = OutputParser.parse_python_code(documented_code)
-        return merge_docstring(code, documented_code)
+        return OutputParser.parse_python_code(documented_code)
 
     @staticmethod
     async def write_docstring(
         filename: str | Path, overwrite: bool = False, style: Literal["google", "numpy", "sphinx"] = "google"
-    ) -> str:
+    ) -> str | Dict[str, str]:
+        if Path(filename).is_dir():
+            return await WriteDocstring.write_repository(filename, overwrite=overwrite, style=style)
         data = await aread(str(filename))
         code = await WriteDocstring().run(data, style=style)
         if overwrite:
             await awrite(filename, code)
         return code
 
+    @staticmethod
+    async def write_repository(
+        path: str | Path,
+        overwrite: bool = False,
+        style: Literal["google", "numpy", "sphinx"] = "google",
+        max_concurrency: int = 4,
+        rpm: int = 0,
+        max_unit_chars: int = DEFAULT_MAX_UNIT_CHARS,
+        cache_path: str | Path = None,
+    ) -> Dict[str, str]:
+        """Writes docstrings for all the Python files under a directory.
+
+        Modules longer than `max_unit_chars` are documented class by class and function by function. The units are
+        documented concurrently, and the ones already documented by a previous run, same source and style, are
+        skipped.
+
+        Args:
+            path: The directory to document.
+            overwrite: Whether to write the documented code back to the files.
+            style: A string specifying the style of the docstring. Can be 'google', 'numpy', or 'sphinx'.
+            max_concurrency: The maximum number of requests to the LLM at a time.
+            rpm: The maximum number of requests to the LLM per minute, unlimited if not positive.
+            max_unit_chars: The longest code sent in one request, where possible.
+            cache_path: The file remembering the documented units, under the data directory by default.
+
+        Returns:
+            A dictionary mapping the file paths to their documented code.
+        """
+        root = Path(path)
+        filenames = sorted(
+            i for i in root.rglob("*.py") if not any(p.startswith(".") for p in i.relative_to(root).parts)
+        )
+        cache = _DocstringCache(Path(cache_path) if cache_path else DATA_PATH / "docstring_cache.json")
+        key = lambda code: hashlib.sha256(f"{style}\n{code}".encode("utf-8")).hexdigest()
+
+        plans = {}
+        for filename in filenames:
+            code = await aread(filename, encoding="utf-8")
+            try:
+                plans[filename] = (code, split_code(code, max_unit_chars))
+            except Exception as e:
+                logger.warning(f"Skip {filename}, failed to parse: {e}")
+        pending = {key(c): c for code, units in plans.values() for _, c in units if key(c) not in cache}
+        logger.info(f"Document {len(pending)} units of {len(plans)} files")
+
+        action = WriteDocstring()
+        system_text = PYTHON_DOCSTRING_SYSTEM.format(style=style, example=_python_docstring_style[style])
+        throttle = _throttle(rpm)
+
+        async def document(code: str) -> Optional[str]:
+            await throttle()
+            try:
+                return await action._document(code, system_text)
+            except Exception as e:
+                logger.warning(f"Failed to document {code[:80]!r}: {e}")
+                return None
+
+        keys = list(pending)
+        documented = await run_concurrently(
+            [lambda k=k: document(pending[k]) for k in keys], max_concurrency=max_concurrency
+        )
+        cache.update({k: v for k, v in zip(keys, documented) if v is not None})
+
+        results = {}
+        for filename, (code, units) in plans.items():
+            docstrings = {}
+            for unit_path, unit_code in units:
+                documented_code = cache.get(key(unit_code))
+                if not documented_code:
+                    continue
+                try:
+                    docstrings.update(collect_docstrings(documented_code, unit_path, include_module=len(units) == 1))
+                except Exception as e:
+                    logger.warning(f"Ignore the docstrings generated for {filename}: {e}")
+            new_code = apply_docstrings(code, docstrings) if docstrings else code
+            if overwrite and new_code != code:
+                await asyncio.to_thread(_write_atomically, filename, new_code)
+            # the units of the documented code need nothing more
+            cache.update({key(c): "" for _, c in split_code(new_code, max_unit_chars)})
+            results[str(filename)] = new_code
+        cache.save()
+        return results
+
+
+class _DocstringCache:
+    """Persistent `unit hash -> documented unit` mapping, an empty value marks a unit already documented."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def get(self, key: str) -> Optional[str]:
+        return self._data.get(key)
+
+    def update(self, items: Dict[str, str]):
+        self._data.update(items)
+
+    def save(self):
+        _write_atomically(self.path, json.dumps(self._data))
+
+
+def _throttle(rpm: int):
+    """Return an awaitable spacing its callers by `60 / rpm` seconds."""
+    interval = 60 / rpm if rpm > 0 else 0
+    next_start = [0.0]
+
+    async def wait():
+        if not interval:
+            return
+        now = time.monotonic()
+        start = max(now, next_start[0])
+        next_start[0] = start + interval
+        await asyncio.sleep(start - now)
+
+    return wait
+
+
+def _write_atomically(filename: Path, data: str):
+    """Write into a temporary file then move it into place, so that an interrupted run never truncates a file."""
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=filename.parent, prefix=f".{filename.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as writer:
+            writer.write(data)
+        if filename.exists():
+            os.chmod(tmp_name, filename.stat().st_mode)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
 
 def _simplify_python_code(code: str) -> None:
     """Simplifies the given Python code by removing expressions and the last if statement.
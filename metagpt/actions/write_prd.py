@@ -13,10 +13,13 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+from pydantic import Field
 
 from metagpt.actions import Action, ActionOutput
 from metagpt.actions.action_node import ActionNode
@@ -31,6 +34,9 @@ from metagpt.config import CONFIG
 from metagpt.const import (
     BUGFIX_FILENAME,
     COMPETITIVE_ANALYSIS_FILE_REPO,
+    DEFAULT_INC_MAX_CONCURRENCY,
+    DEFAULT_INC_RELEVANCE_EMBEDDING,
+    DEFAULT_INC_RELEVANCE_TOP_K,
     DOCS_FILE_REPO,
     PRD_PDF_FILE_REPO,
     PRDS_FILE_REPO,
@@ -38,7 +44,8 @@ from metagpt.const import (
 )
 from metagpt.logs import logger
 from metagpt.schema import BugFixContext, Document, Documents, Message
-from metagpt.utils.common import CodeParser
+from metagpt.utils.common import CodeParser, run_concurrently
+from metagpt.utils.embedding import get_embedding, rank_by_similarity
 from metagpt.utils.file_repository import FileRepository
 from metagpt.utils.mermaid import mermaid_to_file
 
@@ -65,6 +72,11 @@ NEW_REQ_TEMPLATE = """
 class WritePRD(Action):
     name: str = "WritePRD"
     content: Optional[str] = None
+    max_concurrency: int = Field(default_factory=lambda: int(CONFIG.INC_MAX_CONCURRENCY or DEFAULT_INC_MAX_CONCURRENCY))
+    relevance_top_k: int = Field(default_factory=lambda: int(CONFIG.INC_RELEVANCE_TOP_K or DEFAULT_INC_RELEVANCE_TOP_K))
+    relevance_embedding: str = Field(
+        default_factory=lambda: CONFIG.INC_RELEVANCE_EMBEDDING or DEFAULT_INC_RELEVANCE_EMBEDDING
+    )
 
     async def run(self, with_messages, schema=CONFIG.prompt_schema, *args, **kwargs) -> ActionOutput | Message:
         # Determine which requirement documents need to be rewritten: Use LLM to assess whether new requirements are
@@ -87,12 +99,19 @@ class WritePRD(Action):
             await docs_file_repo.delete(filename=BUGFIX_FILENAME)
 
         prds_file_repo = CONFIG.git_repo.new_file_repository(PRDS_FILE_REPO)
-        prd_docs = await prds_file_repo.get_all()
+        prd_docs = await self._select_candidates(requirement_doc, await prds_file_repo.get_all())
+        # The relevance checks and the rewrites of the relevant PRDs run concurrently.
+        new_prd_docs = await run_concurrently(
+            [
+                lambda prd_doc=prd_doc: self._update_prd(
+                    requirement_doc=requirement_doc, prd_doc=prd_doc, prds_file_repo=prds_file_repo, *args, **kwargs
+                )
+                for prd_doc in prd_docs
+            ],
+            max_concurrency=self.max_concurrency,
+        )
         change_files = Documents()
-        for prd_doc in prd_docs:
-            prd_doc = await self._update_prd(
-                requirement_doc=requirement_doc, prd_doc=prd_doc, prds_file_repo=prds_file_repo, *args, **kwargs
-            )
+        for prd_doc in new_prd_docs:
             if not prd_doc:
                 continue
             change_files.docs[prd_doc.filename] = prd_doc
@@ -125,6 +144,23 @@ class WritePRD(Action):
         await self._rename_workspace(node)
         return node
 
+    async def _select_candidates(self, requirement_doc, prd_docs: List[Document]) -> List[Document]:
+        """Keep the `relevance_top_k` PRDs most similar to the new requirement by embedding, the others are deemed
+        unrelated without asking the LLM. All PRDs are kept if the embedding is unavailable."""
+        if not requirement_doc or self.relevance_top_k <= 0 or len(prd_docs) <= self.relevance_top_k:
+            return prd_docs
+        try:
+            embedding = get_embedding(self.relevance_embedding)
+            ranking = await asyncio.to_thread(
+                rank_by_similarity, requirement_doc.content, [doc.content for doc in prd_docs], embedding
+            )
+        except Exception as e:
+            logger.warning(f"Failed to rank PRDs by similarity, check all of them: {e}")
+            return prd_docs
+        selected = sorted(i for i, _ in ranking[: self.relevance_top_k])
+        logger.info(f"{len(selected)}/{len(prd_docs)} PRDs are similar enough to the new requirement to be checked")
+        return [prd_docs[i] for i in selected]
+
     async def _is_relative(self, new_requirement_doc, old_prd_doc) -> bool:
         context = NEW_REQ_TEMPLATE.format(old_prd=old_prd_doc.content, requirements=new_requirement_doc.content)
         node = await WP_IS_RELATIVE_NODE.fill(context, self.llm)
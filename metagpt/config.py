@@ -19,10 +19,10 @@ from uuid import uuid4
 import yaml
 
 from metagpt.const import DEFAULT_WORKSPACE_ROOT, METAGPT_ROOT, OPTIONS
-from metagpt.logs import logger
+from metagpt.logs import configure_llm_stream, define_log_level, logger
 from metagpt.tools import SearchEngineType, WebBrowserEngineType
 from metagpt.utils.common import require_python_version
-from metagpt.utils.cost_manager import CostManager
+from metagpt.utils.cost_manager import COST_LOG_INTERVAL, CostManager
 from metagpt.utils.singleton import Singleton
 
 
@@ -49,6 +49,8 @@ class LLMProviderEnum(Enum):
     METAGPT = "metagpt"
     AZURE_OPENAI = "azure_openai"
     OLLAMA = "ollama"
+    MOCK = "mock"
+    FAILOVER = "failover"
 
     def __missing__(self, key):
         return self.OPENAI
@@ -87,6 +89,9 @@ class Config(metaclass=Singleton):
     def get_default_llm_provider_enum(self) -> LLMProviderEnum:
         """Get first valid LLM provider enum"""
         mappings = {
+            # an offline or composite provider asked for explicitly goes before the keys of real ones in the environment
+            LLMProviderEnum.MOCK: self.DEFAULT_PROVIDER == LLMProviderEnum.MOCK.value,
+            LLMProviderEnum.FAILOVER: self.DEFAULT_PROVIDER == LLMProviderEnum.FAILOVER.value,
             LLMProviderEnum.OPENAI: bool(
                 self._is_valid_llm_key(self.OPENAI_API_KEY) and not self.OPENAI_API_TYPE and self.OPENAI_API_MODEL
             ),
@@ -183,14 +188,25 @@ class Config(metaclass=Singleton):
         self.selenium_browser_type = self._get("SELENIUM_BROWSER_TYPE", "chrome")
 
         self.long_term_memory = self._get("LONG_TERM_MEMORY", False)
+        self.context_window_tokens = int(self._get("CONTEXT_WINDOW_TOKENS", 0))
+        self.context_window_ratio = float(self._get("CONTEXT_WINDOW_RATIO", 0))
+        self.context_summary = self._get("CONTEXT_SUMMARY", False)
         if self.long_term_memory:
             logger.warning("LONG_TERM_MEMORY is True")
         self.cost_manager.max_budget = self._get("MAX_BUDGET", 10.0)
+        self.cost_manager.role_budgets = self._get("ROLE_BUDGETS") or {}
+        self.cost_manager.token_costs = self._get("MODEL_TOKEN_COSTS") or {}
+        self.cost_manager.log_interval = float(self._get("COST_LOG_INTERVAL", COST_LOG_INTERVAL))
         self.code_review_k_times = 2
 
         self.puppeteer_config = self._get("PUPPETEER_CONFIG", "")
         self.mmdc = self._get("MMDC", "mmdc")
         self.calc_usage = self._get("CALC_USAGE", True)
+        if self._get("LOG_JSON", False):
+            define_log_level(json_file=True)
+        configure_llm_stream(
+            mode=self._get("LLM_STREAM_LOG", "auto"), sample_rate=float(self._get("LLM_STREAM_SAMPLE_RATE", 1.0))
+        )
         self.model_for_researcher_summary = self._get("MODEL_FOR_RESEARCHER_SUMMARY")
         self.model_for_researcher_report = self._get("MODEL_FOR_RESEARCHER_REPORT")
         self.mermaid_engine = self._get("MERMAID_ENGINE", "nodejs")
@@ -75,6 +75,7 @@ SKILL_DIRECTORY = SOURCE_ROOT / "skills"
 # REAL CONSTS
 
 MEM_TTL = 24 * 30 * 3600
+MEM_PERSIST_INTERVAL = 10  # seconds between two write-behind persists of the long-term memory
 
 
 MESSAGE_ROUTE_FROM = "sent_from"
@@ -116,6 +117,12 @@ BRAIN_MEMORY = "BRAIN_MEMORY"
 SKILL_PATH = "SKILL_PATH"
 SERPER_API_KEY = "SERPER_API_KEY"
 DEFAULT_TOKEN_SIZE = 500
+# Incremental development: documents rewritten at a time, and the existing PRDs most similar to a new requirement
+# that the LLM is asked about
+DEFAULT_INC_MAX_CONCURRENCY = 4
+DEFAULT_INC_RELEVANCE_TOP_K = 5
+# The embedding backend ranking the existing PRDs, the local one needs no network call
+DEFAULT_INC_RELEVANCE_EMBEDDING = "local"
 
 # format
 BASE64_FORMAT = "base64"
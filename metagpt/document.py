@@ -6,9 +6,11 @@
 @File    : document.py
 @Desc    : Classes and Operations Related to Files in the File System.
 """
+import csv
+import io
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
 import pandas as pd
 from langchain.document_loaders import (
@@ -17,11 +19,14 @@ from langchain.document_loaders import (
     UnstructuredWordDocumentLoader,
 )
 from langchain.text_splitter import CharacterTextSplitter
-from pydantic import BaseModel, ConfigDict, Field
-from tqdm import tqdm
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, computed_field
 
 from metagpt.repo_parser import RepoParser
 
+# Rows or pages per chunk yielded by the streaming readers.
+DEFAULT_CHUNK_SIZE = 10000
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
 
 def validate_cols(content_col: str, df: pd.DataFrame):
     if content_col not in df.columns:
@@ -36,6 +41,8 @@ def read_data(data_path: Path):
         data = pd.read_csv(data_path)
     elif ".json" == suffix:
         data = pd.read_json(data_path)
+    elif suffix in JSON_LINES_SUFFIXES:
+        data = pd.read_json(data_path, lines=True)
     elif suffix in (".docx", ".doc"):
         data = UnstructuredWordDocumentLoader(str(data_path), mode="elements").load()
     elif ".txt" == suffix:
@@ -50,6 +57,58 @@ def read_data(data_path: Path):
     return data
 
 
+def iter_data(data_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Union[pd.DataFrame, list]]:
+    """Read a file chunk by chunk with constant memory: csv and json lines in DataFrames of `chunk_size` rows, pdf
+    in lists of langchain documents of `chunk_size` pages. Other formats are read whole as a single chunk."""
+    suffix = data_path.suffix
+    if ".csv" == suffix:
+        with pd.read_csv(data_path, chunksize=chunk_size) as reader:
+            yield from reader
+    elif suffix in JSON_LINES_SUFFIXES:
+        with pd.read_json(data_path, lines=True, chunksize=chunk_size) as reader:
+            yield from reader
+    elif ".pdf" == suffix and _is_pypdf_available():
+        from langchain.document_loaders import PyPDFLoader
+
+        pages = []
+        for page in PyPDFLoader(str(data_path)).lazy_load():
+            pages.append(page)
+            if len(pages) >= chunk_size:
+                yield pages
+                pages = []
+        if pages:
+            yield pages
+    else:
+        yield read_data(data_path)
+
+
+def estimate_rows(data_path: Path, sample_size: int = 1024 * 1024) -> int:
+    """Estimate the rows of a csv or json lines file from its size and the rows of its first `sample_size` bytes,
+    exact for smaller files, 0 for other formats. Rows of csv files are read with the `csv` module so that quoted
+    newlines are not counted, those of json lines files are their newlines."""
+    if data_path.suffix != ".csv" and data_path.suffix not in JSON_LINES_SUFFIXES:
+        return 0
+    with open(data_path, "rb") as reader:
+        sample = reader.read(sample_size)
+    if not sample:
+        return 0
+    if data_path.suffix == ".csv":
+        text = io.StringIO(sample.decode("utf-8", errors="ignore"), newline="")
+        rows = max(sum(1 for row in csv.reader(text) if row) - 1, 0)  # without the header
+    else:
+        rows = sample.count(b"\n")
+    size = data_path.stat().st_size
+    return rows if size <= len(sample) else round(rows * size / len(sample))
+
+
+def _is_pypdf_available() -> bool:
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
 class DocumentStatus(Enum):
     """Indicates document status, a mechanism similar to RFC/PEP"""
 
@@ -135,15 +194,15 @@ class IndexableDocument(Document):
             return cls(data=data, content=content, content_col=content_col, meta_col=meta_col)
 
     def _get_docs_and_metadatas_by_df(self) -> (list, list):
-        df = self.data
-        docs = []
-        metadatas = []
-        for i in tqdm(range(len(df))):
-            docs.append(df[self.content_col].iloc[i])
-            if self.meta_col:
-                metadatas.append({self.meta_col: df[self.meta_col].iloc[i]})
-            else:
-                metadatas.append({})
+        return self._df_to_docs_and_metadatas(self.data, self.content_col, self.meta_col)
+
+    @staticmethod
+    def _df_to_docs_and_metadatas(df: pd.DataFrame, content_col: str, meta_col: str) -> (list, list):
+        docs = df[content_col].tolist()
+        if meta_col:
+            metadatas = [{meta_col: i} for i in df[meta_col].tolist()]
+        else:
+            metadatas = [{} for _ in docs]
         return docs, metadatas
 
     def _get_docs_and_metadatas_by_langchain(self) -> (list, list):
@@ -160,6 +219,20 @@ class IndexableDocument(Document):
         else:
             raise NotImplementedError("Data type not supported for metadata extraction.")
 
+    @classmethod
+    def iter_docs_and_metadatas(
+        cls, data_path: Path, content_col="content", meta_col="metadata", chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[tuple[list, list]]:
+        """Stream `(docs, metadatas)` batches of a file without loading it into memory at once."""
+        if not data_path.exists():
+            raise FileNotFoundError(f"File {data_path} not found.")
+        for data in iter_data(data_path, chunk_size=chunk_size):
+            if isinstance(data, pd.DataFrame):
+                validate_cols(content_col, data)
+                yield cls._df_to_docs_and_metadatas(data, content_col, meta_col)
+            else:
+                yield [i.page_content for i in data], [i.metadata for i in data]
+
 
 class RepoMetadata(BaseModel):
     name: str = Field(default="")
@@ -168,29 +241,70 @@ class RepoMetadata(BaseModel):
     symbols: list = Field(default_factory=list)
 
 
+def _category(path: Path) -> str:
+    """The field of `Repo` holding the file."""
+    # FIXME: These judgments are difficult to support multiple programming languages and need to be more general
+    suffix = path.suffix.lower()
+    if suffix == ".md":
+        return "docs"
+    elif suffix in [".py", ".js", ".css", ".html"]:
+        return "codes"
+    return "assets"
+
+
 class Repo(BaseModel):
     # Name of this repo.
     name: str = Field(default="")
     # metadata: RepoMetadata = Field(default=RepoMetadata)
-    docs: dict[Path, Document] = Field(default_factory=dict)
-    codes: dict[Path, Document] = Field(default_factory=dict)
-    assets: dict[Path, Document] = Field(default_factory=dict)
     path: Path = Field(default=None)
+    # The documents by category, see `docs`, `codes` and `assets`.
+    _files: dict[str, dict[Path, Document]] = PrivateAttr(
+        default_factory=lambda: {"docs": {}, "codes": {}, "assets": {}}
+    )
+    # Files found by `from_path` whose content has not been read yet.
+    _unloaded: set[Path] = PrivateAttr(default_factory=set)
+
+    def _category_files(self, category: str) -> dict[Path, Document]:
+        """The documents of `category`, after reading its files still unread."""
+        self._load([i for i in self._unloaded if _category(i) == category])
+        return self._files[category]
+
+    @computed_field
+    @property
+    def docs(self) -> dict[Path, Document]:
+        return self._category_files("docs")
+
+    @computed_field
+    @property
+    def codes(self) -> dict[Path, Document]:
+        return self._category_files("codes")
+
+    @computed_field
+    @property
+    def assets(self) -> dict[Path, Document]:
+        return self._category_files("assets")
 
     def _path(self, filename):
         return self.path / filename
 
     @classmethod
     def from_path(cls, path: Path):
-        """Load documents, code, and assets from a repository path."""
+        """Index documents, code, and assets of a repository path, the content of a category is read on the first
+        access of `docs`, `codes` or `assets`."""
         path.mkdir(parents=True, exist_ok=True)
         repo = Repo(path=path, name=path.name)
         for file_path in path.rglob("*"):
             # FIXME: These judgments are difficult to support multiple programming languages and need to be more general
-            if file_path.is_file() and file_path.suffix in [".json", ".txt", ".md", ".py", ".js", ".css", ".html"]:
-                repo._set(file_path.read_text(), file_path)
+            if file_path.suffix in [".json", ".txt", ".md", ".py", ".js", ".css", ".html"] and file_path.is_file():
+                repo._unloaded.add(file_path)
         return repo
 
+    def _load(self, paths):
+        paths = [i for i in paths if i in self._unloaded]
+        self._unloaded.difference_update(paths)
+        for path in paths:
+            self._set(path.read_text(), path)
+
     def to_path(self):
         """Persist all documents, code, and assets to the given repository path."""
         for doc in self.docs.values():
@@ -202,28 +316,22 @@ class Repo(BaseModel):
 
     def _set(self, content: str, path: Path):
         """Add a document to the appropriate category based on its file extension."""
-        suffix = path.suffix
         doc = Document(content=content, path=path, name=str(path.relative_to(self.path)))
-
-        # FIXME: These judgments are difficult to support multiple programming languages and need to be more general
-        if suffix.lower() == ".md":
-            self.docs[path] = doc
-        elif suffix.lower() in [".py", ".js", ".css", ".html"]:
-            self.codes[path] = doc
-        else:
-            self.assets[path] = doc
+        self._files[_category(path)][path] = doc
         return doc
 
     def set(self, filename: str, content: str):
         """Set a document and persist it to disk."""
         path = self._path(filename)
+        self._unloaded.discard(path)
         doc = self._set(content, path)
         doc.to_path()
 
     def get(self, filename: str) -> Optional[Document]:
-        """Get a document by its filename."""
+        """Get a document by its filename, reading only that file if it is unread."""
         path = self._path(filename)
-        return self.docs.get(path) or self.codes.get(path) or self.assets.get(path)
+        self._load([path])
+        return self._files[_category(path)].get(path)
 
     def get_text_documents(self) -> list[Document]:
         return list(self.docs.values()) + list(self.codes.values())
@@ -8,12 +8,24 @@
 import chromadb
 
 
+class ChromaEmbeddingFunction:
+    """Adapt a langchain `Embeddings` to the chromadb embedding function protocol."""
+
+    def __init__(self, embedding):
+        self._embedding = embedding
+
+    def __call__(self, input):
+        return self._embedding.embed_documents(list(input))
+
+
 class ChromaStore:
     """If inherited from BaseStore, or importing other modules from metagpt, a Python exception occurs, which is strange."""
 
-    def __init__(self, name):
+    def __init__(self, name, embedding=None):
+        """`embedding` is a langchain `Embeddings`, such as `get_embedding()`, chromadb's offline default when None."""
         client = chromadb.Client()
-        collection = client.create_collection(name)
+        kwargs = {"embedding_function": ChromaEmbeddingFunction(embedding)} if embedding else {}
+        collection = client.create_collection(name, **kwargs)
         self.client = client
         self.collection = collection
 
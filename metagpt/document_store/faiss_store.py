@@ -6,28 +6,106 @@
 @File    : faiss_store.py
 """
 import asyncio
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
-from langchain.embeddings import OpenAIEmbeddings
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
 
-from metagpt.config import CONFIG
-from metagpt.document import IndexableDocument
+from metagpt.document import DEFAULT_CHUNK_SIZE, IndexableDocument, estimate_rows
 from metagpt.document_store.base_store import LocalStore
 from metagpt.logs import logger
+from metagpt.utils.embedding import get_embedding
+
+# Corpus sizes from which the "auto" index type switches to an approximate index.
+FLAT_MAX_VECTORS = 10_000
+HNSW_MAX_VECTORS = 1_000_000
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+# Number of batches embedded concurrently ahead of the index during ingestion.
+INGEST_WORKERS = 4
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Brute force for small corpora, HNSW for medium ones and IVF, which trains fast and stays compact, beyond."""
+    if n_vectors < FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors < HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf"
+
+
+def build_index(vectors: np.ndarray, index_type: str = "auto", n_total: int = 0) -> faiss.Index:
+    """Create an empty ID-mapped index fitting `vectors`, trained on them if the index type requires it.
+
+    `n_total` is the expected corpus size when `vectors` is only the first batch of a streamed ingestion.
+    """
+    n_vectors, dim = vectors.shape
+    n_vectors = max(n_vectors, n_total)
+    if index_type == "auto":
+        index_type = choose_index_type(n_vectors)
+
+    if index_type == "flat":
+        base = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, HNSW_M)
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type == "ivf":
+        # faiss wants at least 39 training points per centroid
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), len(vectors) // 39))
+        base = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        base.train(vectors)
+        base.nprobe = min(nlist, IVF_NPROBE)
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    logger.debug(f"Build {index_type} index for {n_vectors} vectors")
+    return faiss.IndexIDMap2(base)
+
+
+def is_id_mapped(index: faiss.Index) -> bool:
+    return hasattr(index, "id_map")
+
+
+def save_local_atomically(store: FAISS, folder_path: Path, index_name: str):
+    """Save the index and docstore into a temporary directory, then move them into place with `os.replace`, so that
+    a crash never leaves a truncated file behind."""
+    folder_path = Path(folder_path)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(dir=folder_path, prefix=".persist-"))
+    try:
+        store.save_local(str(tmp_path), index_name)
+        for ext in (".pkl", ".faiss"):
+            os.replace(tmp_path / f"{index_name}{ext}", folder_path / f"{index_name}{ext}")
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
 
 
 class FaissStore(LocalStore):
     def __init__(
-        self, raw_data: Path, cache_dir=None, meta_col="source", content_col="output", embedding: Embeddings = None
+        self,
+        raw_data: Path,
+        cache_dir=None,
+        meta_col="source",
+        content_col="output",
+        embedding: Embeddings = None,
+        index_type: str = "auto",
     ):
         self.meta_col = meta_col
         self.content_col = content_col
-        self.embedding = embedding or OpenAIEmbeddings(
-            openai_api_key=CONFIG.openai_api_key, openai_api_base=CONFIG.openai_base_url
-        )
+        self.embedding = embedding or get_embedding()
+        self.index_type = index_type  # flat/hnsw/ivf, or auto to choose by corpus size
         super().__init__(raw_data, cache_dir)
 
     def _load(self) -> Optional["FaissStore"]:
@@ -37,18 +115,44 @@ class FaissStore(LocalStore):
             logger.info("Missing at least one of index_file/store_file, load failed and return None")
             return None
 
-        return FAISS.load_local(self.raw_data_path.parent, self.embedding, self.fname)
+        return FAISS.load_local(self.cache_dir, self.embedding, self.fname)
 
-    def _write(self, docs, metadatas):
+    def _write(self, docs, metadatas, vectors: np.ndarray = None, n_total: int = 0):
         try:
-            store = FAISS.from_texts(docs, self.embedding, metadatas=metadatas)
+            vectors = self._embed(docs) if vectors is None else vectors
+            index = build_index(vectors, self.index_type, n_total=n_total)
+            store = FAISS(self.embedding, index, InMemoryDocstore(), {})
+            self._add_vectors(store, docs, metadatas, vectors)
         except Exception as e:
             logger.error(f"Failed to write. error: {e}")
             raise e
         return store
 
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        return np.array(self.embedding.embed_documents(texts), dtype=np.float32)
+
+    @staticmethod
+    def _add_vectors(store: FAISS, texts: list[str], metadatas: list[dict], vectors: np.ndarray) -> list[str]:
+        ids = [str(uuid.uuid4()) for _ in texts]
+        if is_id_mapped(store.index):
+            start = max(store.index_to_docstore_id, default=-1) + 1
+            labels = np.arange(start, start + len(texts), dtype=np.int64)
+            store.index.add_with_ids(vectors, labels)
+        else:
+            # indexes persisted before ID mapping was introduced are addressed by position
+            start = len(store.index_to_docstore_id)
+            labels = np.arange(start, start + len(texts), dtype=np.int64)
+            store.index.add(vectors)
+        store.docstore.add({_id: Document(page_content=t, metadata=m) for _id, t, m in zip(ids, texts, metadatas)})
+        store.index_to_docstore_id.update(zip(labels.tolist(), ids))
+        return ids
+
+    def _add_texts(self, texts: list[str], metadatas: list[dict] = None) -> list[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        return self._add_vectors(self.store, texts, metadatas, self._embed(texts))
+
     def persist(self):
-        self.store.save_local(self.raw_data_path.parent, self.fname)
+        save_local_atomically(self.store, self.cache_dir, self.fname)
 
     def search(self, query, expand_cols=False, sep="\n", *args, k=5, **kwargs):
         rsp = self.store.similarity_search(query, k=k, **kwargs)
@@ -61,21 +165,77 @@ class FaissStore(LocalStore):
     async def asearch(self, *args, **kwargs):
         return await asyncio.to_thread(self.search, *args, **kwargs)
 
-    def write(self):
-        """Initialize the index and library based on the Document (JSON / XLSX, etc.) file provided by the user."""
+    def write(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Initialize the index and library based on the Document (JSON / XLSX, etc.) file provided by the user.
+
+        The file is streamed in batches of `chunk_size` rows; up to `INGEST_WORKERS` batches are embedded
+        concurrently while earlier ones are added to the index in file order.
+        """
         if not self.raw_data_path.exists():
             raise FileNotFoundError
-        doc = IndexableDocument.from_path(self.raw_data_path, self.content_col, self.meta_col)
-        docs, metadatas = doc.get_docs_and_metadatas()
+        batches = IndexableDocument.iter_docs_and_metadatas(
+            self.raw_data_path, self.content_col, self.meta_col, chunk_size=chunk_size
+        )
+        n_total = estimate_rows(self.raw_data_path)
 
-        self.store = self._write(docs, metadatas)
+        self.store = None
+        pending: deque[tuple[list, list, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+            for docs, metadatas in batches:
+                pending.append((docs, metadatas, executor.submit(self._embed, docs)))
+                if len(pending) >= INGEST_WORKERS:
+                    self._ingest(*pending.popleft(), n_total=n_total)
+            while pending:
+                self._ingest(*pending.popleft(), n_total=n_total)
+        if self.store is None:
+            raise ValueError(f"No document found in {self.raw_data_path}")
         self.persist()
         return self.store
 
-    def add(self, texts: list[str], *args, **kwargs) -> list[str]:
-        """FIXME: Currently, the store is not updated after adding."""
-        return self.store.add_texts(texts)
+    def _ingest(self, docs: list, metadatas: list, vectors: Future, n_total: int = 0):
+        if not docs:
+            return
+        if self.store is None:
+            # the first batch trains the index when its type requires it
+            self.store = self._write(docs, metadatas, vectors=vectors.result(), n_total=n_total)
+        else:
+            self._add_vectors(self.store, docs, metadatas, vectors.result())
+
+    def add(self, texts: list[str], *args, metadatas: list[dict] = None, **kwargs) -> list[str]:
+        """Add texts to the index and persist it, return the docstore ids of the new documents."""
+        ids = self._add_texts(texts, metadatas)
+        self.persist()
+        return ids
+
+    def delete(self, ids: list[str], *args, **kwargs):
+        """Delete documents by the docstore ids returned from `add`, then persist the index."""
+        targets = set(ids)
+        labels = [label for label, _id in self.store.index_to_docstore_id.items() if _id in targets]
+        if not labels:
+            return
+        if not is_id_mapped(self.store.index):
+            self.store.delete(list(targets))
+            self.persist()
+            return
+
+        base = faiss.downcast_index(self.store.index.index)
+        if isinstance(base, faiss.IndexHNSW):
+            # HNSW graphs do not support removal, rebuild from the remaining vectors
+            self.store.index = self._rebuild_without(self.store.index, base, labels)
+        else:
+            self.store.index.remove_ids(np.array(labels, dtype=np.int64))
+        for label in labels:
+            del self.store.index_to_docstore_id[label]
+        self.store.docstore.delete([i for i in ids if i in self.store.docstore._dict])
+        self.persist()
 
-    def delete(self, *args, **kwargs):
-        """Currently, langchain does not provide a delete interface."""
-        raise NotImplementedError
+    @staticmethod
+    def _rebuild_without(index: faiss.Index, base: faiss.Index, labels: list[int]) -> faiss.Index:
+        vectors = base.reconstruct_n(0, base.ntotal)
+        id_map = faiss.vector_to_array(index.id_map)
+        keep = ~np.isin(id_map, np.array(labels, dtype=np.int64))
+        new_base = faiss.IndexHNSWFlat(base.d, HNSW_M)
+        new_base.hnsw.efSearch = base.hnsw.efSearch
+        new_index = faiss.IndexIDMap2(new_base)
+        new_index.add_with_ids(vectors[keep], id_map[keep])
+        return new_index
@@ -10,16 +10,34 @@ import shutil
 
 import lancedb
 
+from metagpt.utils.embedding import get_embedding
+
 
 class LanceStore:
-    def __init__(self, name):
+    def __init__(self, name, embedding=None):
         db = lancedb.connect("./data/lancedb")
         self.db = db
         self.name = name
         self.table = None
+        self._embedding = embedding
+
+    @property
+    def embedding(self):
+        """Resolved on first use, so that tables fed with raw vectors need no embedding backend."""
+        if not self._embedding:
+            self._embedding = get_embedding()
+        return self._embedding
+
+    def _embed(self, data: list) -> list:
+        """Embed the text entries of `data` in one batch, vectors are kept as is."""
+        texts = [i for i in data if isinstance(i, str)]
+        if not texts:
+            return data
+        vectors = iter(self.embedding.embed_documents(texts))
+        return [next(vectors) if isinstance(i, str) else i for i in data]
 
     def search(self, query, n_results=2, metric="L2", nprobes=20, **kwargs):
-        # This assumes query is a vector embedding
+        # query is either a vector embedding or a text embedded by `self.embedding`
         # kwargs can be used for optional filtering
         # .select - only searches the specified columns
         # .where - SQL syntax filtering for metadata (e.g. where("price > 100"))
@@ -27,6 +45,8 @@ class LanceStore:
         # .nprobes - values will yield better recall (more likely to find vectors if they exist) at the expense of latency.
         if self.table is None:
             raise Exception("Table not created yet, please add data first.")
+        if isinstance(query, str):
+            query = self.embedding.embed_query(query)
 
         results = (
             self.table.search(query)
@@ -44,9 +64,10 @@ class LanceStore:
 
     def write(self, data, metadatas, ids):
         # This function is similar to add(), but it's for more generalized updates
-        # "data" is the list of embeddings
+        # "data" is the list of embeddings or texts, texts are embedded in one batch
         # Inserts into table by expanding metadatas into a dataframe: [{'vector', 'id', 'meta', 'meta2'}, ...]
 
+        data = self._embed(data)
         documents = []
         for i in range(len(data)):
             row = {"vector": data[i], "id": ids[i]}
@@ -60,8 +81,9 @@ class LanceStore:
 
     def add(self, data, metadata, _id):
         # This function is for adding individual documents
-        # It assumes you're passing in a single vector embedding, metadata, and id
+        # It assumes you're passing in a single vector embedding or text, metadata, and id
 
+        data = self._embed([data])[0]
         row = {"vector": data, "id": _id}
         row.update(metadata)
 
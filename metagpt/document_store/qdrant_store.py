@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Union
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, PointStruct, VectorParams
 
 from metagpt.document_store.base_store import BaseStore
+from metagpt.utils.embedding import get_embedding
 
 
 @dataclass
@@ -26,7 +27,8 @@ class QdrantConnection:
 
 
 class QdrantStore(BaseStore):
-    def __init__(self, connect: QdrantConnection):
+    def __init__(self, connect: QdrantConnection, embedding=None):
+        self._embedding = embedding
         if connect.memory:
             self.client = QdrantClient(":memory:")
         elif connect.url:
@@ -36,6 +38,13 @@ class QdrantStore(BaseStore):
         else:
             raise Exception("please check QdrantConnection.")
 
+    @property
+    def embedding(self):
+        """Resolved on first use, so that stores fed with raw vectors need no embedding backend."""
+        if not self._embedding:
+            self._embedding = get_embedding()
+        return self._embedding
+
     def create_collection(
         self,
         collection_name: str,
@@ -91,10 +100,29 @@ class QdrantStore(BaseStore):
             points,
         )
 
+    def add_texts(
+        self, collection_name: str, texts: List[str], ids: List[Union[int, str]], payloads: List[dict] = None
+    ):
+        """
+        embed texts in one batch and add them to qdrant
+        Args:
+            collection_name: collection name
+            texts: texts to embed
+            ids: point ids, one per text
+            payloads: optional payloads, one per text
+
+        Returns: None
+
+        """
+        payloads = payloads or [{} for _ in texts]
+        vectors = self.embedding.embed_documents(texts)
+        points = [PointStruct(id=i, vector=v, payload=p) for i, v, p in zip(ids, vectors, payloads)]
+        self.add(collection_name, points)
+
     def search(
         self,
         collection_name: str,
-        query: List[float],
+        query: Union[List[float], str],
         query_filter: Filter = None,
         k=10,
         return_vector=False,
@@ -103,7 +131,7 @@ class QdrantStore(BaseStore):
         vector search
         Args:
             collection_name: qdrant collection name
-            query: input vector
+            query: input vector, or a text embedded by `self.embedding`
             query_filter: Filter object, detail in https://github.com/qdrant/qdrant-client
             k: return the most similar k pieces of data
             return_vector: whether return vector
@@ -111,6 +139,8 @@ class QdrantStore(BaseStore):
         Returns: list of dict
 
         """
+        if isinstance(query, str):
+            query = self.embedding.embed_query(query)
         hits = self.client.search(
             collection_name=collection_name,
             query_vector=query,
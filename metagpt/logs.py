@@ -4,31 +4,250 @@
 @Time    : 2023/6/1 12:41
 @Author  : alexanderwu
 @File    : logs.py
+@Desc    : Log records are written by the thread of a `QueuedStream`, and the streamed answers of the LLM by that of
+        `StreamMultiplexer`, so that neither blocks the event loop. Records carry the run, role and
+        action of `log_context`, and the file sink can write them as JSON lines.
 """
 
+import atexit
+import json
+import queue
+import random
 import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from functools import partial
+from pathlib import Path
+from typing import Optional, TextIO
 
 from loguru import logger as _logger
 
 from metagpt.const import METAGPT_ROOT
 
+RUN_ID = uuid.uuid4().hex[:12]
 
-def define_log_level(print_level="INFO", logfile_level="DEBUG"):
-    """Adjust the log level to above level"""
+_log_context: ContextVar[dict] = ContextVar("metagpt_log_context", default={})
+
+
+def get_log_context() -> dict:
+    return _log_context.get()
+
+
+@contextmanager
+def log_context(**fields):
+    """Add `fields`, such as the role and the action, to the records logged inside, and to their streams."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def _patch_record(record):
+    record["extra"].update(run=RUN_ID, **_log_context.get())
+
+
+def _json_format(record) -> str:
+    fields = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        **record["extra"],
+    }
+    if record["exception"]:
+        fields["exception"] = repr(record["exception"].value)
+    record["extra"]["_json"] = json.dumps(fields, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
+class BackgroundWriter:
+    """Base of the writers whose output is written by a daemon thread, so that the callers only enqueue it. The
+    thread takes everything queued at once and writes it as a batch."""
+
+    thread_name = "metagpt-log-writer"
+
+    def __init__(self):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def drain(self, timeout: float = 5.0):
+        """Wait until what was written so far is out."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _put(self, item):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                    self._thread.start()
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [i for i in items if isinstance(i, threading.Event)]
+            try:
+                self._write_batch([i for i in items if not isinstance(i, threading.Event)], drained=bool(events))
+            except Exception as e:  # the writer must survive a closed or broken output
+                sys.__stderr__.write(f"{self.thread_name} failed to write: {e}\n")
+            for event in events:
+                event.set()
+
+    def _write_batch(self, items: list, drained: bool):
+        raise NotImplementedError
+
+
+class QueuedStream(BackgroundWriter):
+    """A stream for loguru sinks, whose records are formatted in the logging call and written to `stream`, or to
+    the file of `path`, by a daemon thread. The queue of loguru (`enqueue=True`) also pickles the records and sends
+    them through a pipe, which costs the logging call more than the write it saves.
+
+        logger.add(QueuedStream(sys.stderr), level="INFO")
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, path: Optional[Path] = None):
+        super().__init__()
+        self.path = path
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            stream = open(path, "a", encoding="utf-8")
+        self.stream = stream or sys.stderr
+
+    def write(self, message: str):
+        self._put(message)
+
+    def flush(self):
+        """Called by loguru after each record, the thread flushes after each batch instead."""
+
+    def isatty(self) -> bool:
+        return self.path is None and self.stream.isatty()
+
+    def stop(self):
+        """Called by loguru when the sink is removed."""
+        self.drain()
+        if self.path is not None:
+            self.stream.close()
+
+    def _write_batch(self, items: list, drained: bool):
+        if items:
+            self.stream.write("".join(items))
+            self.stream.flush()
+
+
+def define_log_level(print_level="INFO", logfile_level="DEBUG", json_file: bool = False, enqueue: bool = True):
+    """Adjust the log level to above level
+
+    :param json_file: Write the records of the log file as JSON lines.
+    :param enqueue: Write the records from a `QueuedStream`, instead of in the logging call.
+    """
     current_date = datetime.now()
     formatted_date = current_date.strftime("%Y%m%d")
+    logfile = METAGPT_ROOT / f"logs/{formatted_date}.{'jsonl' if json_file else 'txt'}"
+    file_format = {"format": _json_format} if json_file else {}
 
     _logger.remove()
-    _logger.add(sys.stderr, level=print_level)
-    _logger.add(METAGPT_ROOT / f"logs/{formatted_date}.txt", level=logfile_level)
+    _logger.configure(patcher=_patch_record)
+    if enqueue:
+        _logger.add(QueuedStream(sys.stderr), level=print_level)
+        _logger.add(QueuedStream(path=logfile), level=logfile_level, **file_format)
+    else:
+        _logger.add(sys.stderr, level=print_level)
+        _logger.add(logfile, level=logfile_level, **file_format)
     return _logger
 
 
 logger = define_log_level()
 
 
+class StreamMultiplexer(BackgroundWriter):
+    """Writes the streamed answers of concurrent roles from a daemon thread, one line at a time prefixed by the
+    role, so that the streams do not interleave mid-line and the event loop only enqueues the chunks.
+
+    :param mode: "auto" for the chunks as they come while a single role is streaming and whole lines prefixed by the
+        role while several are, "lines" for whole lines prefixed by the role always, "raw" for the chunks as they
+        come always, "off" to drop them.
+    :param sample_rate: The share of roles whose streams are shown, sampled by role so that a shown stream is whole.
+    :param output: The stream written to, stdout by default.
+    """
+
+    thread_name = "metagpt-llm-stream"
+
+    def __init__(self, mode: str = "auto", sample_rate: float = 1.0, output: Optional[TextIO] = None):
+        super().__init__()
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.output = output
+        self._sampled: dict[str, bool] = {}
+        self._pending: dict[str, str] = {}
+        # The role whose chunks written as they came end mid-line, None if none
+        self._open_role: Optional[str] = None
+
+    def write(self, msg: str):
+        if self.mode == "off" or not msg:
+            return
+        role = _log_context.get().get("role", "")
+        if self.sample_rate < 1.0:
+            sampled = self._sampled.get(role)
+            if sampled is None:
+                sampled = self._sampled[role] = random.random() < self.sample_rate
+            if not sampled:
+                return
+        self._put((role, msg))
+
+    def _write_batch(self, items: list, drained: bool):
+        out = []
+        pending = self._pending
+        raw = self.mode == "raw"
+        if self.mode == "auto":
+            roles = {role for role, _ in items} | {role for role, text in pending.items() if text}
+            raw = len(roles | ({self._open_role} if self._open_role is not None else set())) <= 1
+        if not raw and self._open_role is not None:
+            out.append("\n")  # the lines of the other roles do not go after the open one
+            self._open_role = None
+        for role, msg in items:
+            if raw:
+                out.append(pending.pop(role, "") + msg)
+                self._open_role = None if out[-1].endswith("\n") else role
+            else:
+                *lines, pending[role] = (pending.get(role, "") + msg).split("\n")
+                out += [f"{role}: {line}\n" if role else f"{line}\n" for line in lines]
+        if drained:  # the partial lines too
+            out += [f"{k}: {v}\n" if k else f"{v}\n" for k, v in pending.items() if v]
+            pending.clear()
+        if out:
+            output = self.output or sys.stdout
+            output.write("".join(out))
+            output.flush()
+
+
+_stream_multiplexer = StreamMultiplexer()
+atexit.register(_stream_multiplexer.drain)
+
+
+def configure_llm_stream(mode: Optional[str] = None, sample_rate: Optional[float] = None):
+    """Set the mode and sample rate of the default stream multiplexer, see `StreamMultiplexer`."""
+    if mode is not None:
+        _stream_multiplexer.mode = mode
+    if sample_rate is not None:
+        _stream_multiplexer.sample_rate = sample_rate
+        _stream_multiplexer._sampled.clear()
+
+
 def log_llm_stream(msg):
     _llm_stream_log(msg)
 
@@ -38,4 +257,4 @@ def set_llm_stream_logfunc(func):
     _llm_stream_log = func
 
 
-_llm_stream_log = partial(print, end="")
+_llm_stream_log = _stream_multiplexer.write
@@ -10,9 +10,10 @@
 """
 import json
 import re
+from collections import Counter
 from typing import Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from metagpt.config import CONFIG
 from metagpt.const import DEFAULT_LANGUAGE, DEFAULT_MAX_TOKENS, DEFAULT_TOKEN_SIZE
@@ -29,13 +30,23 @@ class BrainMemory(BaseModel):
     historical_summary: str = ""
     last_history_id: str = ""
     is_dirty: bool = False
-    last_talk: str = None
+    last_talk: Optional[str] = None
     cacheable: bool = True
     llm: Optional[BaseLLM] = None
 
+    # Number of `history` messages already stored in redis, and whether the stored list must be rewritten.
+    _persisted_history_count: int = PrivateAttr(default=0)
+    _history_rewritten: bool = PrivateAttr(default=True)
+    _summary_dirty: bool = PrivateAttr(default=True)
+    # Multiset of history contents, backing `exists`.
+    _history_contents: Counter = PrivateAttr(default_factory=Counter)
+
     class Config:
         arbitrary_types_allowed = True
 
+    def model_post_init(self, __context):
+        self._history_contents = Counter(m.content for m in self.history)
+
     def add_talk(self, msg: Message):
         """
         Add message from user.
@@ -57,10 +68,27 @@ class BrainMemory(BaseModel):
     @staticmethod
     async def loads(redis_key: str) -> "BrainMemory":
         redis = Redis()
-        if not redis.is_valid or not redis_key:
+        if not redis_key or not await redis.is_available():
             return BrainMemory()
-        v = await redis.get(key=redis_key)
-        logger.debug(f"REDIS GET {redis_key} {v}")
+        meta, summary, history = await redis.execute(
+            [
+                ("get", BrainMemory._meta_key(redis_key)),
+                ("get", BrainMemory._summary_key(redis_key)),
+                ("lrange", BrainMemory._history_key(redis_key), 0, -1),
+            ]
+        ) or (None, None, [])
+        logger.debug(f"REDIS GET {redis_key} {meta} {summary} {len(history or [])} history")
+        if meta:
+            bm = BrainMemory.parse_raw(meta)
+            bm.historical_summary = summary.decode("utf-8") if summary else ""
+            bm._reset_history([Message.parse_raw(i) for i in history])
+            bm._persisted_history_count = len(bm.history)
+            bm._history_rewritten = False
+            bm._summary_dirty = False
+            bm.is_dirty = False
+            return bm
+
+        v = await redis.get(key=redis_key)  # memory saved in one piece by earlier versions
         if v:
             bm = BrainMemory.parse_raw(v)
             bm.is_dirty = False
@@ -71,14 +99,50 @@ class BrainMemory(BaseModel):
         if not self.is_dirty:
             return
         redis = Redis()
-        if not redis.is_valid or not redis_key:
+        if not redis_key or not await redis.is_available():
             return False
-        v = self.model_dump_json()
         if self.cacheable:
-            await redis.set(key=redis_key, data=v, timeout_sec=timeout_sec)
-            logger.debug(f"REDIS SET {redis_key} {v}")
+            history_key = self._history_key(redis_key)
+            commands = []
+            if self._history_rewritten:
+                commands.append(("delete", history_key, redis_key))
+                self._persisted_history_count = 0
+            new_history = [m.model_dump_json() for m in self.history[self._persisted_history_count :]]
+            if new_history:
+                commands.append(("rpush", history_key, *new_history))
+            if self._summary_dirty:
+                commands.append(("set", self._summary_key(redis_key), self.historical_summary))
+            meta = self.model_dump_json(exclude={"history", "historical_summary", "llm"})
+            commands.append(("set", self._meta_key(redis_key), meta))
+            for key in (history_key, self._summary_key(redis_key), self._meta_key(redis_key)):
+                commands.append(("expire", key, timeout_sec))
+            if await redis.execute(commands) is None:
+                return False
+            logger.debug(f"REDIS SET {redis_key} {meta} +{len(new_history)} history")
+            self._persisted_history_count = len(self.history)
+            self._history_rewritten = False
+            self._summary_dirty = False
         self.is_dirty = False
 
+    @staticmethod
+    def _history_key(redis_key: str) -> str:
+        return f"{redis_key}:history"
+
+    @staticmethod
+    def _summary_key(redis_key: str) -> str:
+        return f"{redis_key}:summary"
+
+    @staticmethod
+    def _meta_key(redis_key: str) -> str:
+        return f"{redis_key}:meta"
+
+    def _reset_history(self, history: List[Message]):
+        """Replace the whole history, the stored list is rewritten on the next `dumps`."""
+        self.history = history
+        self._history_contents = Counter(m.content for m in history)
+        self._history_rewritten = True
+        self.is_dirty = True
+
     @staticmethod
     def to_redis_key(prefix: str, user_id: str, chat_id: str):
         return f"{prefix}:{user_id}:{chat_id}"
@@ -91,7 +155,8 @@ class BrainMemory(BaseModel):
             return
 
         self.historical_summary = history_summary
-        self.history = []
+        self._summary_dirty = True
+        self._reset_history([])
         await self.dumps(redis_key=redis_key)
         self.is_dirty = False
 
@@ -101,14 +166,12 @@ class BrainMemory(BaseModel):
                 return
 
         self.history.append(msg)
+        self._history_contents[msg.content] += 1
         self.last_history_id = str(msg.id)
         self.is_dirty = True
 
     def exists(self, text) -> bool:
-        for m in reversed(self.history):
-            if m.content == text:
-                return True
-        return False
+        return self._history_contents[text] > 0
 
     @staticmethod
     def to_int(v, default_value):
@@ -162,8 +225,7 @@ class BrainMemory(BaseModel):
             msgs.append(m)
             total_length += delta
         msgs.reverse()
-        self.history = msgs
-        self.is_dirty = True
+        self._reset_history(msgs)
         await self.dumps(redis_key=CONFIG.REDIS_KEY)
         self.is_dirty = False
 
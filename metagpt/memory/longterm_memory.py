@@ -5,7 +5,7 @@
 @Modified By: mashenquan, 2023/8/20. Remove global configuration `CONFIG`, enable configuration support for business isolation.
 """
 
-from typing import Optional
+from typing import Iterable, Optional
 
 from pydantic import ConfigDict, Field
 
@@ -44,11 +44,19 @@ class LongTermMemory(Memory):
 
     def add(self, message: Message):
         super().add(message)
-        for action in self.rc.watch:
-            if message.cause_by == action and not self.msg_from_recover:
-                # currently, only add role's watching messages to its memory_storage
-                # and ignore adding messages from recover repeatedly
-                self.memory_storage.add(message)
+        if self._is_watched(message):
+            self.memory_storage.add(message)
+
+    def add_batch(self, messages: Iterable[Message]):
+        messages = list(messages)
+        for message in messages:
+            super().add(message)
+        self.memory_storage.add_many([i for i in messages if self._is_watched(i)])
+
+    def _is_watched(self, message: Message) -> bool:
+        # currently, only add role's watching messages to its memory_storage
+        # and ignore adding messages from recover repeatedly
+        return not self.msg_from_recover and message.cause_by in self.rc.watch
 
     def find_news(self, observed: list[Message], k=0) -> list[Message]:
         """
@@ -62,9 +70,9 @@ class LongTermMemory(Memory):
             return stm_news
 
         ltm_news: list[Message] = []
-        for mem in stm_news:
-            # filter out messages similar to those seen previously in ltm, only keep fresh news
-            mem_searched = self.memory_storage.search_dissimilar(mem)
+        # filter out messages similar to those seen previously in ltm, only keep fresh news
+        searched = self.memory_storage.search_dissimilar_many(stm_news)
+        for mem, mem_searched in zip(stm_news, searched):
             if len(mem_searched) > 0:
                 ltm_news.append(mem)
         return ltm_news[-k:]
@@ -5,17 +5,22 @@
 @Modified By: mashenquan, 2023/8/20. Remove global configuration `CONFIG`, enable configuration support for business isolation.
 """
 
+import atexit
+import time
+import weakref
 from pathlib import Path
 from typing import Optional
 
-from langchain.embeddings import OpenAIEmbeddings
+import faiss
+import numpy as np
 from langchain.vectorstores.faiss import FAISS
 from langchain_core.embeddings import Embeddings
 
-from metagpt.const import DATA_PATH, MEM_TTL
-from metagpt.document_store.faiss_store import FaissStore
+from metagpt.const import DATA_PATH, MEM_PERSIST_INTERVAL, MEM_TTL
+from metagpt.document_store.faiss_store import FaissStore, save_local_atomically
 from metagpt.logs import logger
 from metagpt.schema import Message
+from metagpt.utils.embedding import get_embedding
 from metagpt.utils.serialize import deserialize_message, serialize_message
 
 
@@ -24,15 +29,25 @@ class MemoryStorage(FaissStore):
     The memory storage with Faiss as ANN search engine
     """
 
-    def __init__(self, mem_ttl: int = MEM_TTL, embedding: Embeddings = None):
+    def __init__(
+        self, mem_ttl: int = MEM_TTL, embedding: Embeddings = None, persist_interval: float = MEM_PERSIST_INTERVAL
+    ):
         self.role_id: str = None
         self.role_mem_path: str = None
         self.mem_ttl: int = mem_ttl  # later use
         self.threshold: float = 0.1  # experience value. TODO The threshold to filter similar memories
         self._initialized: bool = False
 
-        self.embedding = embedding or OpenAIEmbeddings()
+        self.embedding = embedding or get_embedding()
         self.store: FAISS = None  # Faiss engine
+        self.index_type: str = "flat"
+
+        # write-behind persistence: `add` only marks the storage dirty, the index is written at most once per
+        # `persist_interval` seconds, on `flush` and at interpreter exit.
+        self.persist_interval: float = persist_interval
+        self._dirty: bool = False
+        self._last_persist: float = 0.0
+        _storages.add(self)
 
     @property
     def is_initialized(self) -> bool:
@@ -73,42 +88,69 @@ class MemoryStorage(FaissStore):
         return index_fpath, storage_fpath
 
     def persist(self):
-        self.store.save_local(self.role_mem_path, self.role_id)
+        save_local_atomically(self.store, self.role_mem_path, self.role_id)
+        self._dirty = False
+        self._last_persist = time.monotonic()
         logger.debug(f"Agent {self.role_id} persist memory into local")
 
+    def flush(self):
+        """Persist pending changes, if any."""
+        if self._dirty and self.store:
+            self.persist()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_persist >= self.persist_interval:
+            self.persist()
+
     def add(self, message: Message) -> bool:
         """add message into memory storage"""
-        docs = [message.content]
-        metadatas = [{"message_ser": serialize_message(message)}]
+        self.add_many([message])
+
+    def add_many(self, messages: list[Message]):
+        """add messages into memory storage with one embedding request and one index update"""
+        if not messages:
+            return
+        docs = [message.content for message in messages]
+        metadatas = [{"message_ser": serialize_message(message)} for message in messages]
         if not self.store:
             # init Faiss
             self.store = self._write(docs, metadatas)
             self._initialized = True
         else:
-            self.store.add_texts(texts=docs, metadatas=metadatas)
-        self.persist()
-        logger.info(f"Agent {self.role_id}'s memory_storage add a message")
+            self._add_texts(docs, metadatas)
+        self._mark_dirty()
+        logger.info(f"Agent {self.role_id}'s memory_storage add {len(messages)} message(s)")
 
     def search_dissimilar(self, message: Message, k=4) -> list[Message]:
         """search for dissimilar messages"""
-        if not self.store:
-            return []
-
-        resp = self.store.similarity_search_with_score(query=message.content, k=k)
-        # filter the result which score is smaller than the threshold
-        filtered_resp = []
-        for item, score in resp:
-            # the smaller score means more similar relation
-            if score < self.threshold:
-                continue
-            # convert search result into Memory
-            metadata = item.metadata
-            new_mem = deserialize_message(metadata.get("message_ser"))
-            filtered_resp.append(new_mem)
-        return filtered_resp
+        return self.search_dissimilar_many([message], k=k)[0]
+
+    def search_dissimilar_many(self, messages: list[Message], k=4) -> list[list[Message]]:
+        """search for dissimilar messages of every message in `messages` with a single FAISS search"""
+        if not self.store or not messages:
+            return [[] for _ in messages]
+
+        vectors = np.array(self.embedding.embed_documents([m.content for m in messages]), dtype=np.float32)
+        if self.store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        scores, indices = self.store.index.search(vectors, k)
+
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            filtered_resp = []
+            for score, idx in zip(row_scores, row_indices):
+                # the smaller score means more similar relation, -1 pads rows when the index has fewer than k items
+                if idx == -1 or score < self.threshold:
+                    continue
+                document = self.store.docstore.search(self.store.index_to_docstore_id[idx])
+                # convert search result into Memory
+                filtered_resp.append(deserialize_message(document.metadata.get("message_ser")))
+            results.append(filtered_resp)
+        return results
 
     def clean(self):
-        index_fpath, storage_fpath = self._get_index_and_store_fname()
+        index_fpath, storage_fpath = self._get_index_and_store_fname(index_ext=".faiss")
         if index_fpath and index_fpath.exists():
             index_fpath.unlink(missing_ok=True)
         if storage_fpath and storage_fpath.exists():
@@ -116,3 +158,16 @@ class MemoryStorage(FaissStore):
 
         self.store = None
         self._initialized = False
+        self._dirty = False
+
+
+_storages: "weakref.WeakSet[MemoryStorage]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_storages():
+    for storage in list(_storages):
+        try:
+            storage.flush()
+        except Exception as e:
+            logger.warning(f"Flush memory storage of {storage.role_id} failed: {e}")
@@ -14,6 +14,8 @@ from metagpt.provider.openai_api import OpenAILLM
 from metagpt.provider.zhipuai_api import ZhiPuAILLM
 from metagpt.provider.azure_openai_api import AzureOpenAILLM
 from metagpt.provider.metagpt_api import MetaGPTLLM
+from metagpt.provider.mock_llm_api import MockLLM
+from metagpt.provider.failover_llm import FailoverLLM
 
 __all__ = [
     "FireworksLLM",
@@ -24,4 +26,6 @@ __all__ = [
     "AzureOpenAILLM",
     "MetaGPTLLM",
     "OllamaLLM",
+    "MockLLM",
+    "FailoverLLM",
 ]
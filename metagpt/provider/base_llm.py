@@ -10,6 +10,9 @@ import json
 from abc import ABC, abstractmethod
 from typing import Optional
 
+from metagpt.config import CONFIG
+from metagpt.utils.tracing import traced
+
 
 class BaseLLM(ABC):
     """LLM API abstract class, requiring all inheritors to provide a series of standard capabilities"""
@@ -32,6 +35,7 @@ class BaseLLM(ABC):
     def _default_system_msg(self):
         return self._system_msg(self.system_prompt)
 
+    @traced("llm", name=lambda self, *args, **kwargs: getattr(self, "model", "") or type(self).__name__)
     async def aask(
         self,
         msg: str,
@@ -47,6 +51,7 @@ class BaseLLM(ABC):
         if format_msgs:
             message.extend(format_msgs)
         message.append(self._user_msg(msg))
+        CONFIG.cost_manager.check_budget()
         rsp = await self.acompletion_text(message, stream=stream, timeout=timeout)
         return rsp
 
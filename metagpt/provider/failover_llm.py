@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : failover_llm.py
+@Desc    : A provider fronting an ordered list of backends, such as openai, azure_openai and ollama. A backend failing
+        `CIRCUIT_FAILURES` times in a row is skipped for `CIRCUIT_COOLDOWN` seconds, a failed call goes to the next
+        backend at once instead of backing off, and with `HEDGE_PERCENTILE` a call slower than that percentile of
+        the latencies of its backend is also sent to the next one, the first answer wins. Select it with
+        `DEFAULT_PROVIDER: failover` and `FAILOVER_PROVIDERS`.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from tenacity import stop_after_attempt
+
+from metagpt.config import CONFIG, LLMProviderEnum
+from metagpt.logs import log_llm_stream, logger
+from metagpt.provider.base_llm import BaseLLM
+from metagpt.provider.llm_provider_registry import LLM_REGISTRY, register_provider
+from metagpt.utils.tracing import add_event, set_attributes
+
+# Consecutive failures opening the circuit of a backend
+CIRCUIT_FAILURES = 3
+# Seconds a backend with an open circuit is skipped, before it is tried again
+CIRCUIT_COOLDOWN = 30.0
+# Calls of a backend before its latency percentile is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+# Latencies kept by backend
+LATENCY_WINDOW = 200
+
+
+class BackendHealth:
+    """Latencies, failures and circuit of a backend, shared by the providers of all roles."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def is_open(self, cooldown: float) -> bool:
+        """Whether calls skip the backend. Once the cooldown is over, calls try it again, and the circuit closes on
+        the first success or opens again on the first failure."""
+        return bool(self.opened_at) and time.monotonic() - self.opened_at < cooldown
+
+    def record_success(self, seconds: float):
+        self.calls += 1
+        self.latencies.append(seconds)
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def record_failure(self, max_failures: int):
+        self.calls += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= max_failures:
+            if not self.is_open(float("inf")):
+                logger.warning(f"Circuit of {self.name} opened after {self.consecutive_failures} failures")
+            self.opened_at = time.monotonic()
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The `p` percentile of the latencies, None before `HEDGE_MIN_SAMPLES` calls."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+_health: Dict[str, BackendHealth] = {}
+
+
+def get_health(name: str) -> BackendHealth:
+    if name not in _health:
+        _health[name] = BackendHealth(name)
+    return _health[name]
+
+
+_single_attempts: Dict[Callable, Callable] = {}
+
+
+def _single_attempt(method: Callable) -> Callable:
+    """`method` of a class with its tenacity retries disabled, failing over is faster than backing off."""
+    if method not in _single_attempts:
+        retry_with = getattr(method, "retry_with", None)
+        _single_attempts[method] = (
+            retry_with(stop=stop_after_attempt(1), retry_error_callback=None, reraise=True) if retry_with else method
+        )
+    return _single_attempts[method]
+
+
+@register_provider(LLMProviderEnum.FAILOVER)
+class FailoverLLM(BaseLLM):
+    """Fail over, and hedge, the calls across `backends`, tried in order.
+
+        FailoverLLM(backends={"openai": OpenAILLM(), "ollama": OllamaLLM()}, hedge_percentile=95)
+
+    :param backends: The providers by name, those of `FAILOVER_PROVIDERS` by default.
+    :param hedge_percentile: Send a call also to the next backend when it takes longer than this percentile of the
+        latencies of its backend, 0 to disable. When hedging, calls are not streamed, their answer is logged once in.
+    """
+
+    def __init__(
+        self,
+        backends: Optional[Dict[str, BaseLLM]] = None,
+        hedge_percentile: Optional[float] = None,
+        circuit_failures: Optional[int] = None,
+        circuit_cooldown: Optional[float] = None,
+    ):
+        if backends is None:
+            names = CONFIG.FAILOVER_PROVIDERS or []
+            backends = {name: LLM_REGISTRY.get_provider(LLMProviderEnum(name)) for name in names}
+        if not backends:
+            raise ValueError("FailoverLLM needs at least one backend, set FAILOVER_PROVIDERS")
+        self.backends = backends
+        self.hedge_percentile = float(CONFIG.HEDGE_PERCENTILE or 0) if hedge_percentile is None else hedge_percentile
+        self.circuit_failures = circuit_failures or int(CONFIG.CIRCUIT_FAILURES or CIRCUIT_FAILURES)
+        self.circuit_cooldown = circuit_cooldown or float(CONFIG.CIRCUIT_COOLDOWN or CIRCUIT_COOLDOWN)
+
+    @property
+    def model(self) -> str:
+        return getattr(self._candidates()[0][1], "model", "")
+
+    @model.setter
+    def model(self, value: str):
+        """Set the model of every backend having one, as `self.llm.model = ...` does for a single provider."""
+        for backend in self.backends.values():
+            if hasattr(backend, "model"):
+                backend.model = value
+
+    def _candidates(self) -> List[tuple]:
+        """The backends to try in order, those with an open circuit last."""
+        items = list(self.backends.items())
+        closed = [i for i in items if not get_health(i[0]).is_open(self.circuit_cooldown)]
+        return closed + [i for i in items if i not in closed]
+
+    async def _call(self, name: str, backend: BaseLLM, method: str, *args, **kwargs):
+        health = get_health(name)
+        start = time.perf_counter()
+        try:
+            rsp = await _single_attempt(getattr(type(backend), method))(backend, *args, **kwargs)
+        except Exception as e:
+            health.record_failure(self.circuit_failures)
+            add_event("backend_failed", backend=name, error=f"{type(e).__name__}: {e}"[:200])
+            raise
+        health.record_success(time.perf_counter() - start)
+        set_attributes(backend=name)
+        return rsp
+
+    async def _failover(self, method: str, *args, **kwargs):
+        """Call `method` of the backends in order until one succeeds, hedging with the next one if enabled."""
+        candidates = self._candidates()
+        last_error = None
+        index = 0
+        while index < len(candidates):
+            name, backend = candidates[index]
+            threshold = get_health(name).percentile(self.hedge_percentile) if self.hedge_percentile > 0 else None
+            try:
+                if threshold is not None and index + 1 < len(candidates):
+                    index += 1  # the next backend is also taken by the hedge
+                    secondary = candidates[index]
+                    return await self._hedge((name, backend), secondary, threshold, method, *args, **kwargs)
+                return await self._call(name, backend, method, *args, **kwargs)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM backend {name} failed: {e}")
+            index += 1
+        raise last_error
+
+    async def _hedge(self, primary: tuple, secondary: tuple, threshold: float, method: str, *args, **kwargs):
+        """Call `primary`, and `secondary` too if no answer came within `threshold` seconds, return the first answer
+        and cancel the other call. Raise the last error if both fail."""
+        tasks = [asyncio.create_task(self._call(*primary, method, *args, **kwargs))]
+        done, _ = await asyncio.wait(tasks, timeout=threshold)
+        if not done:
+            add_event("hedge", backend=secondary[0], after_s=round(threshold, 3))
+            logger.info(f"LLM backend {primary[0]} slower than {threshold:.1f}s, hedged with {secondary[0]}")
+            tasks.append(asyncio.create_task(self._call(*secondary, method, *args, **kwargs)))
+        elif not tasks[0].exception():
+            return tasks[0].result()
+        else:
+            tasks.append(asyncio.create_task(self._call(*secondary, method, *args, **kwargs)))  # fail over at once
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acompletion(self, messages: list[dict], timeout=3):
+        return await self._failover("acompletion", messages, timeout=timeout)
+
+    async def acompletion_text(self, messages: list[dict], stream=False, timeout=3) -> str:
+        if not stream or self.hedge_percentile <= 0:
+            return await self._failover("acompletion_text", messages, stream=stream, timeout=timeout)
+        text = await self._failover("acompletion_text", messages, stream=False, timeout=timeout)
+        log_llm_stream(text)
+        log_llm_stream("\n")
+        return text
+
+    def get_choice_text(self, rsp) -> str:
+        """The text of a response of any of the backends."""
+        for backend in self.backends.values():
+            try:
+                return backend.get_choice_text(rsp)
+            except (AttributeError, KeyError, IndexError, TypeError):
+                continue
+        return super().get_choice_text(rsp)
@@ -48,27 +48,16 @@ class FireworksCostManager(CostManager):
                 token_costs = MODEL_GRADE_TOKEN_COSTS["-1"]
         return token_costs
 
-    def update_cost(self, prompt_tokens: int, completion_tokens: int, model: str):
+    def get_price(self, model: str) -> dict:
         """
         Refs to `https://app.fireworks.ai/pricing` **Developer pricing**
-        Update the total cost, prompt tokens, and completion tokens.
-
-        Args:
-        prompt_tokens (int): The number of tokens used in the prompt.
-        completion_tokens (int): The number of tokens used in the completion.
-        model (str): The model used for the API call.
+        The prices of the grade of `model`, converted to dollars per 1k tokens as in `TOKEN_COSTS`.
         """
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-
         token_costs = self.model_grade_token_costs(model)
-        cost = (prompt_tokens * token_costs["prompt"] + completion_tokens * token_costs["completion"]) / 1000000
-        self.total_cost += cost
-        max_budget = CONFIG.max_budget if CONFIG.max_budget else CONFIG.cost_manager.max_budget
-        logger.info(
-            f"Total running cost: ${self.total_cost:.4f} | Max budget: ${max_budget:.3f} | "
-            f"Current cost: ${cost:.4f}, prompt_tokens: {prompt_tokens}, completion_tokens: {completion_tokens}"
-        )
+        return {"prompt": token_costs["prompt"] / 1000, "completion": token_costs["completion"] / 1000}
+
+    def update_cost(self, prompt_tokens: int, completion_tokens: int, model: str):
+        super().update_cost(prompt_tokens, completion_tokens, model)
         CONFIG.total_cost = self.total_cost
 
 
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : mock_llm_api.py
+@Desc    : An offline provider answering from a responder function after a simulated latency, to measure the
+        overhead of the framework apart from the LLM, and to dry-run SOPs. Select it with `DEFAULT_PROVIDER: mock`.
+"""
+import asyncio
+import re
+from typing import Callable, Optional
+
+from metagpt.config import CONFIG, LLMProviderEnum
+from metagpt.logs import log_llm_stream, logger
+from metagpt.provider.base_llm import BaseLLM
+from metagpt.provider.llm_provider_registry import register_provider
+
+# The model the mock usage is priced as
+MOCK_LLM_MODEL = "gpt-3.5-turbo-1106"
+
+_FORMAT_EXAMPLE = re.compile(r"## format example\n(\[CONTENT\].*?\[/CONTENT\])", re.DOTALL)
+
+
+def count_tokens(text: str) -> int:
+    """About 4 characters a token, without the cost of a tokenizer in the measures."""
+    return (len(text) + 3) // 4
+
+
+def echo_format_example(messages: list[dict]) -> str:
+    """Answer an ActionNode prompt with its format example, which is valid for the schema of the node."""
+    match = _FORMAT_EXAMPLE.search(messages[-1]["content"])
+    return match.group(1) if match else ""
+
+
+@register_provider(LLMProviderEnum.MOCK)
+class MockLLM(BaseLLM):
+    """Scripted LLM. The answer of every call is `responder(messages)`, and it is delayed by `latency_ms` plus
+    `ms_per_token` for each completion token. The settings are shared by all instances, as roles create theirs.
+
+        MockLLM.configure(responder=my_responder, latency_ms=200, ms_per_token=5)
+    """
+
+    responder: Callable[[list[dict]], str] = staticmethod(echo_format_example)
+    latency_ms: float = 0
+    ms_per_token: float = 0
+    calls: int = 0
+    simulated_seconds: float = 0.0
+
+    def __init__(self):
+        self.model = CONFIG.MOCK_LLM_MODEL or MOCK_LLM_MODEL
+
+    @classmethod
+    def configure(
+        cls,
+        responder: Optional[Callable[[list[dict]], str]] = None,
+        latency_ms: Optional[float] = None,
+        ms_per_token: Optional[float] = None,
+    ):
+        if responder is not None:
+            cls.responder = staticmethod(responder)
+        if latency_ms is not None:
+            cls.latency_ms = latency_ms
+        if ms_per_token is not None:
+            cls.ms_per_token = ms_per_token
+        cls.calls = 0
+        cls.simulated_seconds = 0.0
+
+    def _update_costs(self, usage: dict):
+        if CONFIG.calc_usage:
+            try:
+                CONFIG.cost_manager.update_cost(usage["prompt_tokens"], usage["completion_tokens"], self.model)
+            except Exception as e:
+                logger.error(f"mock updates costs failed! exp: {e}")
+
+    def get_choice_text(self, rsp: dict) -> str:
+        return rsp["choices"][0]["message"]["content"]
+
+    async def _achat_completion(self, messages: list[dict]) -> dict:
+        content = type(self).responder(messages)
+        usage = {
+            "prompt_tokens": sum(count_tokens(i["content"]) for i in messages),
+            "completion_tokens": count_tokens(content),
+        }
+        seconds = (self.latency_ms + self.ms_per_token * usage["completion_tokens"]) / 1000
+        MockLLM.calls += 1
+        MockLLM.simulated_seconds += seconds
+        await asyncio.sleep(seconds)
+        self._update_costs(usage)
+        return {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+
+    async def acompletion(self, messages: list[dict], timeout=3) -> dict:
+        return await self._achat_completion(messages)
+
+    async def acompletion_text(self, messages: list[dict], stream=False, timeout=3) -> str:
+        rsp = await self._achat_completion(messages)
+        text = self.get_choice_text(rsp)
+        if stream:
+            log_llm_stream(text)
+            log_llm_stream("\n")
+        return text
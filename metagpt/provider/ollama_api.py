@@ -24,17 +24,13 @@ from metagpt.utils.cost_manager import CostManager
 
 
 class OllamaCostManager(CostManager):
+    """ollama models are self-hosted, their tokens are counted at no cost"""
+
+    def get_price(self, model: str) -> dict:
+        return {"prompt": 0.0, "completion": 0.0}
+
     def update_cost(self, prompt_tokens, completion_tokens, model):
-        """
-        Update the total cost, prompt tokens, and completion tokens.
-        """
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-        max_budget = CONFIG.max_budget if CONFIG.max_budget else CONFIG.cost_manager.max_budget
-        logger.info(
-            f"Max budget: ${max_budget:.3f} | "
-            f"prompt_tokens: {prompt_tokens}, completion_tokens: {completion_tokens}"
-        )
+        super().update_cost(prompt_tokens, completion_tokens, model)
         CONFIG.total_cost = self.total_cost
 
 
@@ -120,6 +116,7 @@ class OllamaLLM(BaseLLM):
                 # stream finished
                 usage = self.get_usage(chunk)
 
+        log_llm_stream("\n")
         self._update_costs(usage)
         full_content = "".join(collected_content)
         return full_content
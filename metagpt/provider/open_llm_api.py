@@ -15,22 +15,8 @@ from metagpt.utils.token_counter import count_message_tokens, count_string_token
 class OpenLLMCostManager(CostManager):
     """open llm model is self-host, it's free and without cost"""
 
-    def update_cost(self, prompt_tokens, completion_tokens, model):
-        """
-        Update the total cost, prompt tokens, and completion tokens.
-
-        Args:
-        prompt_tokens (int): The number of tokens used in the prompt.
-        completion_tokens (int): The number of tokens used in the completion.
-        model (str): The model used for the API call.
-        """
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-        max_budget = CONFIG.max_budget if CONFIG.max_budget else CONFIG.cost_manager.max_budget
-        logger.info(
-            f"Max budget: ${max_budget:.3f} | reference "
-            f"prompt_tokens: {prompt_tokens}, completion_tokens: {completion_tokens}"
-        )
+    def get_price(self, model: str) -> dict:
+        return {"prompt": 0.0, "completion": 0.0}
 
 
 @register_provider(LLMProviderEnum.OPEN_LLM)
@@ -119,6 +119,7 @@ class ZhiPuAILLM(BaseLLM):
             else:
                 print(f"zhipuapi else event: {event.data}", end="")
 
+        log_llm_stream("\n")
         self._update_costs(usage)
         full_content = "".join(collected_content)
         return full_content
@@ -14,7 +14,8 @@
 @Modified By: mashenquan, 2023-12-5. Enhance the workflow to navigate to WriteCode or QaEngineer based on the results
     of SummarizeCode.
 """
-
+import hashlib
+from pathlib import Path
 
 from metagpt.actions import DebugError, RunCode, WriteTest
 from metagpt.actions.summarize_code import SummarizeCode
@@ -27,9 +28,12 @@ from metagpt.const import (
 from metagpt.logs import logger
 from metagpt.roles import Role
 from metagpt.schema import Document, Message, RunCodeContext, TestingContext
-from metagpt.utils.common import any_to_str_set, parse_recipient
+from metagpt.utils.common import any_to_str_set, parse_recipient, run_concurrently
 from metagpt.utils.file_repository import FileRepository
 
+# Runs a test file with a timeout on each of its tests
+TIMED_UNITTEST = Path(__file__).parent.parent / "utils" / "timed_unittest.py"
+
 
 class QaEngineer(Role):
     name: str = "Edward"
@@ -40,6 +44,12 @@ class QaEngineer(Role):
     )
     test_round_allowed: int = 5
     test_round: int = 0
+    max_concurrency: int = 4  # tests written, run or debugged at a time
+    test_timeout: int = 10  # seconds a test may run
+    test_file_timeout: int = 60  # seconds all the tests of a file may run
+    debug_batch_size: int = 4  # failed test files debugged in one LLM call
+    # test filename -> hash of the source and test code at their last run, unchanged pairs are not run again
+    test_hashes: dict[str, str] = {}
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -57,33 +67,16 @@ class QaEngineer(Role):
         if CONFIG.reqa_file and CONFIG.reqa_file not in changed_files:
             changed_files.add(CONFIG.reqa_file)
         tests_file_repo = CONFIG.git_repo.new_file_repository(TEST_CODES_FILE_REPO)
-        for filename in changed_files:
-            # write tests
-            if not filename or "test" in filename:
-                continue
-            code_doc = await src_file_repo.get(filename)
-            test_doc = await tests_file_repo.get("test_" + code_doc.filename)
-            if not test_doc:
-                test_doc = Document(
-                    root_path=str(tests_file_repo.root_path), filename="test_" + code_doc.filename, content=""
-                )
-            logger.info(f"Writing {test_doc.filename}..")
-            context = TestingContext(filename=test_doc.filename, test_doc=test_doc, code_doc=code_doc)
-            context = await WriteTest(context=context, llm=self.llm).run()
-            await tests_file_repo.save(
-                filename=context.test_doc.filename,
-                content=context.test_doc.content,
-                dependencies={context.code_doc.root_relative_path},
-            )
-
-            # prepare context for run tests in next round
-            run_code_context = RunCodeContext(
-                command=["python", context.test_doc.root_relative_path],
-                code_filename=context.code_doc.filename,
-                test_filename=context.test_doc.filename,
-                working_directory=str(CONFIG.git_repo.workdir),
-                additional_python_paths=[str(CONFIG.src_workspace)],
-            )
+        filenames = sorted(i for i in changed_files if i and "test" not in i)
+        # write tests for all the changed files concurrently
+        run_code_contexts = await run_concurrently(
+            [
+                lambda filename=filename: self._write_test_file(filename, src_file_repo, tests_file_repo)
+                for filename in filenames
+            ],
+            max_concurrency=self.max_concurrency,
+        )
+        for run_code_context in run_code_contexts:
             self.publish_message(
                 Message(
                     content=run_code_context.model_dump_json(),
@@ -96,6 +89,38 @@ class QaEngineer(Role):
 
         logger.info(f"Done {str(tests_file_repo.workdir)} generating.")
 
+    async def _write_test_file(self, filename, src_file_repo, tests_file_repo) -> RunCodeContext:
+        code_doc = await src_file_repo.get(filename)
+        test_doc = await tests_file_repo.get("test_" + code_doc.filename)
+        if not test_doc:
+            test_doc = Document(
+                root_path=str(tests_file_repo.root_path), filename="test_" + code_doc.filename, content=""
+            )
+        logger.info(f"Writing {test_doc.filename}..")
+        context = TestingContext(filename=test_doc.filename, test_doc=test_doc, code_doc=code_doc)
+        context = await WriteTest(context=context, llm=self.llm).run()
+        await tests_file_repo.save(
+            filename=context.test_doc.filename,
+            content=context.test_doc.content,
+            dependencies={context.code_doc.root_relative_path},
+        )
+
+        # prepare context for run tests in next round
+        return RunCodeContext(
+            command=[
+                "python",
+                str(TIMED_UNITTEST),
+                "--timeout",
+                str(self.test_timeout),
+                context.test_doc.root_relative_path,
+            ],
+            code_filename=context.code_doc.filename,
+            test_filename=context.test_doc.filename,
+            working_directory=str(CONFIG.git_repo.workdir),
+            additional_python_paths=[str(CONFIG.src_workspace)],
+            timeout=self.test_file_timeout,
+        )
+
     async def _run_code(self, msg):
         run_code_context = RunCodeContext.loads(msg.content)
         src_doc = await CONFIG.git_repo.new_file_repository(CONFIG.src_workspace).get(run_code_context.code_filename)
@@ -104,9 +129,14 @@ class QaEngineer(Role):
         test_doc = await CONFIG.git_repo.new_file_repository(TEST_CODES_FILE_REPO).get(run_code_context.test_filename)
         if not test_doc:
             return
+        code_hash = hashlib.sha256(f"{src_doc.content}\n{test_doc.content}".encode("utf-8")).hexdigest()
+        if self.test_hashes.get(run_code_context.test_filename) == code_hash:
+            logger.info(f"{run_code_context.test_filename} and its source are unchanged since the last run, skip")
+            return
         run_code_context.code = src_doc.content
         run_code_context.test_code = test_doc.content
         result = await RunCode(context=run_code_context, llm=self.llm).run()
+        self.test_hashes[run_code_context.test_filename] = code_hash
         run_code_context.output_filename = run_code_context.test_filename + ".json"
         await CONFIG.git_repo.new_file_repository(TEST_OUTPUTS_FILE_REPO).save(
             filename=run_code_context.output_filename,
@@ -128,22 +158,33 @@ class QaEngineer(Role):
             )
         )
 
-    async def _debug_error(self, msg):
-        run_code_context = RunCodeContext.loads(msg.content)
-        code = await DebugError(context=run_code_context, llm=self.llm).run()
-        await FileRepository.save_file(
-            filename=run_code_context.test_filename, content=code, relative_path=TEST_CODES_FILE_REPO
+    async def _debug_errors(self, msgs: list[Message]):
+        """Debug the failed tests in batches of `debug_batch_size`, one LLM call per batch."""
+        contexts = [RunCodeContext.loads(msg.content) for msg in msgs]
+        batches = [contexts[i : i + self.debug_batch_size] for i in range(0, len(contexts), self.debug_batch_size)]
+        await run_concurrently(
+            [lambda batch=batch: self._debug_batch(batch) for batch in batches], max_concurrency=self.max_concurrency
         )
-        run_code_context.output = None
-        self.publish_message(
-            Message(
-                content=run_code_context.model_dump_json(),
-                role=self.profile,
-                cause_by=DebugError,
-                sent_from=self,
-                send_to=self,
+
+    async def _debug_batch(self, run_code_contexts: list[RunCodeContext]):
+        codes = await DebugError(llm=self.llm).run_batch(run_code_contexts)
+        for run_code_context in run_code_contexts:
+            code = codes.get(run_code_context.test_filename)
+            if not code:  # the tests passed, or their files are gone
+                continue
+            await FileRepository.save_file(
+                filename=run_code_context.test_filename, content=code, relative_path=TEST_CODES_FILE_REPO
+            )
+            run_code_context.output = None
+            self.publish_message(
+                Message(
+                    content=run_code_context.model_dump_json(),
+                    role=self.profile,
+                    cause_by=DebugError,
+                    sent_from=self,
+                    send_to=self,
+                )
             )
-        )
 
     async def _act(self) -> Message:
         if self.test_round > self.test_round_allowed:
@@ -159,18 +200,19 @@ class QaEngineer(Role):
         code_filters = any_to_str_set({SummarizeCode})
         test_filters = any_to_str_set({WriteTest, DebugError})
         run_filters = any_to_str_set({RunCode})
+        # Decide what to do based on observed msg type, currently defined by human,
+        # might potentially be moved to _think, that is, let the agent decides for itself
         for msg in self.rc.news:
-            # Decide what to do based on observed msg type, currently defined by human,
-            # might potentially be moved to _think, that is, let the agent decides for itself
             if msg.cause_by in code_filters:
                 # engineer wrote a code, time to write a test for it
                 await self._write_test(msg)
-            elif msg.cause_by in test_filters:
-                # I wrote or debugged my test code, time to run it
-                await self._run_code(msg)
-            elif msg.cause_by in run_filters:
-                # I ran my test code, time to fix bugs, if any
-                await self._debug_error(msg)
+        # I wrote or debugged my test code, time to run it, the test files of a round are independent and run
+        # concurrently; I ran my test code, time to fix bugs, if any, the failed tests are debugged in batches.
+        await run_concurrently(
+            [lambda msg=msg: self._run_code(msg) for msg in self.rc.news if msg.cause_by in test_filters],
+            max_concurrency=self.max_concurrency,
+        )
+        await self._debug_errors([msg for msg in self.rc.news if msg.cause_by in run_filters])
         self.test_round += 1
         return Message(
             content=f"Round {self.test_round} of tests done",
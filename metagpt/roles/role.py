@@ -22,6 +22,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from enum import Enum
 from pathlib import Path
 from typing import Any, Iterable, Optional, Set, Type
@@ -37,15 +38,26 @@ from metagpt.logs import logger
 from metagpt.memory import Memory
 from metagpt.provider.base_llm import BaseLLM
 from metagpt.schema import Message, MessageQueue, SerializationMixin
+from metagpt.strategy.planner import (
+    PLAN_FORMAT,
+    PLAN_TEMPLATE,
+    REPLAN_TEMPLATE,
+    Plan,
+    PlanStep,
+)
 from metagpt.utils.common import (
     any_to_name,
     any_to_str,
     import_class,
     read_json_file,
     role_raise_decorator,
+    run_concurrently,
     write_json_file,
 )
+from metagpt.utils.context_window import ContextWindow, render_history
+from metagpt.utils.cost_manager import scoped
 from metagpt.utils.repair_llm_raw_output import extract_state_value_from_output
+from metagpt.utils.tracing import traced
 
 PREFIX_TEMPLATE = """You are a {profile}, named {name}, your goal is {goal}. """
 CONSTRAINT_TEMPLATE = "the constraint is {constraints}. "
@@ -78,10 +90,29 @@ ROLE_TEMPLATE = """Your response should be based on the previous conversation hi
 """
 
 
+def _role_name(role: "Role", *args, **kwargs) -> str:
+    return role._setting
+
+
+def _role_key(role: "Role", *args, **kwargs) -> str:
+    """The key of the role in cost accounting and `ROLE_BUDGETS`."""
+    return role.profile or role.name or type(role).__name__
+
+
+def _instrument(run):
+    """Trace `run` and account its LLM calls to the role."""
+    return scoped(role=_role_key)(traced("role", name=_role_name)(run))
+
+
+def _todo_name(role: "Role", *args, **kwargs) -> str:
+    return any_to_name(role.rc.todo) if role.rc.todo else type(role).__name__
+
+
 class RoleReactMode(str, Enum):
     REACT = "react"
     BY_ORDER = "by_order"
     PLAN_AND_ACT = "plan_and_act"
+    FAN_OUT = "fan_out"
 
     @classmethod
     def values(cls):
@@ -109,6 +140,10 @@ class RoleContext(BaseModel):
         RoleReactMode.REACT
     )  # see `Role._set_react_mode` for definitions of the following two attributes
     max_react_loop: int = 1
+    max_concurrency: int = 4  # actions in flight at a time in fan_out and plan_and_act mode
+    max_retries: int = 2  # times a failed action is rerun in fan_out and plan_and_act mode
+    max_replans: int = 1  # times the failed steps of a plan, and those depending on them, are planned again
+    context_window: ContextWindow = Field(default_factory=ContextWindow.from_config, exclude=True)
 
     def check(self, role_id: str):
         # if hasattr(CONFIG, "long_term_memory") and CONFIG.long_term_memory:
@@ -157,6 +192,14 @@ class Role(SerializationMixin, is_polymorphic_base=True):
             self.subscription = {any_to_str(self), self.name} if self.name else {any_to_str(self)}
         return self
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # instrument the `run` and `_act` of every role, a `super()` call stays in the same span
+        if "run" in cls.__dict__:
+            cls.run = _instrument(cls.run)
+        if "_act" in cls.__dict__:
+            cls._act = traced("act", name=_todo_name)(cls._act)
+
     def __init__(self, **data: Any):
         # --- avoid PydanticUndefinedAnnotation name 'Environment' is not defined #
         from metagpt.environment import Environment
@@ -242,7 +285,7 @@ class Role(SerializationMixin, is_polymorphic_base=True):
             self.actions.append(i)
             self.states.append(f"{idx}. {action}")
 
-    def _set_react_mode(self, react_mode: str, max_react_loop: int = 1):
+    def _set_react_mode(self, react_mode: str, max_react_loop: int = 1, max_concurrency: int = 0):
         """Set strategy of the Role reacting to observed Message. Variation lies in how
         this Role elects action to perform during the _think stage, especially if it is capable of multiple Actions.
 
@@ -252,16 +295,23 @@ class Role(SerializationMixin, is_polymorphic_base=True):
                                  Use llm to select actions in _think dynamically;
                         "by_order": switch action each time by order defined in _init_actions, i.e. _act (Action1) -> _act (Action2) -> ...;
                         "plan_and_act": first plan, then execute an action sequence, i.e. _think (of a plan) -> _act -> _act -> ...
-                                        Use llm to come up with the plan dynamically.
+                                        Use llm to come up with the plan dynamically, a task graph whose independent steps run concurrently.
+                                        The failed steps and those depending on them are planned again, up to `RoleContext.max_replans` times.
+                        "fan_out": run all actions concurrently, for actions independent of each other, i.e. _act (Action1) | _act (Action2) | ...;
+                                   Failed actions are retried alone, the results are kept in the order defined in _init_actions.
                         Defaults to "react".
             max_react_loop (int): Maximum react cycles to execute, used to prevent the agent from reacting forever.
                                   Take effect only when react_mode is react, in which we use llm to choose actions, including termination.
                                   Defaults to 1, i.e. _think -> _act (-> return result and end)
+            max_concurrency (int): Maximum actions in flight. Take effect only when react_mode is fan_out or plan_and_act.
+                                   Defaults to 0, i.e. keep `RoleContext.max_concurrency`.
         """
         assert react_mode in RoleReactMode.values(), f"react_mode must be one of {RoleReactMode.values()}"
         self.rc.react_mode = react_mode
         if react_mode == RoleReactMode.REACT:
             self.rc.max_react_loop = max_react_loop
+        if react_mode in (RoleReactMode.FAN_OUT, RoleReactMode.PLAN_AND_ACT) and max_concurrency > 0:
+            self.rc.max_concurrency = max_concurrency
 
     def _watch(self, actions: Iterable[Type[Action]] | Iterable[Action]):
         """Watch Actions of interest. Role will select Messages caused by these Actions from its personal message
@@ -331,9 +381,10 @@ class Role(SerializationMixin, is_polymorphic_base=True):
             self.set_recovered(False)  # avoid max_react_loop out of work
             return True
 
+        history, summary = await self.rc.context_window.build(self.rc.history, self.llm)
         prompt = self._get_prefix()
         prompt += STATE_TEMPLATE.format(
-            history=self.rc.history,
+            history=render_history(history, summary),
             states="\n".join(self.states),
             n_states=len(self.states) - 1,
             previous_state=self.rc.state,
@@ -353,23 +404,30 @@ class Role(SerializationMixin, is_polymorphic_base=True):
         self._set_state(next_state)
         return True
 
+    @traced("act", name=_todo_name)
     async def _act(self) -> Message:
         logger.info(f"{self._setting}: to do {self.rc.todo}({self.rc.todo.name})")
-        response = await self.rc.todo.run(self.rc.history)
+        msg = await self._run_action(self.rc.todo)
+        self.rc.memory.add(msg)
+
+        return msg
+
+    async def _run_action(self, action: Action, history: list[Message] = None) -> Message:
+        """Run `action` on `history`, `rc.history` by default, and wrap its response into a Message. Unlike `_act`, it
+        neither reads `rc.todo` nor writes the memory, so several actions can run at the same time."""
+        response = await action.run(self.rc.history if history is None else history)
         if isinstance(response, (ActionOutput, ActionNode)):
             msg = Message(
                 content=response.content,
                 instruct_content=response.instruct_content,
                 role=self._setting,
-                cause_by=self.rc.todo,
+                cause_by=action,
                 sent_from=self,
             )
         elif isinstance(response, Message):
             msg = response
         else:
-            msg = Message(content=response, role=self.profile, cause_by=self.rc.todo, sent_from=self)
-        self.rc.memory.add(msg)
-
+            msg = Message(content=response, role=self.profile, cause_by=action, sent_from=self)
         return msg
 
     async def _observe(self, ignore_memory=False) -> int:
@@ -439,19 +497,130 @@ class Role(SerializationMixin, is_polymorphic_base=True):
             rsp = await self._act()
         return rsp  # return output from the last action
 
+    async def _fan_out(self, actions: list[Action]) -> list[Message]:
+        """Run `actions` concurrently under `rc.max_concurrency`, rerunning only the failed ones, and return their
+        messages in the order of `actions`."""
+        logger.info(f"{self._setting}: fan out {len(actions)} actions, {self.rc.max_concurrency} at a time")
+        return await run_concurrently(
+            [lambda action=action: self._run_action(action) for action in actions],
+            max_concurrency=self.rc.max_concurrency,
+            max_retries=self.rc.max_retries,
+        )
+
+    async def _act_fan_out(self) -> Message:
+        """run all actions concurrently, i.e. _act (Action1) | _act (Action2) | ..., and keep their order in memory"""
+        msgs = await self._fan_out(self.actions)
+        self.rc.memory.add_batch(msgs)
+        return msgs[-1] if msgs else Message(content="No actions taken yet")  # return output from the last action
+
+    async def _plan(self) -> Plan:
+        """Ask the llm for a task graph over the actions of the role."""
+        history, summary = await self.rc.context_window.build(self.rc.history, self.llm)
+        prompt = self._get_prefix()
+        prompt += PLAN_TEMPLATE.format(history=render_history(history, summary), actions="\n".join(self.states))
+        prompt += PLAN_FORMAT
+        rsp = await self.llm.aask(prompt)
+        return Plan.parse(rsp, n_actions=len(self.actions))
+
+    async def _replan(self, plan: Plan, outputs: dict[str, Message], errors: dict[str, Exception], n: int) -> Plan:
+        """Plan again the failed steps and those depending on them, keep the done steps."""
+        prompt = self._get_prefix()
+        prompt += REPLAN_TEMPLATE.format(
+            actions="\n".join(self.states),
+            plan=plan.describe(set(outputs), errors),
+            errors="\n".join(f"{k}: {v}" for k, v in errors.items()),
+        )
+        prompt += PLAN_FORMAT
+        rsp = await self.llm.aask(prompt)
+        new_plan = Plan.parse(rsp, n_actions=len(self.actions), done=outputs, prefix=f"r{n}.")
+        return Plan(steps=[i for i in plan.steps if i.id in outputs] + new_plan.steps)
+
+    async def _run_step(self, step: PlanStep, outputs: dict[str, Message]) -> Message:
+        """Run the action of `step` on the history, followed by the outputs of its dependencies and its instruction."""
+        history = self.rc.history + [outputs[i] for i in step.dependencies]
+        if step.instruction:
+            history.append(Message(content=step.instruction, role=self.profile, sent_from=self))
+        logger.info(f"{self._setting}: step {step.id}, {self.actions[step.action].name}: {step.instruction}")
+        return await self._run_action(self.actions[step.action], history=history)
+
+    async def _run_plan(self, plan: Plan, outputs: dict[str, Message]) -> dict[str, Exception]:
+        """Run the steps of `plan` not in `outputs` as soon as their dependencies are done, the ready ones concurrently
+        under `rc.max_concurrency`. Add their outputs to `outputs` and the memory, return the errors of the failed
+        steps, whose dependents are not run."""
+        errors = {}
+        running: dict[asyncio.Task, PlanStep] = {}
+        # shared by all the steps, a step is started when its dependencies are done and waits here for a slot
+        semaphore = asyncio.Semaphore(self.rc.max_concurrency if self.rc.max_concurrency > 0 else len(plan.steps))
+
+        async def run(step: PlanStep):
+            async with semaphore:
+                results = await run_concurrently(
+                    [lambda: self._run_step(step, outputs)], max_retries=self.rc.max_retries, return_exceptions=True
+                )
+            return results[0]
+
+        def start_ready():
+            started = {i.id for i in running.values()}
+            for step in plan.ready(set(outputs), set(errors)):
+                if step.id not in started:
+                    running[asyncio.create_task(run(step))] = step
+
+        start_ready()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step = running.pop(task)
+                    result = task.result()
+                    if isinstance(result, Exception):
+                        errors[step.id] = result
+                    else:
+                        outputs[step.id] = result
+                        self.rc.memory.add(result)
+                start_ready()
+        finally:
+            for task in running:
+                task.cancel()
+        return errors
+
     async def _plan_and_act(self) -> Message:
-        """first plan, then execute an action sequence, i.e. _think (of a plan) -> _act -> _act -> ... Use llm to come up with the plan dynamically."""
-        # TODO: to be implemented
-        return Message(content="")
+        """first plan, then execute an action sequence, i.e. _think (of a plan) -> _act -> _act -> ... Use llm to come up with the plan dynamically.
+        The plan is a task graph, whose independent steps run concurrently. The failed steps and those depending on
+        them are planned again, up to `rc.max_replans` times."""
+        try:
+            plan = await self._plan()
+        except ValueError as e:
+            logger.warning(f"{self._setting}: invalid plan, {e}, run the actions by order instead")
+            return await self._act_by_order()
+        logger.info(f"{self._setting}: plan of {len(plan.steps)} steps")
+        outputs = {}
+        for n in range(self.rc.max_replans + 1):
+            errors = await self._run_plan(plan, outputs)
+            if not errors:
+                break
+            skipped = errors.keys() | plan.dependents(set(errors))
+            if n >= self.rc.max_replans:
+                logger.warning(f"{self._setting}: steps {sorted(skipped)} failed or skipped: {errors}")
+                break
+            logger.info(f"{self._setting}: plan again the steps {sorted(skipped)}, failed with {errors}")
+            try:
+                plan = await self._replan(plan, outputs, errors, n=n + 1)
+            except ValueError as e:
+                logger.warning(f"{self._setting}: invalid plan, {e}, steps {sorted(skipped)} are skipped")
+                break
+        done = [outputs[i.id] for i in plan.steps if i.id in outputs]
+        return done[-1] if done else Message(content="No actions taken yet")  # return output from the last step
 
     async def react(self) -> Message:
-        """Entry to one of three strategies by which Role reacts to the observed Message"""
+        """Entry to one of the strategies by which Role reacts to the observed Message"""
         if self.rc.react_mode == RoleReactMode.REACT:
             rsp = await self._react()
         elif self.rc.react_mode == RoleReactMode.BY_ORDER:
             rsp = await self._act_by_order()
         elif self.rc.react_mode == RoleReactMode.PLAN_AND_ACT:
             rsp = await self._plan_and_act()
+        elif self.rc.react_mode == RoleReactMode.FAN_OUT:
+            rsp = await self._act_fan_out()
         self._set_state(state=-1)  # current reaction is complete, reset state to -1 and todo back to None
         return rsp
 
@@ -459,6 +628,7 @@ class Role(SerializationMixin, is_polymorphic_base=True):
         """A wrapper to return the most recent k memories of this role, return all when k=0"""
         return self.rc.memory.get(k=k)
 
+    @_instrument
     @role_raise_decorator
     async def run(self, with_message=None) -> Message | None:
         """Observe, and think and act based on the results of the observation"""
@@ -46,7 +46,6 @@ class Teacher(Role):
             if not self.rc.news or self.rc.news[0].cause_by != any_to_str(UserRequirement):
                 raise ValueError("Lesson content invalid.")
             actions = []
-            print(TeachingPlanBlock.TOPICS)
             for topic in TeachingPlanBlock.TOPICS:
                 act = WriteTeachingPlanPart(context=self.rc.news[0].content, topic=topic, llm=self.llm)
                 actions.append(act)
@@ -64,16 +63,12 @@ class Teacher(Role):
         return False
 
     async def _react(self) -> Message:
-        ret = Message(content="")
-        while True:
-            await self._think()
-            if self.rc.todo is None:
-                break
-            logger.debug(f"{self._setting}: {self.rc.state=}, will do {self.rc.todo}")
-            msg = await self._act()
-            if ret.content != "":
-                ret.content += "\n\n\n"
-            ret.content += msg.content
+        """The parts of the teaching plan only depend on the lesson, so they are written concurrently and assembled
+        in the order of `TeachingPlanBlock.TOPICS`."""
+        await self._think()
+        msgs = await self._fan_out(self.actions)
+        self.rc.memory.add_batch(msgs)
+        ret = Message(content="\n\n\n".join(msg.content for msg in msgs))
         logger.info(ret.content)
         await self.save(ret.content)
         return ret
@@ -9,6 +9,7 @@
 from datetime import datetime
 from typing import Dict
 
+from metagpt.actions import Action
 from metagpt.actions.write_tutorial import WriteContent, WriteDirectory
 from metagpt.const import TUTORIAL_PATH
 from metagpt.logs import logger
@@ -68,22 +69,29 @@ class TutorialAssistant(Role):
     async def _act(self) -> Message:
         """Perform an action as determined by the role.
 
+        The directory is written first, then the chapters are written concurrently and assembled in directory order.
+
         Returns:
             A message containing the result of the action.
         """
         todo = self.rc.todo
-        if type(todo) is WriteDirectory:
-            msg = self.rc.memory.get(k=1)[0]
-            self.topic = msg.content
-            resp = await todo.run(topic=self.topic)
-            logger.info(resp)
-            await self._handle_directory(resp)
-            return await super().react()
+        msg = self.rc.memory.get(k=1)[0]
+        self.topic = msg.content
         resp = await todo.run(topic=self.topic)
         logger.info(resp)
-        if self.total_content != "":
-            self.total_content += "\n\n\n"
-        self.total_content += resp
+        await self._handle_directory(resp)
+
+        msgs = await self._fan_out(self.actions)
+        for msg in msgs:
+            if self.total_content != "":
+                self.total_content += "\n\n\n"
+            self.total_content += msg.content
+        return msgs[-1] if msgs else Message(content="", role=self.profile)
+
+    async def _run_action(self, action: Action) -> Message:
+        """Write one chapter of the tutorial."""
+        resp = await action.run(topic=self.topic)
+        logger.info(resp)
         return Message(content=resp, role=self.profile)
 
     async def react(self) -> Message:
@@ -419,6 +419,7 @@ class RunCodeContext(BaseContext):
     additional_python_paths: List[str] = Field(default_factory=list)
     output_filename: Optional[str] = None
     output: Optional[str] = None
+    timeout: int = 10  # seconds
 
 
 class RunCodeResult(BaseContext):
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import asyncio
+import json
 from pathlib import Path
 
 import typer
@@ -12,7 +13,7 @@ app = typer.Typer(add_completion=False)
 
 @app.command()
 def startup(
-    idea: str = typer.Argument(..., help="Your innovative idea, such as 'Create a 2048 game.'"),
+    idea: str = typer.Argument(default="", help="Your innovative idea, such as 'Create a 2048 game.'"),
     investment: float = typer.Option(default=3.0, help="Dollar amount to invest in the AI company."),
     n_round: int = typer.Option(default=5, help="Number of rounds for the simulation."),
     code_review: bool = typer.Option(default=True, help="Whether to use code review."),
@@ -33,8 +34,26 @@ def startup(
         "unlimited. This parameter is used for debugging the workflow.",
     ),
     recover_path: str = typer.Option(default=None, help="recover the project from existing serialized storage"),
+    trace: bool = typer.Option(
+        default=False, help="Record the spans of the run under logs/traces, summarized by `--summarize-trace`."
+    ),
+    summarize_trace: str = typer.Option(
+        default=None,
+        help="Summarize where the wall-clock, tokens and cost of a traced run went instead of starting one, from the "
+        "JSONL trace at this path, or the latest under logs/traces with `latest`.",
+    ),
+    trace_depth: int = typer.Option(default=0, help="The deepest level of the flame tree summarized, all when 0."),
+    trace_min_share: float = typer.Option(default=0.0, help="Hide the spans taking less than this share of the run."),
+    trace_otlp: str = typer.Option(
+        default="", help="Also write the summarized spans in the OTLP/JSON format of OpenTelemetry here."
+    ),
 ):
     """Run a startup. Be a boss."""
+    if summarize_trace:
+        return print_trace(summarize_trace, depth=trace_depth, min_share=trace_min_share, otlp=trace_otlp)
+    if not idea and not recover_path:
+        raise typer.BadParameter("Missing the idea, such as 'Create a 2048 game.'", param_hint="'IDEA'")
+
     from metagpt.roles import (
         Architect,
         Engineer,
@@ -72,7 +91,35 @@ def startup(
 
     company.invest(investment)
     company.run_project(idea)
-    asyncio.run(company.run(n_round=n_round))
+    if not (trace or CONFIG.TRACE):
+        asyncio.run(company.run(n_round=n_round))
+        return
+
+    from metagpt.logs import logger
+    from metagpt.utils.tracing import disable_tracing, enable_tracing, span
+
+    trace_path = enable_tracing()
+    try:
+        with span("run", "startup", idea=idea[:200], n_round=n_round):
+            asyncio.run(company.run(n_round=n_round))
+    finally:
+        disable_tracing()
+        logger.info(f"Trace saved to {trace_path}, run `metagpt --summarize-trace {trace_path}` to summarize it")
+
+
+def print_trace(path: str, depth: int = 0, min_share: float = 0.0, otlp: str = ""):
+    """Print the flame summary of the trace at `path`, the latest under logs/traces when `latest`."""
+    from metagpt.utils.tracing import latest_trace, load_spans, summarize, to_otlp
+
+    trace_path = latest_trace() if path == "latest" else Path(path)
+    if not trace_path or not trace_path.exists():
+        raise typer.BadParameter(f"No trace found at {path}, record one with `metagpt --trace`.")
+    spans = load_spans(trace_path)
+    typer.echo(f"{trace_path}: {len(spans)} spans")
+    typer.echo(summarize(spans, max_depth=depth, min_share=min_share))
+    if otlp:
+        Path(otlp).write_text(json.dumps(to_otlp(spans), ensure_ascii=False), encoding="utf-8")
+        typer.echo(f"OTLP spans written to {otlp}")
 
 
 if __name__ == "__main__":
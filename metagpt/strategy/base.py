@@ -35,9 +35,12 @@ class ThoughtNode(Node):
     """A node representing a thought in the thought tree."""
 
     name: str = ""
-    value: int = 0
+    value: int = 0  # accumulated from the root
+    score: float = 0  # evaluation of this thought alone
     id: int = 0
     valid_status: bool = True
+    visits: int = 0  # mcts statistics
+    reward: float = 0
 
     def update_value(self, value) -> None:
         """Update the value of the thought node."""
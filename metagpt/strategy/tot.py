@@ -5,16 +5,17 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, List, Optional
+import math
+from typing import Any, Awaitable, Callable, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from metagpt.llm import LLM
 from metagpt.logs import logger
 from metagpt.provider.base_llm import BaseLLM
 from metagpt.strategy.base import ThoughtNode, ThoughtTree
 from metagpt.strategy.tot_schema import MethodSelect, Strategy, ThoughtSolverConfig
-from metagpt.utils.common import CodeParser
+from metagpt.utils.common import CodeParser, OutputParser
 
 OUTPUT_FORMAT = """
 Each output should be strictly a list of nodes, in json format, like this:
@@ -37,10 +38,25 @@ class ThoughtSolverBase(BaseModel):
     llm: BaseLLM = Field(default_factory=LLM, exclude=True)
     config: ThoughtSolverConfig = Field(default_factory=ThoughtSolverConfig)
 
+    # transposition tables: a state reached again through another path is neither expanded nor evaluated twice
+    _thoughts_cache: dict = PrivateAttr(default_factory=dict)
+    _values_cache: dict = PrivateAttr(default_factory=dict)
+
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
         self.llm.use_system_prompt = False
 
+    @staticmethod
+    async def _cached(cache: dict, key: str, factory: Callable[[], Awaitable]):
+        """Run `factory` once per key, concurrent calls of the same key share its result."""
+        if key not in cache:
+            cache[key] = asyncio.ensure_future(factory())
+        try:
+            return await cache[key]
+        except Exception:
+            cache.pop(key, None)  # let a later call try again
+            raise
+
     async def solve(self, init_prompt):
         """
         Solve method for subclasses to implement.
@@ -58,15 +74,22 @@ class ThoughtSolverBase(BaseModel):
         Returns:
             List[ThoughtNode]: List of nodes representing the generated thoughts.
         """
+        thoughts = await self._cached(self._thoughts_cache, current_state, lambda: self._propose(current_state))
+        return self.thought_tree.update_node(thoughts, current_node=current_node)
+
+    async def _propose(self, current_state: str) -> List[dict]:
         state_prompt = self.config.parser.propose(
             current_state=current_state, **{"n_generate_sample": self.config.n_generate_sample}
         )
         rsp = await self.llm.aask(msg=state_prompt + "\n" + OUTPUT_FORMAT)
-        thoughts = CodeParser.parse_code(block="", text=rsp)
-        thoughts = eval(thoughts)
-        # fixme 避免不跟随，生成过多nodes
-        # valid_thoughts = [_node for idx, _node in enumerate(thoughts) if idx < self.n_generate_sample]
-        return self.thought_tree.update_node(thoughts, current_node=current_node)
+        try:
+            thoughts = OutputParser.extract_struct(CodeParser.parse_code(block="", text=rsp), list)
+        except Exception as e:
+            logger.warning(f"fail to parse thoughts for {e}: {rsp}")
+            return []
+        thoughts = [i for i in thoughts if isinstance(i, dict) and {"node_id", "node_state_instruction"} <= i.keys()]
+        # 避免不跟随，生成过多nodes
+        return thoughts[: self.config.n_generate_sample]
 
     async def evaluate_node(self, node, parent_value) -> None:
         """
@@ -79,16 +102,26 @@ class ThoughtSolverBase(BaseModel):
         Returns:
             None
         """
-        eval_prompt = self.config.parser.value(input=node.name, **{"node_id": node.id})
-        evaluation = await self.llm.aask(msg=eval_prompt)
-
-        value = self.config.evaluator(evaluation, **{"node_id": node.id})
+        value = await self._cached(self._values_cache, node.name, lambda: self._evaluate(node))
         status = self.config.evaluator.status_verify(value)
 
+        node.score = value
         node.update_valid_status(status=status)
         # 累计分数
         node.update_value(parent_value + value)
 
+    async def _evaluate(self, node) -> float:
+        eval_prompt = self.config.parser.value(input=node.name, **{"node_id": node.id})
+        evaluation = await self.llm.aask(msg=eval_prompt)
+        return self.config.evaluator(evaluation, **{"node_id": node.id})
+
+    async def generate_and_evaluate_nodes(self, current_state, current_value, node) -> List[ThoughtNode]:
+        thought_nodes = await self.generate_thoughts(current_state, current_node=node)
+        await asyncio.gather(
+            *(self.evaluate_node(child_node, parent_value=current_value) for child_node in thought_nodes)
+        )
+        return thought_nodes
+
     def select_nodes(self, thought_nodes: List[ThoughtNode]) -> List[ThoughtNode]:
         """
         Select nodes based on the configured selection method.
@@ -169,44 +202,45 @@ class BFSSolver(ThoughtSolverBase):
         solutions = [child_node for thought_nodes in thought_nodes_list for child_node in thought_nodes]
         return solutions
 
-    async def generate_and_evaluate_nodes(self, current_state, current_value, node):
-        thought_nodes = await self.generate_thoughts(current_state, current_node=node)
-        await asyncio.gather(
-            *(self.evaluate_node(child_node, parent_value=current_value) for child_node in thought_nodes)
-        )
-        return thought_nodes
-
 
 class DFSSolver(ThoughtSolverBase):
-    async def _dfs(self, root_node):
+    _n_remaining: int = PrivateAttr(default=0)  # solution paths still to find
+
+    async def _dfs(self, node, depth: int) -> int:
         """
-        Perform Depth-First Search (DFS) on the thought tree.
+        Perform Depth-First Search (DFS) on the thought tree, backtracking from dead ends.
+
+        The children of a node are visited best first. Those evaluated as invalid or scored below
+        `config.value_threshold` are pruned, and the search stops once `config.n_solution_sample` paths
+        reached `config.max_steps`.
 
         Args:
-            root_node (ThoughtNode): The root node of the thought tree.
+            node (ThoughtNode): The node to expand.
+            depth (int): The depth of the node.
 
         Returns:
-            List[str]: The solution path obtained through DFS.
+            int: The number of solution paths found below the node.
         """
-        impossible_state_cnt = 0
-        node = root_node
-        for step in range(self.max_steps):
-            current_state = self.config.parser(node.name)
-            current_value = node.value
-            thought_nodes = await self.generate_thoughts(current_state, current_node=node)
-            await self.evaluate_node(thought_nodes[0], parent_value=current_value)
-            if thought_nodes[0].valid_status is False:
-                impossible_state_cnt += 1
-            if impossible_state_cnt >= 2:
-                logger.info("impossible state reached, break")
+        if depth >= self.config.max_steps:
+            self._n_remaining -= 1
+            return 1
+
+        current_state = self.config.parser(node.name)
+        thought_nodes = await self.generate_and_evaluate_nodes(current_state, node.value, node)
+        found = 0
+        for child in sorted(thought_nodes, key=lambda x: x.score, reverse=True):
+            if self._n_remaining <= 0:
                 break
-            node = thought_nodes[0]
-        _solution_path = self.thought_tree.parse_node_path(node)
-        self.thought_tree.show()
+            if child.valid_status is False or child.score < self.config.value_threshold:
+                child.parent = None  # 剪枝
+                continue
+            child_found = await self._dfs(child, depth + 1)
+            found += child_found
+            if not child_found:
+                child.parent = None  # 回退到父节点，继续探索其他节点
+        return found
 
-        return _solution_path
-
-    async def solve(self, init_prompt="", root=ThoughtNode("")):
+    async def solve(self, init_prompt=""):
         """
         Solve the problem using Depth-First Search (DFS) strategy.
 
@@ -218,9 +252,9 @@ class DFSSolver(ThoughtSolverBase):
         """
         root = ThoughtNode(init_prompt)
         self.thought_tree = ThoughtTree(root)
-        for n in range(self.config.n_solution_sample):
-            # fixme: 需要产生回退，当前节点不可用时回退到父节点，产生新的节点继续探索
-            await self._dfs(root)
+        self._n_remaining = self.config.n_solution_sample
+        await self._dfs(root, depth=0)
+        self.thought_tree.show()
 
         best_solution, best_solution_path = self.update_solution()
         logger.info(f"best solution is: {best_solution_path}")
@@ -228,8 +262,91 @@ class DFSSolver(ThoughtSolverBase):
 
 
 class MCTSSolver(ThoughtSolverBase):
+    """Monte Carlo Tree Search: each simulation descends the tree by UCT, expands a leaf with the llm and backs its
+    evaluation up to the root. Up to `config.max_concurrency` simulations run concurrently, a virtual loss on the
+    nodes being explored spreads them over different branches."""
+
+    _expansions: dict = PrivateAttr(default_factory=dict)
+    _max_score: float = PrivateAttr(default=0.0)
+
     async def solve(self, init_prompt=""):
-        raise NotImplementedError
+        """
+        Solve the problem using Monte Carlo Tree Search (MCTS) strategy.
+
+        Args:
+            init_prompt (str): The initial prompt for the solver.
+
+        Returns:
+            List[str]: The most visited solution path.
+        """
+        root = ThoughtNode(init_prompt)
+        self.thought_tree = ThoughtTree(root)
+        self._expansions = {}
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
+
+        async def simulate():
+            async with semaphore:
+                await self._simulate(root)
+
+        await asyncio.gather(*(simulate() for _ in range(self.config.n_simulations)))
+        self.thought_tree.show()
+
+        best_solution_path = self.thought_tree.parse_node_path(self._best_leaf(root))
+        logger.info(f"best solution is: {best_solution_path}")
+        return best_solution_path
+
+    async def _simulate(self, root: ThoughtNode):
+        path = [root]
+        node = root
+        # visits count on the way down, before the backup adds the reward: until then concurrent simulations see a
+        # lower mean reward on this path (a virtual loss), the visits themselves are kept
+        node.visits += 1
+        while node.depth < self.config.max_steps:
+            children = await self._expand(node)
+            if not children:
+                break
+            node = self._select(node, children)
+            node.visits += 1
+            path.append(node)
+            if node.visits == 1:
+                break  # a new leaf, its evaluation is the rollout value
+        self._max_score = max(self._max_score, node.score)
+        reward = node.value / max(node.depth, 1)  # mean score of the thoughts along the path
+        for i in path:
+            i.reward += reward
+
+    async def _expand(self, node: ThoughtNode) -> List[ThoughtNode]:
+        """Generate and evaluate the children of a node once, concurrent simulations share the expansion."""
+        if node not in self._expansions:
+            current_state = self.config.parser(node.name)
+            self._expansions[node] = asyncio.ensure_future(
+                self.generate_and_evaluate_nodes(current_state, node.value, node)
+            )
+        children = await self._expansions[node]
+        return [i for i in children if i.valid_status is not False]
+
+    def _select(self, node: ThoughtNode, children: List[ThoughtNode]) -> ThoughtNode:
+        unvisited = [i for i in children if i.visits == 0]
+        if unvisited:
+            return max(unvisited, key=lambda x: x.score)
+        scale = self._max_score or 1
+
+        def uct(child: ThoughtNode) -> float:
+            exploitation = child.reward / child.visits / scale
+            exploration = self.config.exploration_weight * math.sqrt(math.log(node.visits) / child.visits)
+            return exploitation + exploration
+
+        return max(children, key=uct)
+
+    @staticmethod
+    def _best_leaf(root: ThoughtNode) -> ThoughtNode:
+        """Follow the most visited children, then the best evaluated ones below the explored part of the tree."""
+        node = root
+        while True:
+            children = [i for i in node.children if i.valid_status is not False]
+            if not children:
+                return node
+            node = max(children, key=lambda x: (x.visits, x.score))
 
 
 class TreeofThought(BaseModel):
@@ -274,4 +391,4 @@ class TreeofThought(BaseModel):
         Returns:
             Any: The solution obtained using the selected strategy.
         """
-        await self.solver.solve(init_prompt)
+        return await self.solver.solve(init_prompt)
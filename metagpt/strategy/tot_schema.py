@@ -26,5 +26,9 @@ class ThoughtSolverConfig(BaseModel):
     n_generate_sample: int = 5  # per node
     n_select_sample: int = 3  # per path
     n_solution_sample: int = 5  # only for dfs
+    value_threshold: float = 0.0  # only for dfs, thoughts scored below it are pruned
+    n_simulations: int = 16  # only for mcts
+    exploration_weight: float = 1.0  # only for mcts, the exploration constant of UCT
+    max_concurrency: int = 4  # only for mcts, rollouts in flight
     parser: BaseParser = Field(default_factory=BaseParser)
     evaluator: BaseEvaluator = Field(default_factory=BaseEvaluator)
@@ -1,7 +1,8 @@
 import asyncio
-from typing import AsyncGenerator, Awaitable, Callable
+import itertools
+from typing import AsyncGenerator, Awaitable, Callable, Optional, Union
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from metagpt.logs import logger
 from metagpt.roles import Role
@@ -37,41 +38,123 @@ class SubscriptionRunner(BaseModel):
 
     tasks: dict[Role, asyncio.Task] = Field(default_factory=dict)
 
+    # set whenever `tasks` changes, to wake up `run`
+    _changed: Optional[asyncio.Event] = PrivateAttr(default=None)
+
     async def subscribe(
         self,
         role: Role,
-        trigger: AsyncGenerator[Message, None],
+        trigger: Union[AsyncGenerator[Message, None], Callable[[], AsyncGenerator[Message, None]]],
         callback: Callable[
             [
                 Message,
             ],
             Awaitable[None],
         ],
+        max_concurrency: int = 1,
+        max_restarts: int = 0,
     ):
         """Subscribes a role to a trigger and sets up a callback to be called with the role's response.
 
         Args:
             role: The role to subscribe.
-            trigger: An asynchronous generator that yields Messages to be processed by the role.
+            trigger: An asynchronous generator that yields Messages to be processed by the role, or a function
+                creating one, which lets a crashed subscription restart from a fresh trigger.
             callback: An asynchronous function to be called with the response from the role.
+            max_concurrency: Maximum trigger messages processed by the role at a time. The trigger is not pulled
+                while they are all in flight. Only raise it for roles whose `run` may be called concurrently.
+            max_restarts: Times the subscription is restarted, with exponential backoff, after it crashed.
         """
         loop = asyncio.get_running_loop()
-
-        async def _start_role():
-            async for msg in trigger:
-                resp = await role.run(msg)
-                await callback(resp)
-
-        self.tasks[role] = loop.create_task(_start_role(), name=f"Subscription-{role}")
+        self.tasks[role] = loop.create_task(
+            self._run_subscription(role, trigger, callback, max_concurrency, max_restarts),
+            name=f"Subscription-{role}",
+        )
+        self._notify()
 
     async def unsubscribe(self, role: Role):
-        """Unsubscribes a role from its trigger and cancels the associated task.
+        """Unsubscribes a role from its trigger and cancels the associated task, waiting for the messages in flight
+        to be cancelled.
 
         Args:
             role: The role to unsubscribe.
         """
         task = self.tasks.pop(role)
+        self._notify()
         task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _run_subscription(self, role: Role, trigger, callback, max_concurrency: int, max_restarts: int):
+        messages = trigger() if callable(trigger) else trigger
+        for attempt in itertools.count():
+            try:
+                return await self._consume(role, messages, callback, max_concurrency)
+            except Exception as e:
+                if attempt >= max_restarts:
+                    raise
+                delay = min(2**attempt, 60)
+                logger.opt(exception=e).warning(
+                    f"Subscription of {role} crashed, restart {attempt + 1}/{max_restarts} in {delay}s"
+                )
+                await asyncio.sleep(delay)
+                if callable(trigger):
+                    messages = trigger()
+
+    @staticmethod
+    async def _consume(role: Role, messages: AsyncGenerator[Message, None], callback, max_concurrency: int):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        workers: set[asyncio.Task] = set()
+        failed = loop.create_future()  # the first error of the workers, raised from here
+
+        async def handle(msg: Message):
+            try:
+                resp = await role.run(msg)
+                await callback(resp)
+            finally:
+                semaphore.release()
+
+        def on_done(task: asyncio.Task):
+            workers.discard(task)
+            if not task.cancelled() and task.exception() and not failed.done():
+                failed.set_exception(task.exception())
+
+        async def or_failed(aw: Awaitable):
+            """Wait for `aw`, unless a worker fails first."""
+            waiter = asyncio.ensure_future(aw)
+            try:
+                await asyncio.wait({waiter, failed}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not waiter.done():
+                    waiter.cancel()
+            if failed.done():
+                failed.result()
+            return waiter.result()
+
+        iterator = messages.__aiter__()
+        try:
+            while True:
+                await or_failed(semaphore.acquire())  # backpressure: the trigger waits for a free slot
+                try:
+                    msg = await or_failed(iterator.__anext__())
+                except StopAsyncIteration:
+                    semaphore.release()
+                    break
+                worker = loop.create_task(handle(msg))
+                workers.add(worker)
+                worker.add_done_callback(on_done)
+            while workers:
+                await or_failed(asyncio.wait(set(workers)))
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if failed.done():
+                failed.exception()  # retrieved, it is raised from `or_failed` or superseded by a cancellation
 
     async def run(self, raise_exception: bool = True):
         """Runs all subscribed tasks and handles their completion or exception.
@@ -82,19 +165,27 @@ class SubscriptionRunner(BaseModel):
         Raises:
             task.exception: _description_
         """
+        self._changed = self._changed or asyncio.Event()
         while True:
-            for role, task in self.tasks.items():
-                if task.done():
-                    if task.exception():
-                        if raise_exception:
-                            raise task.exception()
-                        logger.opt(exception=task.exception()).error(f"Task {task.get_name()} run error")
-                    else:
-                        logger.warning(
-                            f"Task {task.get_name()} has completed. "
-                            "If this is unexpected behavior, please check the trigger function."
-                        )
-                    self.tasks.pop(role)
-                    break
-            else:
-                await asyncio.sleep(1)
+            self._changed.clear()
+            changed = asyncio.ensure_future(self._changed.wait())
+            try:
+                # woken up by a finished subscription or a change of the subscriptions, nothing is polled
+                done, _ = await asyncio.wait({changed, *self.tasks.values()}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+            for role, task in list(self.tasks.items()):
+                if task not in done:
+                    continue
+                self.tasks.pop(role)
+                if task.cancelled():
+                    continue
+                if task.exception():
+                    if raise_exception:
+                        raise task.exception()
+                    logger.opt(exception=task.exception()).error(f"Task {task.get_name()} run error")
+                else:
+                    logger.warning(
+                        f"Task {task.get_name()} has completed. "
+                        "If this is unexpected behavior, please check the trigger function."
+                    )
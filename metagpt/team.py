@@ -21,12 +21,7 @@ from metagpt.environment import Environment
 from metagpt.logs import logger
 from metagpt.roles import Role
 from metagpt.schema import Message
-from metagpt.utils.common import (
-    NoMoneyException,
-    read_json_file,
-    serialize_decorator,
-    write_json_file,
-)
+from metagpt.utils.common import read_json_file, serialize_decorator, write_json_file
 
 
 class Team(BaseModel):
@@ -83,14 +78,12 @@ class Team(BaseModel):
         """Invest company. raise NoMoneyException when exceed max_budget."""
         self.investment = investment
         CONFIG.max_budget = investment
+        CONFIG.cost_manager.max_budget = investment
         logger.info(f"Investment: ${investment}.")
 
     @staticmethod
     def _check_balance():
-        if CONFIG.cost_manager.total_cost > CONFIG.cost_manager.max_budget:
-            raise NoMoneyException(
-                CONFIG.cost_manager.total_cost, f"Insufficient funds: {CONFIG.cost_manager.max_budget}"
-            )
+        CONFIG.cost_manager.check_budget()
 
     def run_project(self, idea, send_to: str = ""):
         """Run a project from publishing user requirement."""
@@ -131,5 +124,6 @@ class Team(BaseModel):
             self._check_balance()
 
             await self.env.run()
+        CONFIG.cost_manager.log_summary()
         self.env.archive(auto_archive)
         return self.env.history
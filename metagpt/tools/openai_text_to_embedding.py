@@ -15,6 +15,7 @@ from pydantic import BaseModel, Field
 
 from metagpt.config import CONFIG
 from metagpt.logs import logger
+from metagpt.utils.embedding import EMBEDDING_MAX_BATCH
 
 
 class Embedding(BaseModel):
@@ -52,20 +53,30 @@ class OpenAIText2Embedding:
     async def text_2_embedding(self, text, model="text-embedding-ada-002"):
         """Text to embedding
 
-        :param text: The text used for embedding.
+        :param text: The text used for embedding, or a list of texts which are sent in batches up to the model limit.
         :param model: One of ['text-embedding-ada-002'], ID of the model to use. For more details, checkout: `https://api.openai.com/v1/models`.
         :return: A json object of :class:`ResultEmbedding` class if successful, otherwise `{}`.
         """
 
         proxies = {"proxy": CONFIG.openai_proxy} if CONFIG.openai_proxy else {}
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.openai_api_key}"}
-        data = {"input": text, "model": model}
         url = "https://api.openai.com/v1/embeddings"
+        texts = [text] if isinstance(text, str) else list(text)
+        batch_size = EMBEDDING_MAX_BATCH.get(model, 1000)
+        result = ResultEmbedding()
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, **proxies) as response:
-                    data = await response.json()
-                    return ResultEmbedding(**data)
+                for offset in range(0, len(texts), batch_size):
+                    data = {"input": texts[offset : offset + batch_size], "model": model}
+                    async with session.post(url, headers=headers, json=data, **proxies) as response:
+                        batch = ResultEmbedding(**await response.json())
+                    for i in batch.data:
+                        i.index += offset
+                    result.data.extend(batch.data)
+                    result.model = batch.model
+                    result.usage.prompt_tokens += batch.usage.prompt_tokens
+                    result.usage.total_tokens += batch.usage.total_tokens
+                return result
         except requests.exceptions.RequestException as e:
             logger.error(f"An error occurred:{e}")
         return ResultEmbedding()
@@ -75,7 +86,7 @@ class OpenAIText2Embedding:
 async def oas3_openai_text_to_embedding(text, model="text-embedding-ada-002", openai_api_key=""):
     """Text to embedding
 
-    :param text: The text used for embedding.
+    :param text: The text used for embedding, or a list of texts embedded in batches.
     :param model: One of ['text-embedding-ada-002'], ID of the model to use. For more details, checkout: `https://api.openai.com/v1/models`.
     :param openai_api_key: OpenAI API key, For more details, checkout: `https://platform.openai.com/account/api-keys`
     :return: A json object of :class:`ResultEmbedding` class if successful, otherwise `{}`.
@@ -4,6 +4,7 @@
 # @Desc    :
 import asyncio
 import base64
+import copy
 import io
 import json
 from os.path import join
@@ -15,6 +16,7 @@ from PIL import Image, PngImagePlugin
 from metagpt.config import CONFIG
 from metagpt.const import SD_OUTPUT_FILE_REPO
 from metagpt.logs import logger
+from metagpt.utils.common import run_concurrently
 
 payload = {
     "prompt": "",
@@ -48,17 +50,43 @@ payload = {
 }
 
 default_negative_prompt = "(easynegative:0.8),black, dark,Low resolution"
+# Requests in flight to the SD server, a single webui instance renders one batch at a time
+DEFAULT_SD_MAX_CONCURRENCY = 2
 
 
 class SDEngine:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 0):
         # Initialize the SDEngine with configuration
         self.sd_url = CONFIG.get("SD_URL")
         self.sd_t2i_url = f"{self.sd_url}{CONFIG.get('SD_T2I_API')}"
         # Define default payload settings for SD API
-        self.payload = payload
+        self.payload = copy.deepcopy(payload)
+        self.max_concurrency = max_concurrency or int(CONFIG.SD_MAX_CONCURRENCY or DEFAULT_SD_MAX_CONCURRENCY)
+        self._session = None
+        # Inside `async with`, the session is kept across calls and closed on exit, else each `run_t2i` closes it
+        self._entered = False
         logger.info(self.sd_t2i_url)
 
+    @property
+    def session(self) -> ClientSession:
+        # One session, and so one connection pool, for all the requests of the engine
+        if self._session is None or self._session.closed:
+            self._session = ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        self._entered = True
+        return self
+
+    async def __aexit__(self, *args):
+        self._entered = False
+        await self.close()
+
     def construct_payload(
         self,
         prompt,
@@ -74,7 +102,8 @@ class SDEngine:
         self.payload["height"] = height
         self.payload["override_settings"]["sd_model_checkpoint"] = sd_model
         logger.info(f"call sd payload is {self.payload}")
-        return self.payload
+        # a copy, so that payloads constructed one after another can be sent concurrently
+        return copy.deepcopy(self.payload)
 
     def _save(self, imgs, save_name=""):
         save_dir = CONFIG.workspace_path / SD_OUTPUT_FILE_REPO
@@ -83,14 +112,22 @@ class SDEngine:
         batch_decode_base64_to_image(imgs, str(save_dir), save_name=save_name)
 
     async def run_t2i(self, prompts: List):
-        # Asynchronously run the SD API for multiple prompts
-        session = ClientSession()
-        for payload_idx, payload in enumerate(prompts):
-            results = await self.run(url=self.sd_t2i_url, payload=payload, session=session)
-            self._save(results, save_name=f"output_{payload_idx}")
-        await session.close()
-
-    async def run(self, url, payload, session):
+        # Run the SD API for multiple payloads, `max_concurrency` requests at a time, images are decoded and
+        # saved in worker threads so that the event loop keeps feeding the server
+        async def generate(payload_idx, payload):
+            results = await self.run(url=self.sd_t2i_url, payload=payload, session=self.session)
+            await asyncio.to_thread(self._save, results, save_name=f"output_{payload_idx}")
+
+        try:
+            await run_concurrently(
+                [lambda i=i, p=p: generate(i, p) for i, p in enumerate(prompts)], max_concurrency=self.max_concurrency
+            )
+        finally:
+            if not self._entered:
+                await self.close()
+
+    async def run(self, url, payload, session=None):
+        session = session or self.session
         # Perform the HTTP POST request to the SD API
         async with session.post(url, json=payload, timeout=600) as rsp:
             data = await rsp.read()
@@ -119,15 +156,17 @@ def decode_base64_to_image(img, save_name):
 
 def batch_decode_base64_to_image(imgs, save_dir="", save_name=""):
     for idx, _img in enumerate(imgs):
-        save_name = join(save_dir, save_name)
-        decode_base64_to_image(_img, save_name=save_name)
+        # number the images of a batch so that they do not overwrite each other
+        name = save_name if idx == 0 else f"{save_name}_{idx}"
+        decode_base64_to_image(_img, save_name=join(save_dir, name))
 
 
 if __name__ == "__main__":
     engine = SDEngine()
     prompt = "pixel style, game design, a game interface should be minimalistic and intuitive with the score and high score displayed at the top. The snake and its food should be easily distinguishable. The game should have a simple color scheme, with a contrasting color for the snake and its food. Complete interface boundary"
 
-    engine.construct_payload(prompt)
+    async def main():
+        async with engine:
+            await engine.run_t2i([engine.construct_payload(prompt)])
 
-    event_loop = asyncio.get_event_loop()
-    event_loop.run_until_complete(engine.run_t2i(prompt))
+    asyncio.run(main())
@@ -5,13 +5,79 @@
 @Author  : alexanderwu
 @File    : search_engine.py
 """
+import asyncio
+import copy
+import hashlib
 import importlib
-from typing import Callable, Coroutine, Literal, Optional, Union, overload
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Coroutine, Dict, Literal, Optional, Tuple, Union, overload
 
 from semantic_kernel.skill_definition import sk_function
 
 from metagpt.config import CONFIG
+from metagpt.const import DATA_PATH
+from metagpt.logs import logger
 from metagpt.tools import SearchEngineType
+from metagpt.utils.tracing import traced
+
+DEFAULT_SEARCH_CACHE_TTL = 24 * 3600
+
+
+class SearchCache:
+    """Persistent `(engine, query, max_results, as_string) -> result` mapping with expiry, backed by sqlite."""
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_SEARCH_CACHE_TTL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(engine: str, query: str, max_results: int, as_string: bool) -> str:
+        return hashlib.sha256(json.dumps([engine, query, max_results, as_string]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT result, expires FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, result, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time() + self.ttl),
+            )
+            self._conn.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+            self._conn.commit()
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+# Searches in flight, so that identical concurrent queries share one request: (event loop, cache key) -> future.
+_inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Return the process-wide search cache, `None` if `SEARCH_CACHE` is disabled in config."""
+    global _cache
+    if str(CONFIG.SEARCH_CACHE).lower() == "false":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            path = Path(CONFIG.SEARCH_CACHE_PATH or DATA_PATH / "search_cache.sqlite3")
+            _cache = SearchCache(path, ttl=float(CONFIG.SEARCH_CACHE_TTL or DEFAULT_SEARCH_CACHE_TTL))
+        return _cache
 
 
 class SkSearchEngine:
@@ -32,20 +98,42 @@ class SkSearchEngine:
 class SearchEngine:
     """Class representing a search engine.
 
+    Results are cached on disk for `SEARCH_CACHE_TTL` seconds, and identical concurrent queries share one request.
+    With several engines, from `engines` or `SEARCH_ENGINES` in config, every query is sent to all of them in
+    parallel and the fastest non-empty result (`fan_out="first"`) or the union of the results (`fan_out="merge"`)
+    is returned.
+
     Args:
         engine: The search engine type. Defaults to the search engine specified in the config.
         run_func: The function to run the search. Defaults to None.
+        engines: The search engine types to fan out to. Defaults to `SEARCH_ENGINES` in config, if any.
+        fan_out: How the results of several engines are combined, "first" or "merge". Defaults to
+            `SEARCH_FAN_OUT` in config, or "first".
 
     Attributes:
         run_func: The function to run the search.
         engine: The search engine type.
+        engines: The search engines queried in parallel, empty for a single engine.
     """
 
     def __init__(
         self,
         engine: Optional[SearchEngineType] = None,
         run_func: Callable[[str, int, bool], Coroutine[None, None, Union[str, list[str]]]] = None,
+        engines: Optional[list[SearchEngineType]] = None,
+        fan_out: Optional[Literal["first", "merge"]] = None,
     ):
+        if engines is None and engine is None and run_func is None and CONFIG.SEARCH_ENGINES:
+            engines = [SearchEngineType(i.strip()) for i in str(CONFIG.SEARCH_ENGINES).split(",") if i.strip()]
+        self.engines = [SearchEngine(engine=i) for i in engines or []]
+        self.fan_out = fan_out or CONFIG.SEARCH_FAN_OUT or "first"
+        if len(self.engines) == 1:
+            engine, self.engines = self.engines[0].engine, []
+        if self.engines:
+            self.engine = self.engines[0].engine
+            self.run_func = self._run_fan_out
+            return
+
         engine = engine or CONFIG.search_engine
         if engine == SearchEngineType.SERPAPI_GOOGLE:
             module = "metagpt.tools.search_engine_serpapi"
@@ -84,6 +172,11 @@ class SearchEngine:
     ) -> list[dict[str, str]]:
         ...
 
+    @traced(
+        "tool",
+        name="search",
+        attributes=lambda self, query, *args, **kwargs: {"engine": str(self.engine.value), "query": query[:200]},
+    )
     async def run(self, query: str, max_results: int = 8, as_string: bool = True) -> Union[str, list[dict[str, str]]]:
         """Run a search query.
 
@@ -95,4 +188,84 @@ class SearchEngine:
         Returns:
             The search results as a string or a list of dictionaries.
         """
-        return await self.run_func(query, max_results=max_results, as_string=as_string)
+        cache = get_search_cache()
+        if self.engine == SearchEngineType.CUSTOM_ENGINE and not self.engines:
+            cache = None  # the results of a custom function can not be told apart from those of another one
+        if cache is None:
+            return await self.run_func(query, max_results=max_results, as_string=as_string)
+
+        if self.engines:
+            name = ",".join(i.engine.value for i in self.engines) + f":{self.fan_out}"
+        else:
+            name = self.engine.value
+        key = cache.key(name, query, max_results, as_string)
+        # sqlite calls block, they run in a thread not to stall the event loop
+        result = await asyncio.to_thread(cache.get, key)
+        if result is not None:
+            logger.debug(f"Search cache hit: {name} {query}")
+            return result
+
+        loop = asyncio.get_running_loop()
+        task = _inflight.get((loop, key))
+        if task is None:
+            task = loop.create_task(self._search_and_cache(cache, key, query, max_results, as_string))
+            _inflight[(loop, key)] = task
+            task.add_done_callback(lambda _: _inflight.pop((loop, key), None))
+        # shielded, so that a cancelled caller does not cancel the search of the others; callers may mutate the
+        # results, everyone gets their own copy
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _search_and_cache(self, cache: SearchCache, key: str, query: str, max_results: int, as_string: bool):
+        result = await self.run_func(query, max_results=max_results, as_string=as_string)
+        if result:
+            await asyncio.to_thread(cache.set, key, result)
+        return result
+
+    async def _run_fan_out(self, query: str, max_results: int = 8, as_string: bool = True):
+        """Query the engines in parallel. As a string, the results are formatted as by the engine which answered
+        first with `fan_out="first"`, or as by the first engine with `fan_out="merge"`."""
+        tasks = {
+            asyncio.create_task(i.run(query, max_results=max_results, as_string=False)): i.engine for i in self.engines
+        }
+        engine = self.engine
+        try:
+            if self.fan_out == "merge":
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                result = _merge_results([i for i in results if isinstance(i, list)], max_results)
+            else:
+                result = []
+                pending = set(tasks)
+                while pending and not result:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is not None:
+                            logger.warning(f"Search engine {tasks[task].value} failed for {query}: {task.exception()}")
+                        elif task.result() and not result:
+                            result, engine = task.result(), tasks[task]
+        finally:
+            for task in tasks:
+                task.cancel()
+        if not result and all(task.done() and not task.cancelled() and task.exception() for task in tasks):
+            raise next(iter(tasks)).exception()
+        return _format_results(engine, result) if as_string else result
+
+
+def _format_results(engine: SearchEngineType, results: list[dict]) -> str:
+    """The results as a string, in the format of `engine` when it is run alone."""
+    if engine in (SearchEngineType.SERPAPI_GOOGLE, SearchEngineType.SERPER_GOOGLE):
+        answer = next((i["snippet"] for i in results if i.get("snippet")), "No good search result found")
+        return str(answer) + "\n" + str(results)
+    if engine == SearchEngineType.DIRECT_GOOGLE:
+        return json.dumps(results)
+    return json.dumps(results, ensure_ascii=False)
+
+
+def _merge_results(results: list[list[dict]], max_results: int) -> list[dict]:
+    """Interleave the results of several engines, in their rank order, dropping the links seen before."""
+    merged, seen = [], set()
+    for rank in range(max((len(i) for i in results), default=0)):
+        for items in results:
+            if rank < len(items) and items[rank].get("link") not in seen:
+                seen.add(items[rank].get("link"))
+                merged.append(items[rank])
+    return merged[:max_results]
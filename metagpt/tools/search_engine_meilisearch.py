@@ -5,14 +5,29 @@
 @Author  : alexanderwu
 @File    : search_engine_meilisearch.py
 """
+from __future__ import annotations
 
-from typing import List
+import itertools
+import json
+import re
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Union
 
-import meilisearch
-from meilisearch.index import Index
+from meilisearch_python_sdk import AsyncClient
+from meilisearch_python_sdk.errors import MeilisearchError, MeilisearchTaskFailedError
 
+from metagpt.config import CONFIG
+from metagpt.logs import logger
+from metagpt.utils.common import run_concurrently
 from metagpt.utils.exceptions import handle_exception
 
+# Documents sent in one request, requests in flight, and seconds to wait for the server to index them
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TASK_TIMEOUT = 60
+
+Filter = Union[str, List[Union[str, List[str]]]]
+
 
 class DataSource:
     def __init__(self, name: str, url: str):
@@ -21,22 +36,245 @@ class DataSource:
 
 
 class MeilisearchEngine:
-    def __init__(self, url, token):
-        self.client = meilisearch.Client(url, token)
-        self._index: Index = None
+    """Asyncio front of a Meilisearch server, on the `AsyncClient` of the official `meilisearch-python-sdk`.
+
+    Existing indexes are remembered so they are checked only once. Documents are uploaded in batches of
+    `batch_size`, up to `max_concurrency` requests at a time, and by default `add_documents` returns only after the
+    server has indexed them. `run` can be passed to `SearchEngine` as the `run_func` of a custom engine.
+
+    Unlike the synchronous `meilisearch` client used before, `add_documents` and `search` are coroutines.
+    """
+
+    # A process-wide client replacing the real server, such as `MemoryMeilisearchClient` in tests.
+    _stand_in = None
+
+    def __init__(
+        self,
+        url: str = "",
+        token: str = "",
+        batch_size: int = 0,
+        max_concurrency: int = 0,
+        task_timeout: float = 0,
+    ):
+        self.url = url or CONFIG.MEILISEARCH_URL
+        self.token = token or CONFIG.MEILISEARCH_API_KEY or None
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.task_timeout = task_timeout or DEFAULT_TASK_TIMEOUT
+        self._client: Optional[AsyncClient] = None
+        self._index: Optional[str] = None
+        self._indexes = set()
+
+    @classmethod
+    def use_client(cls, client):
+        """Route every `MeilisearchEngine` of the process to `client`, `None` restores the configured server."""
+        cls._stand_in = client
+
+    @property
+    def client(self):
+        if self._stand_in is not None:
+            return self._stand_in
+        if self._client is None:
+            self._client = AsyncClient(self.url, self.token)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
 
-    def set_index(self, index):
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def set_index(self, index: str):
         self._index = index
 
-    def add_documents(self, data_source: DataSource, documents: List[dict]):
+    async def _ensure_index(self, uid: str):
+        if uid not in self._indexes:
+            # also returns the index when another caller created it meanwhile
+            await self.client.get_or_create_index(uid, primary_key="id")
+            self._indexes.add(uid)
+
+    async def add_documents(self, data_source: DataSource, documents: List[dict], wait: bool = True) -> List[int]:
+        """Upload `documents` into the index of `data_source`, created if missing, and make it the searched index.
+
+        :return: The uids of the indexing tasks, which are completed unless `wait` is False.
+        """
+        index_name = f"{data_source.name}_index"
+        await self._ensure_index(index_name)
+        index = self.client.index(index_name)
+        batches = [documents[i : i + self.batch_size] for i in range(0, len(documents), self.batch_size)]
+        tasks = await run_concurrently(
+            [lambda batch=batch: index.add_documents(batch, primary_key="id") for batch in batches],
+            max_concurrency=self.max_concurrency,
+            max_retries=1,
+        )
+        task_uids = [task.task_uid for task in tasks]
+        if wait:
+            await self.wait_for_tasks(task_uids)
+        logger.debug(f"Add {len(documents)} documents to {index_name} in {len(batches)} batches")
+        self.set_index(index_name)
+        return task_uids
+
+    async def set_filterable_attributes(self, data_source: DataSource, attributes: List[str]):
+        """Declare the attributes `search` may filter on, Meilisearch rejects filters on the others."""
         index_name = f"{data_source.name}_index"
-        if index_name not in self.client.get_indexes():
-            self.client.create_index(uid=index_name, options={"primaryKey": "id"})
-        index = self.client.get_index(index_name)
-        index.add_documents(documents)
-        self.set_index(index)
+        await self._ensure_index(index_name)
+        task = await self.client.index(index_name).update_filterable_attributes(attributes)
+        await self.wait_for_tasks([task.task_uid])
+
+    async def wait_for_tasks(self, task_uids: List[int]) -> list:
+        """Wait for the tasks to be processed, raise `MeilisearchTaskFailedError` if one fails and
+        `MeilisearchTimeoutError` if one is not processed within `task_timeout` seconds."""
+
+        async def wait(task_uid: int):
+            task = await self.client.wait_for_task(task_uid, timeout_in_ms=int(self.task_timeout * 1000))
+            if task.status == "failed":
+                error = task.error or {}
+                raise MeilisearchTaskFailedError(error.get("message", f"Task {task_uid} failed"))
+            return task
+
+        return await run_concurrently(
+            [lambda task_uid=task_uid: wait(task_uid) for task_uid in task_uids], max_concurrency=self.max_concurrency
+        )
 
     @handle_exception(exception_type=Exception, default_return=[])
-    def search(self, query):
-        search_results = self._index.search(query)
-        return search_results["hits"]
+    async def search(
+        self, query: str, filter: Filter = None, limit: int = 20, offset: int = 0, index: str = ""
+    ) -> List[dict]:
+        search_results = await self.client.index(index or self._index).search(
+            query, offset=offset, limit=limit, filter=filter
+        )
+        return search_results.hits
+
+    async def search_many(self, queries: List[str], **kwargs) -> List[List[dict]]:
+        """Run the searches concurrently, `kwargs` are passed to each `search`."""
+        return await run_concurrently(
+            [lambda query=query: self.search(query, **kwargs) for query in queries],
+            max_concurrency=self.max_concurrency,
+        )
+
+    async def run(self, query: str, max_results: int = 8, as_string: bool = True) -> Union[str, List[dict]]:
+        hits = await self.search(query, limit=max_results)
+        if as_string:
+            return "\n".join(json.dumps(hit, ensure_ascii=False) for hit in hits)
+        return hits
+
+
+class MemoryMeilisearchClient:
+    """In-process stand-in for the subset of the SDK `AsyncClient` used by `MeilisearchEngine`, for tests and local
+    runs. Tasks complete at once, a document matches when every word of the query is one of its words, and filters
+    support `attribute <op> value` conditions joined by AND, or lists of them.
+
+    Usage: `MeilisearchEngine.use_client(MemoryMeilisearchClient())`.
+    """
+
+    def __init__(self):
+        self.indexes: Dict[str, MemoryMeilisearchIndex] = {}
+        self.tasks: Dict[int, SimpleNamespace] = {}
+        self._task_uids = itertools.count()
+
+    def _task(self, index_uid: str, task_type: str) -> SimpleNamespace:
+        task_uid = next(self._task_uids)
+        self.tasks[task_uid] = SimpleNamespace(
+            uid=task_uid, index_uid=index_uid, task_type=task_type, status="succeeded", error=None
+        )
+        return SimpleNamespace(task_uid=task_uid, index_uid=index_uid, task_type=task_type, status="enqueued")
+
+    async def get_or_create_index(self, uid: str, primary_key: Optional[str] = None) -> MemoryMeilisearchIndex:
+        if uid not in self.indexes:
+            self.indexes[uid] = MemoryMeilisearchIndex(self, uid, primary_key or "id")
+            self._task(uid, "indexCreation")
+        return self.indexes[uid]
+
+    def index(self, uid: str) -> MemoryMeilisearchIndex:
+        # a local reference, the index may not exist yet as with the SDK
+        return self.indexes.get(uid) or MemoryMeilisearchIndex(self, uid, "id")
+
+    async def wait_for_task(self, task_id: int, timeout_in_ms: Optional[int] = 5000) -> SimpleNamespace:
+        return self.tasks[task_id]
+
+    async def aclose(self):
+        pass
+
+
+class MemoryMeilisearchIndex:
+    """An index of `MemoryMeilisearchClient`, standing in for the SDK `AsyncIndex`."""
+
+    def __init__(self, client: MemoryMeilisearchClient, uid: str, primary_key: str):
+        self.client = client
+        self.uid = uid
+        self.primary_key = primary_key
+        self.documents: Dict[object, dict] = {}
+        self.filterable_attributes: List[str] = []
+
+    async def add_documents(self, documents: List[dict], primary_key: Optional[str] = None) -> SimpleNamespace:
+        if self.uid not in self.client.indexes:  # documents create their index, as with the server
+            self.primary_key = primary_key or self.primary_key
+            self.client.indexes[self.uid] = self
+        for document in documents:
+            self.documents[document[self.primary_key]] = dict(document)
+        return self.client._task(self.uid, "documentAdditionOrUpdate")
+
+    async def update_filterable_attributes(self, body: List[str]) -> SimpleNamespace:
+        self.filterable_attributes = list(body)
+        return self.client._task(self.uid, "settingsUpdate")
+
+    async def search(
+        self, query: Optional[str] = None, *, offset: int = 0, limit: int = 20, filter: Filter = None
+    ) -> SimpleNamespace:
+        if self.uid not in self.client.indexes:
+            raise MeilisearchError(f"Index `{self.uid}` not found")
+        words = re.findall(r"\w+", (query or "").lower())
+        hits = [
+            document
+            for document in self.documents.values()
+            if self._matches(document, words) and self._filtered(document, filter)
+        ]
+        return SimpleNamespace(
+            hits=hits[offset : offset + limit],
+            query=query or "",
+            offset=offset,
+            limit=limit,
+            estimated_total_hits=len(hits),
+        )
+
+    @staticmethod
+    def _matches(document: dict, words: List[str]) -> bool:
+        tokens = set(re.findall(r"\w+", " ".join(str(v) for v in document.values()).lower()))
+        return all(word in tokens for word in words)
+
+    @classmethod
+    def _filtered(cls, document: dict, filter: Filter) -> bool:
+        if not filter:
+            return True
+        if isinstance(filter, str):
+            return all(cls._condition(document, i) for i in re.split(r"\s+AND\s+", filter.strip()))
+        # a list is AND-ed, a nested list is OR-ed
+        return all(
+            any(cls._filtered(document, j) for j in i) if isinstance(i, list) else cls._filtered(document, i)
+            for i in filter
+        )
+
+    @staticmethod
+    def _condition(document: dict, condition: str) -> bool:
+        match = re.fullmatch(r"\s*(\w+)\s*(!=|>=|<=|=|>|<)\s*(.+?)\s*", condition)
+        if not match:
+            raise MeilisearchError(f"Unsupported filter: {condition}")
+        attribute, op, value = match.groups()
+        value = value.strip("'\"")
+        actual = document.get(attribute)
+        if isinstance(actual, (int, float)) and not isinstance(actual, bool):
+            value = float(value)
+        elif actual is not None:
+            actual = str(actual)
+        if op == "=":
+            return actual == value
+        if op == "!=":
+            return actual != value
+        if actual is None:
+            return False
+        return {">": actual > value, ">=": actual >= value, "<": actual < value, "<=": actual <= value}[op]
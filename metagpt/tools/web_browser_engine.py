@@ -11,6 +11,7 @@ from typing import Any, Callable, Coroutine, overload
 from metagpt.config import CONFIG
 from metagpt.tools import WebBrowserEngineType
 from metagpt.utils.parse_html import WebPage
+from metagpt.utils.tracing import traced
 
 
 class WebBrowserEngine:
@@ -44,5 +45,6 @@ class WebBrowserEngine:
     async def run(self, url: str, *urls: str) -> list[WebPage]:
         ...
 
+    @traced("tool", name="browse", attributes=lambda self, *urls: {"engine": str(self.engine), "urls": len(urls)})
     async def run(self, url: str, *urls: str) -> WebPage | list[WebPage]:
         return await self.run_func(url, *urls)
@@ -6,10 +6,12 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
 import importlib
+import threading
 from concurrent import futures
 from copy import deepcopy
-from typing import Literal
+from typing import Callable, Literal
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
@@ -18,8 +20,15 @@ from webdriver_manager.core.download_manager import WDMDownloadManager
 from webdriver_manager.core.http import WDMHttpClient
 
 from metagpt.config import CONFIG
+from metagpt.logs import logger
 from metagpt.utils.parse_html import WebPage
 
+# Browsers kept per browser type and launch arguments, and pages loaded by a browser before it is replaced
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_PAGES_PER_DRIVER = 50
+DEFAULT_PAGE_LOAD_STRATEGY = "normal"
+DEFAULT_PAGE_LOAD_TIMEOUT = 30
+
 
 class SeleniumWrapper:
     """Wrapper around Selenium.
@@ -31,6 +40,9 @@ class SeleniumWrapper:
        for that browser before running. For example, if you have Mozilla Firefox installed on your
        computer, you can set the configuration SELENIUM_BROWSER_TYPE to firefox. After that, you
        can scrape web pages using the Selenium WebBrowserEngine.
+
+    Browsers are kept in a pool shared by the wrappers with the same browser type and launch arguments, and pages are
+    scraped on a thread pool of the same size, so concurrent runs reuse at most `pool_size` browsers.
     """
 
     def __init__(
@@ -40,6 +52,10 @@ class SeleniumWrapper:
         *,
         loop: asyncio.AbstractEventLoop | None = None,
         executor: futures.Executor | None = None,
+        pool_size: int = 0,
+        max_pages_per_driver: int = 0,
+        page_load_strategy: Literal["normal", "eager", "none"] | None = None,
+        page_load_timeout: float = 0,
     ) -> None:
         if browser_type is None:
             browser_type = CONFIG.selenium_browser_type
@@ -50,15 +66,25 @@ class SeleniumWrapper:
 
         self.executable_path = launch_kwargs.pop("executable_path", None)
         self.launch_args = [f"--{k}={v}" for k, v in launch_kwargs.items()]
+        self.pool_size = pool_size or int(CONFIG.SELENIUM_POOL_SIZE or DEFAULT_POOL_SIZE)
+        self.max_pages_per_driver = max_pages_per_driver or int(
+            CONFIG.SELENIUM_MAX_PAGES_PER_DRIVER or DEFAULT_MAX_PAGES_PER_DRIVER
+        )
+        self.page_load_strategy = page_load_strategy or CONFIG.SELENIUM_PAGE_LOAD_STRATEGY or DEFAULT_PAGE_LOAD_STRATEGY
+        self.page_load_timeout = page_load_timeout or float(
+            CONFIG.SELENIUM_PAGE_LOAD_TIMEOUT or DEFAULT_PAGE_LOAD_TIMEOUT
+        )
         self._has_run_precheck = False
-        self._get_driver = None
+        self._pool: _DriverPool | None = None
         self.loop = loop
         self.executor = executor
 
     async def run(self, url: str, *urls: str) -> WebPage | list[WebPage]:
         await self._run_precheck()
 
-        _scrape = lambda url: self.loop.run_in_executor(self.executor, self._scrape_website, url)
+        loop = self.loop or asyncio.get_running_loop()
+        executor = self.executor or self._pool.executor
+        _scrape = lambda url: loop.run_in_executor(executor, self._scrape_website, url)
 
         if urls:
             return await asyncio.gather(_scrape(url), *(_scrape(i) for i in urls))
@@ -67,24 +93,134 @@ class SeleniumWrapper:
     async def _run_precheck(self):
         if self._has_run_precheck:
             return
-        self.loop = self.loop or asyncio.get_event_loop()
-        self._get_driver = await self.loop.run_in_executor(
-            self.executor,
-            lambda: _gen_get_driver_func(self.browser_type, *self.launch_args, executable_path=self.executable_path),
+        key = (
+            self.browser_type,
+            tuple(self.launch_args),
+            self.executable_path,
+            self.page_load_strategy,
+            self.page_load_timeout,
         )
+        self._pool = _pools.get(key)
+        if self._pool is None:
+            loop = self.loop or asyncio.get_running_loop()
+            get_driver = await loop.run_in_executor(
+                self.executor,
+                lambda: _gen_get_driver_func(
+                    self.browser_type,
+                    *self.launch_args,
+                    executable_path=self.executable_path,
+                    page_load_strategy=self.page_load_strategy,
+                    page_load_timeout=self.page_load_timeout,
+                ),
+            )
+            with _pools_lock:
+                if key not in _pools:
+                    _pools[key] = _DriverPool(get_driver, self.pool_size, self.max_pages_per_driver)
+                self._pool = _pools[key]
         self._has_run_precheck = True
 
     def _scrape_website(self, url):
-        with self._get_driver() as driver:
-            try:
-                driver.get(url)
-                WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                inner_text = driver.execute_script("return document.body.innerText;")
-                html = driver.page_source
-            except Exception as e:
-                inner_text = f"Fail to load page content for {e}"
-                html = ""
-            return WebPage(inner_text=inner_text, html=html, url=url)
+        driver = self._pool.acquire()
+        healthy = True
+        try:
+            driver.get(url)
+            WebDriverWait(driver, self.page_load_timeout).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            inner_text = driver.execute_script("return document.body.innerText;")
+            html = driver.page_source
+        except Exception as e:
+            healthy = False
+            inner_text = f"Fail to load page content for {e}"
+            html = ""
+        finally:
+            self._pool.release(driver, healthy=healthy)
+        return WebPage(inner_text=inner_text, html=html, url=url)
+
+
+class _DriverPool:
+    """Bounded pool of WebDriver sessions sharing one browser type and launch arguments.
+
+    Browsers are launched on demand up to `size`, checked before they are reused, and quit after `max_pages` pages
+    or a failed one.
+    """
+
+    def __init__(self, get_driver: Callable, size: int, max_pages: int):
+        self._get_driver = get_driver
+        self.size = size
+        self.max_pages = max_pages
+        self.executor = futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix="selenium")
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pages = {}
+        self.launched = 0
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    break
+                if self._is_alive(driver):
+                    return driver
+                self._quit(driver)
+            driver = self._get_driver()
+            with self._lock:
+                self._pages[id(driver)] = 0
+                self.launched += 1
+            return driver
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver, healthy: bool = True):
+        try:
+            with self._lock:
+                self._pages[id(driver)] += 1
+                reusable = healthy and self._pages[id(driver)] < self.max_pages
+                if reusable:
+                    self._idle.append(driver)
+            if not reusable:
+                self._quit(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._quit(driver)
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _is_alive(driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        with self._lock:
+            self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Fail to quit the web driver: {e}")
+
+
+_pools: dict[tuple, _DriverPool] = {}
+_pools_lock = threading.Lock()
+
+
+@atexit.register
+def _close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
 
 
 _webdriver_manager_types = {
@@ -102,7 +238,13 @@ class WDMHttpProxyClient(WDMHttpClient):
         return super().get(url, **kwargs)
 
 
-def _gen_get_driver_func(browser_type, *args, executable_path=None):
+def _gen_get_driver_func(
+    browser_type,
+    *args,
+    executable_path=None,
+    page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY,
+    page_load_timeout=DEFAULT_PAGE_LOAD_TIMEOUT,
+):
     WebDriver = getattr(importlib.import_module(f"selenium.webdriver.{browser_type}.webdriver"), "WebDriver")
     Service = getattr(importlib.import_module(f"selenium.webdriver.{browser_type}.service"), "Service")
     Options = getattr(importlib.import_module(f"selenium.webdriver.{browser_type}.options"), "Options")
@@ -118,12 +260,15 @@ def _gen_get_driver_func(browser_type, *args, executable_path=None):
         options = Options()
         options.add_argument("--headless")
         options.add_argument("--enable-javascript")
+        options.page_load_strategy = page_load_strategy
         if browser_type == "chrome":
             options.add_argument("--disable-gpu")  # This flag can help avoid renderer issue
             options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
             options.add_argument("--no-sandbox")
         for i in args:
             options.add_argument(i)
-        return WebDriver(options=deepcopy(options), service=Service(executable_path=executable_path))
+        driver = WebDriver(options=deepcopy(options), service=Service(executable_path=executable_path))
+        driver.set_page_load_timeout(page_load_timeout)
+        return driver
 
     return _get_driver
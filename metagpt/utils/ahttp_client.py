@@ -2,11 +2,33 @@
 # -*- coding: utf-8 -*-
 # @Desc   : pure async http_client
 
-from typing import Any, Mapping, Optional, Union
+import asyncio
+import weakref
+from typing import Any, AsyncIterator, Mapping, Optional, Union
 
 import aiohttp
 from aiohttp.client import DEFAULT_TIMEOUT
 
+# The session of each event loop, with the async generator closing it when the loop shuts down.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+async def _hold(session: aiohttp.ClientSession) -> AsyncIterator[aiohttp.ClientSession]:
+    # closed by `loop.shutdown_asyncgens()`, which `asyncio.run` calls before closing the loop
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """The session, and so the connection pool, shared by the requests of the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _sessions or _sessions[loop][0].closed:
+        holder = _hold(aiohttp.ClientSession())
+        _sessions[loop] = (await holder.__anext__(), holder)
+    return _sessions[loop][0]
+
 
 async def apost(
     url: str,
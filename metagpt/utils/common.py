@@ -12,6 +12,7 @@
 from __future__ import annotations
 
 import ast
+import asyncio
 import contextlib
 import importlib
 import inspect
@@ -20,10 +21,11 @@ import os
 import platform
 import re
 import sys
+import time
 import traceback
 import typing
 from pathlib import Path
-from typing import Any, List, Tuple, Union
+from typing import Any, Awaitable, Callable, List, Tuple, Union
 
 import aiofiles
 import loguru
@@ -33,6 +35,7 @@ from tenacity import RetryCallState, RetryError, _utils
 from metagpt.const import MESSAGE_ROUTE_TO_ALL
 from metagpt.logs import logger
 from metagpt.utils.exceptions import handle_exception
+from metagpt.utils.tracing import add_event, record_queue_wait
 
 
 def check_cmd_exists(command) -> int:
@@ -436,6 +439,9 @@ def general_after_log(i: "loguru.Logger", sec_format: str = "%0.3f") -> typing.C
             f"this was the {_utils.to_ordinal(retry_state.attempt_number)} time calling it. "
             f"exp: {retry_state.outcome.exception()}"
         )
+        add_event(
+            "retry", fn=fn_name, attempt=retry_state.attempt_number, error=str(retry_state.outcome.exception())[:500]
+        )
 
     return log_it
 
@@ -510,6 +516,8 @@ def role_raise_decorator(func):
                 # remove role newest observed msg to make it observed again
                 self.rc.memory.delete(self.latest_observed_msg)
             # raise again to make it captured outside
+            if isinstance(e, NoMoneyException):
+                raise
             if isinstance(e, RetryError):
                 last_error = e.last_attempt._exception
                 name = any_to_str(last_error)
@@ -551,4 +559,37 @@ async def read_file_block(filename: str | Path, lineno: int, end_lineno: int):
             if ix > end_lineno:
                 break
             lines.append(line)
-    return "".join(lines)
\ No newline at end of file
+    return "".join(lines)
+
+
+async def run_concurrently(
+    factories: List[Callable[[], Awaitable[Any]]],
+    max_concurrency: int = 0,
+    max_retries: int = 0,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Run the coroutines created by `factories` concurrently and return their results in input order.
+
+    :param factories: Zero-argument callables returning the coroutines to await.
+    :param max_concurrency: Maximum number of coroutines in flight, unlimited when not positive.
+    :param max_retries: Times a failed coroutine is re-created and awaited again. Only the failed ones are retried.
+    :param return_exceptions: Return the last exception of an item that keeps failing in its place, instead of raising.
+    :return: The results, in the order of `factories`. The last exception is raised if an item keeps failing.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency if max_concurrency > 0 else max(len(factories), 1))
+
+    async def run(index: int, factory: Callable[[], Awaitable[Any]]):
+        for attempt in range(max_retries + 1):
+            try:
+                queued_at = time.perf_counter()
+                async with semaphore:
+                    record_queue_wait(time.perf_counter() - queued_at)
+                    return await factory()
+            except Exception as e:
+                if attempt >= max_retries:
+                    if return_exceptions:
+                        return e
+                    raise
+                logger.warning(f"Item {index} failed: {e}, retry {attempt + 1}/{max_retries}")
+
+    return await asyncio.gather(*(run(i, f) for i, f in enumerate(factories)))
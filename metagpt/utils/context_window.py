@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : context_window.py
+@Desc    : Fit the history of a role into the prompt under a token budget, so that the prompt does not grow with the
+        run. Messages are packed newest first, repeated ones are kept once, and the older ones left out can be replaced
+        by a rolling summary, which is cached and only refreshed every few messages. It is off, the whole history is
+        kept, unless `CONTEXT_WINDOW_TOKENS` or `CONTEXT_WINDOW_RATIO` is set.
+
+    window = ContextWindow(model="gpt-4", ratio=0.5)
+    kept, summary = await window.build(history, llm)
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+from pydantic import BaseModel, PrivateAttr
+
+from metagpt.config import CONFIG
+from metagpt.logs import logger
+from metagpt.schema import Message
+from metagpt.utils.token_counter import TOKEN_MAX
+
+# The context size of a model missing from TOKEN_MAX, as in `metagpt.utils.text`
+DEFAULT_TOKEN_MAX = 2048
+
+SUMMARY_PROMPT = """Summarize the conversation records below for the one who continues the work. Keep the decisions,
+requirements, file names and open issues, and drop the details that the newer records supersede.
+Answer in at most {words} words, with the summary only.
+
+## Previous summary
+{summary}
+
+## Records
+{records}
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """The tokenizer of `model`, None if it cannot be loaded, such as offline."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"No tokenizer for {model}, tokens are estimated from the length of the text: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4  # about 4 characters a token
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=None)
+def _context_size(model: str) -> int:
+    if model not in TOKEN_MAX:
+        logger.warning(
+            f"Unknown context size of {model or 'the model'}, the history is packed for {DEFAULT_TOKEN_MAX} tokens, "
+            "set CONTEXT_WINDOW_TOKENS instead"
+        )
+    return TOKEN_MAX.get(model, DEFAULT_TOKEN_MAX)
+
+
+def _message_key(msg: Message) -> str:
+    """Messages with the same key repeat each other."""
+    return hashlib.md5(f"{msg.role}\n{msg.cause_by}\n{msg}".encode("utf-8")).hexdigest()
+
+
+class ContextWindow(BaseModel):
+    """The history of a role, packed under a token budget.
+
+    :param model: The model the prompt is for, whose context size sets the budget, that of the LLM given to `build`
+        when empty.
+    :param max_tokens: The budget of the history, `ratio` of the context size of the model when 0.
+    :param ratio: The share of the context size of the model given to the history, the rest is for the template and
+        the answer. The history is not packed when neither `max_tokens` nor `ratio` is set.
+    :param summarize: Replace the messages left out by a summary, which costs an LLM call every `summary_batch` of them.
+    :param summary_batch: The messages left out before the summary is refreshed, the others are dropped meanwhile.
+    """
+
+    model: str = ""
+    max_tokens: int = 0
+    ratio: float = 0
+    summarize: bool = False
+    summary_batch: int = 4
+
+    _tokens: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _summaries: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, model: str = "") -> "ContextWindow":
+        return cls(
+            model=model,
+            max_tokens=CONFIG.context_window_tokens,
+            ratio=CONFIG.context_window_ratio,
+            summarize=CONFIG.context_summary,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens > 0 or self.ratio > 0
+
+    @property
+    def budget(self) -> int:
+        return self.max_tokens or int(_context_size(self.model) * self.ratio)
+
+    def count(self, msg: Message, key: str = "") -> int:
+        """The tokens of `msg` as rendered in prompts, cached by the key of the message."""
+        key = key or _message_key(msg)
+        tokens = self._tokens.get(key)
+        if tokens is None:
+            tokens = self._tokens[key] = count_tokens(str(msg), self.model)
+        return tokens
+
+    def pack(self, messages: List[Message], budget: Optional[int] = None) -> Tuple[List[Message], List[Message]]:
+        """Split `messages`, from the oldest, into those kept under `budget` and the older ones left out, both from
+        the oldest. A repeated message is kept at its newest place, and the newest message is kept even if it is over
+        the budget."""
+        kept, left_out = self._pack(messages, self.budget if budget is None else budget)
+        return [msg for _, msg in kept], [msg for _, msg in left_out]
+
+    def _pack(self, messages: List[Message], budget: int, with_left_out: bool = True) -> Tuple[list, list]:
+        """`pack` with the keys of the messages. Without `with_left_out`, the older messages are not looked at, so
+        that the cost does not grow with the history."""
+        seen = set()
+        kept = []
+        used = 0
+        for index in range(len(messages) - 1, -1, -1):
+            msg = messages[index]
+            key = _message_key(msg)
+            if key in seen:
+                continue
+            used += self.count(msg, key)
+            if kept and used > budget:
+                if not with_left_out:
+                    return kept[::-1], []
+                left_out = []
+                for older in messages[index::-1]:
+                    key = _message_key(older)
+                    if key not in seen:
+                        seen.add(key)
+                        left_out.append((key, older))
+                return kept[::-1], left_out[::-1]
+            seen.add(key)
+            kept.append((key, msg))
+        return kept[::-1], []
+
+    async def build(self, messages: List[Message], llm=None) -> Tuple[List[Message], str]:
+        """The messages kept, from the oldest, and the summary of those left out, empty when not summarizing. All the
+        messages are kept when the window is not enabled."""
+        if not self.enabled:
+            return list(messages), ""
+        if not self.model and llm is not None:
+            self.model = getattr(llm, "model", "") or ""
+        if not self.summarize or llm is None:
+            return [msg for _, msg in self._pack(messages, self.budget, with_left_out=False)[0]], ""
+        summary_tokens = self.budget // 8
+        kept, left_out = self._pack(messages, self.budget - summary_tokens)
+        kept = [msg for _, msg in kept]
+        if not left_out:
+            return kept, ""
+        # the summary of the longest run of the oldest messages left out, the newer ones are pending
+        summarized = next((i for i in range(len(left_out) - 1, -1, -1) if left_out[i][0] in self._summaries), -1)
+        summary = self._summaries[left_out[summarized][0]] if summarized >= 0 else ""
+        pending = [msg for _, msg in left_out[summarized + 1 :]]
+        if len(pending) >= self.summary_batch:
+            summary = await self._summarize(summary, pending, llm, words=summary_tokens * 3 // 4)
+            self._summaries[left_out[-1][0]] = summary
+        return kept, summary
+
+    async def _summarize(self, summary: str, messages: List[Message], llm, words: int) -> str:
+        records, _ = self.pack(messages, budget=self.budget)
+        prompt = SUMMARY_PROMPT.format(
+            words=words, summary=summary or "None", records="\n".join(str(i) for i in records)
+        )
+        try:
+            return await llm.aask(prompt, stream=False)
+        except Exception as e:
+            logger.warning(f"Failed to summarize {len(messages)} messages, they are left out: {e}")
+            return summary
+
+
+def render_history(messages: List[Message], summary: str = "") -> str:
+    """The history as lines of role and content, from the oldest, after the summary of the older ones if any."""
+    lines = [f"Summary of the earlier records: {summary}"] if summary else []
+    return "\n".join(lines + [str(i) for i in messages])
@@ -6,12 +6,47 @@
 @Desc    : mashenquan, 2023/8/28. Separate the `CostManager` class to support user-level cost accounting.
 """
 
-from typing import NamedTuple
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
-from metagpt.logs import logger
+from metagpt.logs import get_log_context, log_context, logger
+from metagpt.utils.common import NoMoneyException
 from metagpt.utils.token_counter import TOKEN_COSTS
+from metagpt.utils.tracing import record_usage
+
+# Seconds between two log lines of the running cost, the calls in between are aggregated
+COST_LOG_INTERVAL = 30.0
+
+
+@contextmanager
+def cost_scope(role: Optional[str] = None, action: Optional[str] = None):
+    """Account the LLM calls made inside to `role` and `action`, those not given are inherited from the outer scope.
+    They are also the role and action of the records logged inside."""
+    fields = {k: v for k, v in (("role", role), ("action", action)) if v is not None}
+    with log_context(**fields):
+        yield
+
+
+def scoped(role: Callable[..., str] = None, action: Callable[..., str] = None):
+    """Decorate an async method to run it in a `cost_scope`, whose role and action are functions of the call
+    arguments."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with cost_scope(
+                role=role(*args, **kwargs) if role else None, action=action(*args, **kwargs) if action else None
+            ):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
 class Costs(NamedTuple):
@@ -21,14 +56,54 @@ class Costs(NamedTuple):
     total_budget: float
 
 
+class Usage(NamedTuple):
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+
+
 class CostManager(BaseModel):
-    """Calculate the overhead of using the interface."""
+    """Calculate the overhead of using the interface.
+
+    Usage is also counted by (role, action, model), the scope of the call set by `cost_scope`, and a role can be
+    given its own budget in `role_budgets`, keyed by its profile. Prices of `token_costs`, in dollars per 1k tokens
+    like `TOKEN_COSTS`, go before those of `TOKEN_COSTS`; a model priced by neither is counted at no cost. The running
+    cost is logged at most every `log_interval` seconds.
+    """
 
     total_prompt_tokens: int = 0
     total_completion_tokens: int = 0
     total_budget: float = 0
     max_budget: float = 10.0
     total_cost: float = 0
+    role_budgets: Dict[str, float] = {}
+    token_costs: Dict[str, Dict[str, float]] = {}
+    log_interval: float = COST_LOG_INTERVAL
+
+    _usage: Dict[Tuple[str, str, str], list] = PrivateAttr(default_factory=dict)
+    _role_costs: Dict[str, float] = PrivateAttr(default_factory=dict)
+    _prices: Dict[str, Optional[dict]] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _last_log: float = PrivateAttr(default=0.0)
+    _unlogged: list = PrivateAttr(default_factory=lambda: [0, 0, 0, 0.0])
+
+    def get_price(self, model: str) -> Optional[dict]:
+        """The prices of `model`, or of the longest model name it starts with, such as a dated version. None if the
+        model is unknown."""
+        if model in self._prices:
+            return self._prices[model]
+        tables = (self.token_costs, TOKEN_COSTS)
+        price = next((table[model] for table in tables if model in table), None)
+        if price is None:
+            names = [name for table in tables for name in table if model.startswith(name)]
+            if names:
+                name = max(names, key=len)
+                price = self.token_costs.get(name) or TOKEN_COSTS[name]
+            else:
+                logger.warning(f"No price for model {model}, its tokens are counted at no cost")
+        self._prices[model] = price
+        return price
 
     def update_cost(self, prompt_tokens, completion_tokens, model):
         """
@@ -39,16 +114,78 @@ class CostManager(BaseModel):
         completion_tokens (int): The number of tokens used in the completion.
         model (str): The model used for the API call.
         """
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-        cost = (
-            prompt_tokens * TOKEN_COSTS[model]["prompt"] + completion_tokens * TOKEN_COSTS[model]["completion"]
-        ) / 1000
-        self.total_cost += cost
-        logger.info(
-            f"Total running cost: ${self.total_cost:.3f} | Max budget: ${self.max_budget:.3f} | "
-            f"Current cost: ${cost:.3f}, prompt_tokens: {prompt_tokens}, completion_tokens: {completion_tokens}"
-        )
+        price = self.get_price(model)
+        cost = (prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1000 if price else 0.0
+        scope = get_log_context()
+        role, action = scope.get("role", ""), scope.get("action", "")
+        now = time.monotonic()
+        with self._lock:
+            self.total_prompt_tokens += prompt_tokens
+            self.total_completion_tokens += completion_tokens
+            self.total_cost += cost
+            counters = self._usage.setdefault((role, action, model), [0, 0, 0, 0.0])
+            counters[0] += 1
+            counters[1] += prompt_tokens
+            counters[2] += completion_tokens
+            counters[3] += cost
+            self._role_costs[role] = self._role_costs.get(role, 0.0) + cost
+            unlogged = self._unlogged
+            unlogged[0] += 1
+            unlogged[1] += prompt_tokens
+            unlogged[2] += completion_tokens
+            unlogged[3] += cost
+            due = now - self._last_log >= self.log_interval
+            if due:
+                self._last_log = now
+                self._unlogged = [0, 0, 0, 0.0]
+        record_usage(prompt_tokens, completion_tokens, cost, model)
+        if due:
+            calls, prompt, completion, recent_cost = unlogged
+            logger.info(
+                f"Total running cost: ${self.total_cost:.3f} | Max budget: ${self.max_budget:.3f} | "
+                f"Cost of the last {calls} calls: ${recent_cost:.3f}, "
+                f"prompt_tokens: {prompt}, completion_tokens: {completion}"
+            )
+
+    def check_budget(self, role: Optional[str] = None):
+        """Raise NoMoneyException if the global budget, or that of `role`, the role of the current scope by default,
+        is spent."""
+        if self.total_cost > self.max_budget:
+            raise NoMoneyException(self.total_cost, f"Insufficient funds: {self.max_budget}")
+        role = get_log_context().get("role", "") if role is None else role
+        budget = self.role_budgets.get(role)
+        if budget is not None and self._role_costs.get(role, 0.0) > budget:
+            raise NoMoneyException(self._role_costs[role], f"Insufficient funds of {role}: {budget}")
+
+    def get_usage(self, by: Tuple[str, ...] = ("role", "action", "model")) -> Dict[tuple, Usage]:
+        """The usage grouped by some of "role", "action" and "model"."""
+        fields = ("role", "action", "model")
+        indexes = [fields.index(i) for i in by]
+        with self._lock:
+            items = [(key, list(counters)) for key, counters in self._usage.items()]
+        grouped = {}
+        for key, counters in items:
+            group = grouped.setdefault(tuple(key[i] for i in indexes), [0, 0, 0, 0.0])
+            for i, value in enumerate(counters):
+                group[i] += value
+        return {key: Usage(*counters) for key, counters in grouped.items()}
+
+    def summary(self) -> str:
+        lines = [
+            f"{'role':<24} {'action':<24} {'model':<24} {'calls':>6} {'prompt':>9} {'completion':>10} {'cost($)':>9}"
+        ]
+        for (role, action, model), usage in sorted(self.get_usage().items(), key=lambda i: -i[1].cost):
+            lines.append(
+                f"{role or '-':<24} {action or '-':<24} {model:<24} {usage.calls:>6} {usage.prompt_tokens:>9} "
+                f"{usage.completion_tokens:>10} {usage.cost:>9.4f}"
+            )
+        return "\n".join(lines)
+
+    def log_summary(self):
+        if self._usage:
+            logger.info(
+                f"Total running cost: ${self.total_cost:.3f} | Max budget: ${self.max_budget:.3f}\n{self.summary()}"
+            )
 
     def get_total_prompt_tokens(self):
         """
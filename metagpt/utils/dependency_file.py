@@ -8,6 +8,7 @@
 """
 from __future__ import annotations
 
+import asyncio
 import json
 from pathlib import Path
 from typing import Set
@@ -31,6 +32,7 @@ class DependencyFile:
         """
         self._dependencies = {}
         self._filename = Path(workdir) / ".dependencies.json"
+        self._lock = None
 
     async def load(self):
         """Load dependencies from the file asynchronously."""
@@ -52,9 +54,16 @@ class DependencyFile:
         :param dependencies: The set of dependencies.
         :param persist: Whether to persist the changes immediately.
         """
-        if persist:
+        if not persist:
+            self._update(filename, dependencies)
+            return
+        # Concurrent updates would otherwise load the same file and overwrite each other's changes.
+        async with self.lock:
             await self.load()
+            self._update(filename, dependencies)
+            await self.save()
 
+    def _update(self, filename: Path | str, dependencies: Set[Path | str]):
         root = self._filename.parent
         try:
             key = Path(filename).relative_to(root)
@@ -72,9 +81,6 @@ class DependencyFile:
         elif str(key) in self._dependencies:
             del self._dependencies[str(key)]
 
-        if persist:
-            await self.save()
-
     async def get(self, filename: Path | str, persist=True):
         """Get dependencies for a file asynchronously.
 
@@ -83,7 +89,9 @@ class DependencyFile:
         :return: A set of dependencies.
         """
         if persist:
-            await self.load()
+            # not while an update is between its load and its save, which the reload would undo
+            async with self.lock:
+                await self.load()
 
         root = self._filename.parent
         try:
@@ -92,6 +100,13 @@ class DependencyFile:
             key = filename
         return set(self._dependencies.get(str(key), {}))
 
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Serialize the reads and writes of the file by `update` and `get`."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
     def delete_file(self):
         """Delete the dependency file."""
         self._filename.unlink(missing_ok=True)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : embedding.py
+@Desc    : Embedding service shared by memory and document stores. Texts are deduplicated by content hash,
+        looked up in a persistent on-disk cache and only the missing ones are sent to the backend, in batches
+        no larger than the model limit.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from metagpt.config import CONFIG
+from metagpt.const import DATA_PATH
+from metagpt.logs import logger
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+DEFAULT_LOCAL_EMBEDDING_DIM = 256
+
+# The maximum number of inputs a single embedding request may carry.
+EMBEDDING_MAX_BATCH = {
+    "text-embedding-ada-002": 2048,
+}
+
+_SQLITE_MAX_VARIABLES = 900
+
+
+class LocalEmbedding(Embeddings):
+    """Deterministic offline embedding based on feature hashing of word tokens.
+
+    It needs no network and no model files, so it is suitable for tests, benchmarks and air-gapped runs. Texts
+    sharing words get close vectors, which is enough for the similarity checks made by the memory stores.
+    """
+
+    def __init__(self, dim: int = DEFAULT_LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 == 0 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class EmbeddingCache:
+    """Persistent `content hash -> vector` mapping backed by sqlite."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_MAX_VARIABLES):
+                chunk = keys[i : i + _SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        rows = [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService(Embeddings):
+    """Batched and cached front of an `Embeddings` backend.
+
+    Every text is keyed by `sha256(model + text)`; repeated texts, within one call or across calls and processes,
+    are embedded only once.
+    """
+
+    def __init__(
+        self,
+        backend: Embeddings,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        batch_size: int = 0,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.backend = backend
+        self.model = model
+        max_batch = EMBEDDING_MAX_BATCH.get(model, 1000)
+        self.batch_size = min(batch_size, max_batch) if batch_size > 0 else max_batch
+        self.cache = cache
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        vectors = self.cache.get_many(set(keys)) if self.cache else {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = {}
+            pending = list(missing.items())
+            for i in range(0, len(pending), self.batch_size):
+                chunk = pending[i : i + self.batch_size]
+                embedded = self.backend.embed_documents([text for _, text in chunk])
+                new_vectors.update(zip([key for key, _ in chunk], embedded))
+            if self.cache:
+                self.cache.set_many(new_vectors)
+            vectors.update(new_vectors)
+            logger.debug(f"Embedded {len(missing)} new texts, {len(texts) - len(missing)} served from cache")
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def _new_backend(backend: str) -> Tuple[Embeddings, str]:
+    if backend == "local":
+        dim = int(CONFIG.EMBEDDING_DIM or DEFAULT_LOCAL_EMBEDDING_DIM)
+        return LocalEmbedding(dim=dim), f"local-{dim}"
+    if backend == "openai":
+        from langchain.embeddings import OpenAIEmbeddings
+
+        model = CONFIG.EMBEDDING_MODEL or DEFAULT_EMBEDDING_MODEL
+        embedding = OpenAIEmbeddings(
+            model=model,
+            openai_api_key=CONFIG.openai_api_key,
+            openai_api_base=CONFIG.openai_base_url,
+            chunk_size=EMBEDDING_MAX_BATCH.get(model, 1000),
+        )
+        return embedding, model
+    raise ValueError(f"Unsupported embedding backend: {backend}")
+
+
+def rank_by_similarity(query: str, texts: List[str], embedding: Embeddings = None) -> List[Tuple[int, float]]:
+    """Return `(index, cosine similarity)` of `texts` to `query`, the most similar first."""
+    if not texts:
+        return []
+    embedding = embedding or get_embedding()
+    query_vector = np.asarray(embedding.embed_query(query), dtype=np.float32)
+    vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    scores = vectors @ query_vector / np.where(norms > 0, norms, 1)
+    order = np.argsort(-scores, kind="stable")
+    return [(int(i), float(scores[i])) for i in order]
+
+
+def get_embedding(backend: str = "") -> EmbeddingService:
+    """Return the process-wide embedding service of `backend`, `EMBEDDING_BACKEND` in config by default."""
+    backend = backend or CONFIG.EMBEDDING_BACKEND or "openai"
+    with _services_lock:
+        if backend in _services:
+            return _services[backend]
+        embedding, model = _new_backend(backend)
+        cache = None
+        if str(CONFIG.EMBEDDING_CACHE).lower() != "false":
+            cache_dir = Path(CONFIG.EMBEDDING_CACHE_PATH or DATA_PATH / "embedding_cache")
+            cache = EmbeddingCache(cache_dir / f"{model}.sqlite3")
+        batch_size = int(CONFIG.EMBEDDING_BATCH_SIZE or 0)
+        service = EmbeddingService(backend=embedding, model=model, batch_size=batch_size, cache=cache)
+        _services[backend] = service
+        return service
@@ -166,11 +166,82 @@ def merge_docstring(code: str, documented_code: str) -> str:
     Returns:
         The original code with the docstrings from the documented code.
     """
-    code_tree = cst.parse_module(code)
-    documented_code_tree = cst.parse_module(documented_code)
+    return apply_docstrings(code, collect_docstrings(documented_code))
 
+
+def collect_docstrings(
+    documented_code: str, path: tuple[str, ...] = (), include_module: bool = True
+) -> dict[tuple[str, ...], cst.SimpleStatementLine]:
+    """Collects the docstrings of the documented code.
+
+    Args:
+        documented_code: The documented code.
+        path: The names of the classes enclosing the documented code, when it was cut out of a larger module.
+        include_module: Whether to keep the module docstring.
+
+    Returns:
+        A dictionary mapping paths in the enclosing module to docstrings.
+    """
     visitor = DocstringCollector()
-    documented_code_tree.visit(visitor)
-    transformer = DocstringTransformer(visitor.docstrings)
-    modified_tree = code_tree.visit(transformer)
-    return modified_tree.code
+    cst.parse_module(documented_code).visit(visitor)
+    docstrings = {}
+    for key, statement in visitor.docstrings.items():
+        if len(key) == 1 and not include_module:
+            continue
+        docstrings[("", *path, *key[1:])] = statement
+    return docstrings
+
+
+def apply_docstrings(code: str, docstrings: dict[tuple[str, ...], cst.SimpleStatementLine]) -> str:
+    """Replaces the docstrings of the code with the given ones.
+
+    Args:
+        code: The original code.
+        docstrings: A dictionary mapping paths in the code to docstrings.
+
+    Returns:
+        The code with the docstrings.
+    """
+    return cst.parse_module(code).visit(DocstringTransformer(docstrings)).code
+
+
+def split_code(code: str, max_chars: int) -> list[tuple[tuple[str, ...], str]]:
+    """Splits a module into units no longer than `max_chars` where possible, to document them separately.
+
+    A short module is a single unit. Otherwise each top level class and function is a unit, and a class still too
+    long is split into its outline, with the bodies of its methods elided, and its methods.
+
+    Args:
+        code: The code of the module.
+        max_chars: The maximum length of a unit.
+
+    Returns:
+        A list of `(path, code)`, where `path` holds the names of the classes enclosing the unit.
+    """
+    if len(code) <= max_chars:
+        return [((), code)]
+    module = cst.parse_module(code)
+    units = []
+    for statement in module.body:
+        if isinstance(statement, (cst.ClassDef, cst.FunctionDef)):
+            units.extend(_split_node(module, statement, (), max_chars))
+    return units
+
+
+def _split_node(module: cst.Module, node: DocstringNode, path: tuple[str, ...], max_chars: int) -> list:
+    code = module.code_for_node(node)
+    if len(code) <= max_chars or not isinstance(node, cst.ClassDef):
+        return [(path, code)]
+    outline = node.with_changes(body=node.body.with_changes(body=[_elide_body(i) for i in node.body.body]))
+    units = [(path, module.code_for_node(outline))]
+    for statement in node.body.body:
+        if isinstance(statement, (cst.ClassDef, cst.FunctionDef)):
+            units.extend(_split_node(module, statement, (*path, node.name.value), max_chars))
+    return units
+
+
+def _elide_body(node: cst.CSTNode) -> cst.CSTNode:
+    if not isinstance(node, (cst.ClassDef, cst.FunctionDef)):
+        return node
+    ellipsis = cst.SimpleStatementLine(body=[cst.Expr(value=cst.Ellipsis())])
+    return node.with_changes(body=cst.IndentedBlock(body=[ellipsis]))
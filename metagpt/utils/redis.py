@@ -7,37 +7,76 @@
 """
 from __future__ import annotations
 
+import asyncio
+import fnmatch
+import time
 import traceback
+import weakref
 from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aioredis  # https://aioredis.readthedocs.io/en/latest/getting-started/
 
 from metagpt.config import CONFIG
 from metagpt.logs import logger
 
+# One pooled client per event loop, shared by every `Redis` object of the process, with the async generator closing
+# it when the loop shuts down.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+async def _hold(client: aioredis.Redis) -> AsyncIterator[aioredis.Redis]:
+    # closed by `loop.shutdown_asyncgens()`, which `asyncio.run` calls before closing the loop
+    try:
+        yield client
+    finally:
+        await client.close()
+
 
 class Redis:
+    # A process-wide client replacing the real server, such as `MemoryRedisClient` in tests.
+    _stand_in = None
+
     def __init__(self):
         self._client = None
 
+    @classmethod
+    def use_client(cls, client):
+        """Route every `Redis` object of the process to `client`, `None` restores the configured server."""
+        cls._stand_in = client
+
     async def _connect(self, force=False):
+        if self._stand_in is not None:
+            self._client = self._stand_in
+            return True
         if self._client and not force:
             return True
         if not self.is_configured:
             return False
 
+        loop = asyncio.get_running_loop()
+        if loop in _clients and not force:
+            self._client = _clients[loop][0]
+            return True
         try:
-            self._client = await aioredis.from_url(
+            client = await aioredis.from_url(
                 f"redis://{CONFIG.REDIS_HOST}:{CONFIG.REDIS_PORT}",
                 username=CONFIG.REDIS_USER,
                 password=CONFIG.REDIS_PASSWORD,
                 db=CONFIG.REDIS_DB,
+                max_connections=int(CONFIG.REDIS_MAX_CONNECTIONS or 16),
             )
+            holder = _hold(client)
+            self._client = await holder.__anext__()
+            _clients[loop] = (self._client, holder)
             return True
         except Exception as e:
             logger.warning(f"Redis initialization has failed:{e}")
         return False
 
+    async def is_available(self) -> bool:
+        return await self._connect()
+
     async def get(self, key: str) -> bytes | None:
         if not await self._connect() or not key:
             return None
@@ -57,10 +96,31 @@ class Redis:
         except Exception as e:
             logger.exception(f"{e}, stack:{traceback.format_exc()}")
 
+    async def lrange(self, key: str, start: int = 0, end: int = -1) -> List[bytes]:
+        if not await self._connect() or not key:
+            return []
+        try:
+            return await self._client.lrange(key, start, end)
+        except Exception as e:
+            logger.exception(f"{e}, stack:{traceback.format_exc()}")
+            return []
+
+    async def execute(self, commands: List[tuple]) -> Optional[List[Any]]:
+        """Run `(command, *args)` tuples in one transactional round trip, return their results in order."""
+        if not await self._connect() or not commands:
+            return None
+        try:
+            pipe = self._client.pipeline(transaction=True)
+            for command, *args in commands:
+                getattr(pipe, command)(*args)
+            return await pipe.execute()
+        except Exception as e:
+            logger.exception(f"{e}, stack:{traceback.format_exc()}")
+            return None
+
     async def close(self):
-        if not self._client:
-            return
-        await self._client.close()
+        """Release the client. The pooled one is shared by the other `Redis` objects of the loop, it is closed when
+        the loop shuts down."""
         self._client = None
 
     @property
@@ -77,3 +137,92 @@ class Redis:
             and CONFIG.REDIS_DB is not None
             and CONFIG.REDIS_PASSWORD is not None
         )
+
+
+class MemoryRedisClient:
+    """In-process stand-in for the subset of the aioredis client used by MetaGPT, for tests and local runs.
+
+    Usage: `Redis.use_client(MemoryRedisClient())`.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+    async def get(self, key):
+        return self._data.get(key) if self._alive(key) else None
+
+    async def set(self, key, value, ex=None):
+        self._data[key] = self._encode(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            await self.expire(key, ex)
+        return True
+
+    async def delete(self, *keys):
+        count = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                count += 1
+        return count
+
+    async def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        seconds = seconds.total_seconds() if isinstance(seconds, timedelta) else seconds
+        self._expires[key] = time.monotonic() + seconds
+        return True
+
+    async def rpush(self, key, *values):
+        self._alive(key)  # drop the list if it has expired
+        items = self._data.setdefault(key, [])
+        items.extend(self._encode(v) for v in values)
+        return len(items)
+
+    async def lrange(self, key, start, end):
+        if not self._alive(key):
+            return []
+        items = self._data[key]
+        # negative indexes count from the end, and out of range ones are clamped, as in Redis
+        start = max(len(items) + start, 0) if start < 0 else start
+        end = len(items) + end if end < 0 else end
+        return items[start : end + 1]
+
+    async def keys(self, pattern="*"):
+        return [k.encode("utf-8") for k in list(self._data) if self._alive(k) and fnmatch.fnmatchcase(k, pattern)]
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+    async def close(self):
+        pass
+
+
+class _MemoryPipeline:
+    def __init__(self, client: MemoryRedisClient):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        commands, self._commands = self._commands, []
+        return [await getattr(self._client, c)(*args, **kwargs) for c, args, kwargs in commands]
@@ -1,9 +1,13 @@
+import asyncio
 import base64
+import io
 import os.path
 import traceback
 import uuid
-from pathlib import Path
-from typing import Optional
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+from urllib.parse import quote
 
 import aioboto3
 import aiofiles
@@ -12,10 +16,33 @@ from metagpt.config import CONFIG
 from metagpt.const import BASE64_FORMAT
 from metagpt.logs import logger
 
+# S3 rejects multipart parts smaller than 5 MiB, except the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+DEFAULT_PRESIGNED_URL_EXPIRES = 7 * 24 * 3600  # the longest lifetime SigV4 allows
+
+# One client per event loop, shared by every `S3` object of the process: (client, the async generator holding it).
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+# Serialize the opening of the client of each event loop, so that concurrent first calls share one.
+_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+async def _hold(context) -> AsyncIterator:
+    # closed by `loop.shutdown_asyncgens()`, which `asyncio.run` calls before closing the loop
+    client = await context.__aenter__()
+    try:
+        yield client
+    finally:
+        await context.__aexit__(None, None, None)
+
 
 class S3:
     """A class for interacting with Amazon S3 storage."""
 
+    # A process-wide client replacing the real service, such as `MemoryS3Client` in tests.
+    _stand_in = None
+
     def __init__(self):
         self.session = aioboto3.Session()
         self.auth_config = {
@@ -24,6 +51,37 @@ class S3:
             "aws_secret_access_key": CONFIG.S3_SECRET_KEY,
             "endpoint_url": CONFIG.S3_ENDPOINT_URL,
         }
+        part_size = int(CONFIG.S3_MULTIPART_PART_SIZE or DEFAULT_PART_SIZE)
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.upload_concurrency = int(CONFIG.S3_UPLOAD_CONCURRENCY or DEFAULT_UPLOAD_CONCURRENCY)
+        self.url_expires = int(CONFIG.S3_PRESIGNED_URL_EXPIRES or DEFAULT_PRESIGNED_URL_EXPIRES)
+
+    @classmethod
+    def use_client(cls, client):
+        """Route every `S3` object of the process to `client`, `None` restores the configured service."""
+        cls._stand_in = client
+
+    @asynccontextmanager
+    async def _client(self):
+        """Yield the client of the running event loop, opened on first use and kept for the next calls until the
+        loop shuts down."""
+        if self._stand_in is not None:
+            yield self._stand_in
+            return
+        loop = asyncio.get_running_loop()
+        if loop not in _clients:
+            async with _locks.setdefault(loop, asyncio.Lock()):
+                if loop not in _clients:
+                    holder = _hold(self.session.client(**self.auth_config))
+                    _clients[loop] = (await holder.__anext__(), holder)
+        yield _clients[loop][0]
+
+    @staticmethod
+    async def close():
+        """Close the client of the running event loop now, instead of when the loop shuts down."""
+        entry = _clients.pop(asyncio.get_running_loop(), None)
+        if entry:
+            await entry[1].aclose()
 
     async def upload_file(
         self,
@@ -33,6 +91,9 @@ class S3:
     ) -> None:
         """Upload a file from the local path to the specified path of the storage bucket specified in s3.
 
+        Files larger than one part are streamed with a multipart upload, so memory stays bounded by
+        `part_size * upload_concurrency` whatever the file size.
+
         Args:
             bucket: The name of the S3 storage bucket.
             local_path: The local file path, including the file name.
@@ -42,15 +103,66 @@ class S3:
             Exception: If an error occurs during the upload process, an exception is raised.
         """
         try:
-            async with self.session.client(**self.auth_config) as client:
-                async with aiofiles.open(local_path, mode="rb") as reader:
-                    body = await reader.read()
-                    await client.put_object(Body=body, Bucket=bucket, Key=object_name)
-                    logger.info(f"Successfully uploaded the file to path {object_name} in bucket {bucket} of s3.")
+            async with aiofiles.open(local_path, mode="rb") as reader:
+                await self._upload(bucket, object_name, reader.read)
+            logger.info(f"Successfully uploaded the file to path {object_name} in bucket {bucket} of s3.")
         except Exception as e:
             logger.error(f"Failed to upload the file to path {object_name} in bucket {bucket} of s3: {e}")
             raise e
 
+    async def upload_bytes(self, bucket: str, data: bytes, object_name: str) -> None:
+        """Upload in-memory data to the specified path of the storage bucket, in parts if it is larger than one."""
+        stream = io.BytesIO(data)
+
+        async def read(size: int) -> bytes:
+            return stream.read(size)
+
+        try:
+            await self._upload(bucket, object_name, read)
+            logger.info(f"Successfully uploaded the data to path {object_name} in bucket {bucket} of s3.")
+        except Exception as e:
+            logger.error(f"Failed to upload the data to path {object_name} in bucket {bucket} of s3: {e}")
+            raise e
+
+    async def _upload(self, bucket: str, object_name: str, read: Callable[[int], Awaitable[bytes]]):
+        first = await read(self.part_size)
+        second = await read(self.part_size) if len(first) == self.part_size else b""
+        async with self._client() as client:
+            if not second:
+                await client.put_object(Body=first, Bucket=bucket, Key=object_name)
+                return
+
+            upload = await client.create_multipart_upload(Bucket=bucket, Key=object_name)
+            upload_id = upload["UploadId"]
+            semaphore = asyncio.Semaphore(self.upload_concurrency)
+            tasks = []
+
+            async def upload_part(number: int, body: bytes) -> dict:
+                try:
+                    rsp = await client.upload_part(
+                        Body=body, Bucket=bucket, Key=object_name, PartNumber=number, UploadId=upload_id
+                    )
+                    return {"ETag": rsp["ETag"], "PartNumber": number}
+                finally:
+                    semaphore.release()
+
+            try:
+                number, body = 1, first
+                while body:
+                    # wait for a free slot before reading the next part, so at most `upload_concurrency` are in memory
+                    await semaphore.acquire()
+                    tasks.append(asyncio.create_task(upload_part(number, body)))
+                    number, body = number + 1, (second if number == 1 else await read(self.part_size))
+                parts = await asyncio.gather(*tasks)
+                await client.complete_multipart_upload(
+                    Bucket=bucket, Key=object_name, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await client.abort_multipart_upload(Bucket=bucket, Key=object_name, UploadId=upload_id)
+                raise
+
     async def get_object_url(
         self,
         bucket: str,
@@ -58,6 +170,8 @@ class S3:
     ) -> str:
         """Get the URL for a downloadable or preview file stored in the specified S3 bucket.
 
+        The URL is presigned locally, valid for `S3_PRESIGNED_URL_EXPIRES` seconds, without a request to S3.
+
         Args:
             bucket: The name of the S3 storage bucket.
             object_name: The complete path of the file stored in S3, including the file name.
@@ -69,9 +183,10 @@ class S3:
             Exception: If an error occurs while retrieving the URL, an exception is raised.
         """
         try:
-            async with self.session.client(**self.auth_config) as client:
-                file = await client.get_object(Bucket=bucket, Key=object_name)
-                return str(file["Body"].url)
+            async with self._client() as client:
+                return await client.generate_presigned_url(
+                    "get_object", Params={"Bucket": bucket, "Key": object_name}, ExpiresIn=self.url_expires
+                )
         except Exception as e:
             logger.error(f"Failed to get the url for a downloadable or preview file: {e}")
             raise e
@@ -94,7 +209,7 @@ class S3:
             Exception: If an error occurs while retrieving the file data, an exception is raised.
         """
         try:
-            async with self.session.client(**self.auth_config) as client:
+            async with self._client() as client:
                 s3_object = await client.get_object(Bucket=bucket, Key=object_name)
                 return await s3_object["Body"].read()
         except Exception as e:
@@ -116,7 +231,7 @@ class S3:
             Exception: If an error occurs during the download process, an exception is raised.
         """
         try:
-            async with self.session.client(**self.auth_config) as client:
+            async with self._client() as client:
                 s3_object = await client.get_object(Bucket=bucket, Key=object_name)
                 stream = s3_object["Body"]
                 async with aiofiles.open(local_path, mode="wb") as writer:
@@ -132,24 +247,18 @@ class S3:
     async def cache(self, data: str, file_ext: str, format: str = "") -> str:
         """Save data to remote S3 and return url"""
         object_name = uuid.uuid4().hex + file_ext
-        path = Path(__file__).parent
-        pathname = path / object_name
         try:
-            async with aiofiles.open(str(pathname), mode="wb") as file:
-                data = base64.b64decode(data) if format == BASE64_FORMAT else data.encode(encoding="utf-8")
-                await file.write(data)
+            data = base64.b64decode(data) if format == BASE64_FORMAT else data.encode(encoding="utf-8")
 
             bucket = CONFIG.S3_BUCKET
             object_pathname = CONFIG.S3_BUCKET or "system"
             object_pathname += f"/{object_name}"
             object_pathname = os.path.normpath(object_pathname)
-            await self.upload_file(bucket=bucket, local_path=str(pathname), object_name=object_pathname)
-            pathname.unlink(missing_ok=True)
+            await self.upload_bytes(bucket=bucket, data=data, object_name=object_pathname)
 
             return await self.get_object_url(bucket=bucket, object_name=object_pathname)
         except Exception as e:
             logger.exception(f"{e}, stack:{traceback.format_exc()}")
-            pathname.unlink(missing_ok=True)
             return None
 
     @property
@@ -168,3 +277,60 @@ class S3:
             and CONFIG.S3_BUCKET
             and CONFIG.S3_BUCKET != "YOUR_S3_BUCKET"
         )
+
+
+class MemoryS3Client:
+    """In-process stand-in for the subset of the aioboto3 S3 client used by `S3`, for tests and local runs.
+
+    Usage: `S3.use_client(MemoryS3Client())`.
+    """
+
+    def __init__(self, endpoint_url: str = "http://s3.local"):
+        self.endpoint_url = endpoint_url
+        self.objects: Dict[tuple, bytes] = {}
+        self._uploads: Dict[str, dict] = {}
+
+    async def put_object(self, Body, Bucket, Key, **kwargs):
+        self.objects[(Bucket, Key)] = bytes(Body)
+        return {"ETag": f'"{uuid.uuid4().hex}"'}
+
+    async def get_object(self, Bucket, Key, **kwargs):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(f"NoSuchKey: {Bucket}/{Key}")
+        return {"Body": _MemoryStream(self.objects[(Bucket, Key)])}
+
+    async def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        self._uploads[upload_id] = {}
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    async def upload_part(self, Body, Bucket, Key, PartNumber, UploadId, **kwargs):
+        etag = f'"{uuid.uuid4().hex}"'
+        self._uploads[UploadId][PartNumber] = (etag, bytes(Body))
+        return {"ETag": etag}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        parts = self._uploads.pop(UploadId)
+        body = b""
+        for part in MultipartUpload["Parts"]:
+            etag, data = parts[part["PartNumber"]]
+            if etag != part["ETag"]:
+                raise ValueError(f"InvalidPart: {part}")
+            body += data
+        self.objects[(Bucket, Key)] = body
+        return {"Bucket": Bucket, "Key": Key}
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._uploads.pop(UploadId, None)
+        return {}
+
+    async def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return f"{self.endpoint_url}/{Params['Bucket']}/{quote(Params['Key'])}?X-Amz-Expires={ExpiresIn}"
+
+
+class _MemoryStream:
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
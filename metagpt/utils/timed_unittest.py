@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : timed_unittest.py
+@Desc    : Run a unittest file as `python <test file>` does, with a timeout on each of its tests, so that a hanging test
+        fails alone instead of getting the whole file killed. It is run as a script and imports nothing of metagpt,
+        the timeout relies on SIGALRM and is not applied where it is missing, such as on Windows.
+
+    python metagpt/utils/timed_unittest.py --timeout 10 tests/test_game.py
+"""
+import argparse
+import functools
+import os
+import runpy
+import signal
+import sys
+import unittest
+
+
+class TestTimeoutError(Exception):
+    pass
+
+
+class TimedTestResult(unittest.TextTestResult):
+    # Seconds each test may run, 0 for no limit
+    timeout: float = 0
+
+    def startTest(self, test):
+        super().startTest(test)
+        if self.timeout > 0 and hasattr(signal, "SIGALRM"):
+            signal.signal(signal.SIGALRM, self._on_timeout)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+
+    def stopTest(self, test):
+        if hasattr(signal, "SIGALRM"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        super().stopTest(test)
+
+    def _on_timeout(self, signum, frame):
+        raise TestTimeoutError(f"The test did not complete within {self.timeout}s")
+
+
+class TimedTestRunner(unittest.TextTestRunner):
+    resultclass = TimedTestResult
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a unittest file with a timeout on each test.")
+    parser.add_argument("--timeout", type=float, default=0, help="Seconds each test may run, 0 for no limit.")
+    parser.add_argument("path", help="The test file.")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    # the imports of the test file resolve as with `python <test file>`, not from the directory of this script
+    sys.path[0] = os.path.dirname(path)
+    sys.argv = [path]
+    TimedTestResult.timeout = args.timeout
+    # the `unittest.main()` of the test file runs its tests with the timeout
+    unittest.main = functools.partial(unittest.TestProgram, testRunner=TimedTestRunner)
+    runpy.run_path(path, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,9 @@ TOKEN_COSTS = {
     "text-embedding-ada-002": {"prompt": 0.0004, "completion": 0.0},
     "chatglm_turbo": {"prompt": 0.0, "completion": 0.00069},  # 32k version, prompt + completion tokens=0.005￥/k-tokens
     "gemini-pro": {"prompt": 0.00025, "completion": 0.0005},
+    "general": {"prompt": 0.0025, "completion": 0.0025},  # spark v1.5, prompt + completion tokens=0.018￥/k-tokens
+    "generalv2": {"prompt": 0.005, "completion": 0.005},  # spark v2, prompt + completion tokens=0.036￥/k-tokens
+    "generalv3": {"prompt": 0.005, "completion": 0.005},  # spark v3, prompt + completion tokens=0.036￥/k-tokens
 }
 
 
@@ -50,6 +53,9 @@ TOKEN_MAX = {
     "text-embedding-ada-002": 8192,
     "chatglm_turbo": 32768,
     "gemini-pro": 32768,
+    "general": 4096,
+    "generalv2": 8192,
+    "generalv3": 8192,
 }
 
 
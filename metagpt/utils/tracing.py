@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : tracing.py
+@Desc    : Nested spans of roles, actions, action nodes, LLM calls and tools, recording wall-clock, queue wait,
+        tokens, cost, retries and parse failures. Spans are appended to a JSONL file as they end; `to_otlp` converts
+        them to the OTLP JSON format of OpenTelemetry, and `summarize` renders the flame tree shown by
+        `metagpt --summarize-trace`.
+
+    from metagpt.utils.tracing import enable_tracing
+    enable_tracing()  # or `metagpt "idea" --trace`
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from metagpt.const import METAGPT_ROOT
+
+TRACES_PATH = METAGPT_ROOT / "logs" / "traces"
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "name",
+        "start_ns",
+        "end_ns",
+        "status",
+        "attributes",
+        "events",
+        "owner",
+    )
+
+    def __init__(self, trace_id: str, parent_id: str, kind: str, name: str, attributes: dict, owner=None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.kind = kind
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = "ok"
+        self.attributes = attributes
+        self.events: List[dict] = []
+        self.owner = owner
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class Tracer:
+    """Process-wide switch and JSONL exporter of the spans."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[Path] = None
+        self.trace_id = ""
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, path: Union[str, Path, None] = None) -> Path:
+        self.stop()
+        self.trace_id = uuid.uuid4().hex
+        if path is None:
+            path = TRACES_PATH / f"{datetime.now():%Y%m%d-%H%M%S}-{self.trace_id[:8]}.jsonl"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.enabled = True
+        return self.path
+
+    def stop(self):
+        self.enabled = False
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+
+tracer = Tracer()
+_current_span: ContextVar[Optional[Span]] = ContextVar("metagpt_current_span", default=None)
+_queue_wait: ContextVar[float] = ContextVar("metagpt_queue_wait", default=0.0)
+
+
+def enable_tracing(path: Union[str, Path, None] = None) -> Path:
+    """Record the spans of the process into `path`, a new file under `logs/traces` by default, and return it."""
+    return tracer.start(path)
+
+
+def disable_tracing():
+    tracer.stop()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(kind: str, name: str, owner=None, **attributes) -> Iterator[Optional[Span]]:
+    """Open a span nested in the current one, yield None when tracing is disabled."""
+    if not tracer.enabled:
+        yield None
+        return
+    parent = _current_span.get()
+    new_span = Span(tracer.trace_id, parent.span_id if parent else "", kind, name, attributes, owner=owner)
+    queue_wait = _queue_wait.get()
+    if queue_wait:
+        new_span.attributes["queue_wait_ms"] = round(queue_wait * 1000, 3)
+        _queue_wait.set(0.0)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except asyncio.CancelledError:
+        new_span.status = "cancelled"
+        raise
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.attributes["error"] = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        new_span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        tracer.export(new_span)
+
+
+def traced(kind: str, name: Union[str, Callable[..., str], None] = None, attributes: Callable[..., dict] = None):
+    """Decorate an async function, or method, to run it in a span.
+
+    :param kind: The kind of the span, such as role, action, node, llm or tool.
+    :param name: The name of the span, or a function of the call arguments returning it, the function name by default.
+    :param attributes: A function of the call arguments returning the attributes of the span.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            owner = args[0] if args else None
+            parent = _current_span.get()
+            if parent is not None and parent.kind == kind and owner is not None and parent.owner is owner:
+                return await func(*args, **kwargs)  # a subclass calling `super()`, already in the span of the object
+            span_name = name(*args, **kwargs) if callable(name) else name or func.__qualname__
+            span_attributes = attributes(*args, **kwargs) if attributes else {}
+            with span(kind, span_name, owner=owner, **span_attributes):
+                return await func(*args, **kwargs)
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    return decorator
+
+
+def set_attributes(**attributes):
+    """Set attributes of the current span."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def add_event(name: str, **attributes):
+    """Add a timestamped event, such as a retry or a parse failure, to the current span."""
+    current = _current_span.get()
+    if current is not None:
+        current.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+
+def record_usage(prompt_tokens: int, completion_tokens: int, cost: float, model: str = ""):
+    """Add the tokens and cost of an LLM call to the current span."""
+    current = _current_span.get()
+    if current is None:
+        return
+    attributes = current.attributes
+    attributes["prompt_tokens"] = attributes.get("prompt_tokens", 0) + prompt_tokens
+    attributes["completion_tokens"] = attributes.get("completion_tokens", 0) + completion_tokens
+    attributes["cost"] = attributes.get("cost", 0) + cost
+    if model:
+        attributes["model"] = model
+
+
+def record_queue_wait(seconds: float):
+    """Remember how long the current task waited for a slot, the next span opened in the task records it."""
+    if tracer.enabled:
+        _queue_wait.set(seconds)
+
+
+def load_spans(path: Union[str, Path]) -> List[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as reader:
+        for line in reader:
+            if line.strip():
+                spans.append(json.loads(line))
+    return spans
+
+
+def latest_trace() -> Optional[Path]:
+    files = sorted(TRACES_PATH.glob("*.jsonl"), key=lambda i: i.stat().st_mtime)
+    return files[-1] if files else None
+
+
+def summarize(spans: List[dict], max_depth: int = 0, min_share: float = 0.0, width: int = 30) -> str:
+    """Render spans as a flame tree: spans of the same kind and name under the same parent path are merged, and
+    each line shows their wall-clock, self time, calls, tokens and cost, including their children.
+
+    :param max_depth: The deepest level shown, all when not positive.
+    :param min_share: Hide the lines taking less than this share of the total wall-clock.
+    :param width: The width of the bars.
+    """
+    by_id = {s["span_id"]: s for s in spans}
+    children: Dict[str, List[dict]] = {}
+    for s in spans:
+        parent_id = s["parent_id"] if s["parent_id"] in by_id else ""
+        children.setdefault(parent_id, []).append(s)
+
+    def node(label: str) -> dict:
+        return {
+            "label": label,
+            "calls": 0,
+            "wall": 0.0,
+            "self": 0.0,
+            "tokens": 0,
+            "cost": 0.0,
+            "errors": 0,
+            "children": {},
+        }
+
+    def add(tree: dict, s: dict) -> tuple:
+        """Merge the span and its descendants into `tree`, return their tokens and cost."""
+        item = tree["children"].setdefault(f"{s['kind']}:{s['name']}", node(f"{s['kind']}:{s['name']}"))
+        duration = max(s["end_ns"] - s["start_ns"], 0) / 1e9
+        attributes = s.get("attributes", {})
+        tokens = attributes.get("prompt_tokens", 0) + attributes.get("completion_tokens", 0)
+        cost = attributes.get("cost", 0.0)
+        busy = 0.0
+        for child in children.get(s["span_id"], []):
+            busy += max(child["end_ns"] - child["start_ns"], 0) / 1e9
+            child_tokens, child_cost = add(item, child)
+            tokens += child_tokens
+            cost += child_cost
+        item["calls"] += 1
+        item["wall"] += duration
+        item["self"] += max(duration - busy, 0.0)  # concurrent children may overlap, then self time is 0
+        item["tokens"] += tokens
+        item["cost"] += cost
+        item["errors"] += s.get("status") == "error"
+        return tokens, cost
+
+    root = node("")
+    for s in children.get("", []):
+        add(root, s)
+    total = sum(i["wall"] for i in root["children"].values()) or 1.0
+
+    lines = [f"{'wall(s)':>9} {'self(s)':>9} {'calls':>6} {'tokens':>9} {'cost($)':>9}  {'':<{width}}  span"]
+
+    def render(tree: dict, depth: int):
+        for item in sorted(tree["children"].values(), key=lambda i: -i["wall"]):
+            if item["wall"] / total < min_share:
+                continue
+            bar = "█" * min(max(1, round(item["wall"] / total * width)), width)
+            errors = f"  ({item['errors']} failed)" if item["errors"] else ""
+            lines.append(
+                f"{item['wall']:>9.2f} {item['self']:>9.2f} {item['calls']:>6} {item['tokens']:>9} "
+                f"{item['cost']:>9.4f}  {bar:<{width}}  {'  ' * depth}{item['label']}{errors}"
+            )
+            if max_depth <= 0 or depth + 1 < max_depth:
+                render(item, depth + 1)
+
+    render(root, 0)
+    return "\n".join(lines)
+
+
+_OTLP_SPAN_KINDS = {"llm": 3, "tool": 3}  # SPAN_KIND_CLIENT, the others are SPAN_KIND_INTERNAL
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def to_otlp(spans: List[dict], service_name: str = "metagpt") -> dict:
+    """Convert spans to an OTLP/JSON `ExportTraceServiceRequest`, which collectors accept on `/v1/traces`."""
+    otlp_spans = []
+    for s in spans:
+        otlp_span = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": f"{s['kind']}:{s['name']}",
+            "kind": _OTLP_SPAN_KINDS.get(s["kind"], 1),
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": _otlp_attributes({"metagpt.kind": s["kind"], **s.get("attributes", {})}),
+            "events": [
+                {"timeUnixNano": str(e["time_ns"]), "name": e["name"], "attributes": _otlp_attributes(e["attributes"])}
+                for e in s.get("events", [])
+            ],
+            "status": {"code": 2 if s.get("status") == "error" else 1},
+        }
+        if s["parent_id"]:
+            otlp_span["parentSpanId"] = s["parent_id"]
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": "metagpt.utils.tracing"}, "spans": otlp_spans}],
+            }
+        ]
+    }
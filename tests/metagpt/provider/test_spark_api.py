@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : test_spark_api.py
+@Desc    : SparkLLM against a local websocket server standing in for the Spark API.
+"""
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from metagpt.config import CONFIG
+from metagpt.provider.spark_api import SparkLLM
+
+
+class SparkStub:
+    """Answer each request with `chunks` frames, the last one with the usage, as the Spark API does."""
+
+    def __init__(self, chunks=("Hello", ", ", "world"), code=0, close_after_answer=False):
+        self.chunks = chunks
+        self.code = code
+        self.close_after_answer = close_after_answer
+        self.connections = 0
+        self.requests = []
+
+    async def handler(self, ws, *args):
+        self.connections += 1
+        async for message in ws:
+            self.requests.append(json.loads(message))
+            if self.code:
+                await ws.send(json.dumps({"header": {"code": self.code, "message": "stub error"}}))
+                continue
+            for index, chunk in enumerate(self.chunks):
+                last = index == len(self.chunks) - 1
+                payload = {"choices": {"status": 2 if last else 1, "text": [{"content": chunk, "role": "assistant"}]}}
+                if last:
+                    payload["usage"] = {"text": {"prompt_tokens": 3, "completion_tokens": len(self.chunks)}}
+                await ws.send(json.dumps({"header": {"code": 0}, "payload": payload}))
+            if self.close_after_answer:
+                await ws.close()
+                return
+
+
+async def _run(stub: SparkStub, calls):
+    async with websockets.serve(stub.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        CONFIG.spark_appid, CONFIG.spark_api_key, CONFIG.spark_api_secret = "app", "key", "secret"
+        CONFIG.domain, CONFIG.spark_url = "generalv2", f"ws://127.0.0.1:{port}/v2.1/chat"
+        llm = SparkLLM()
+        try:
+            return await calls(llm)
+        finally:
+            await llm.close()
+
+
+def test_spark_answer_streamed_and_not():
+    stub = SparkStub()
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def calls(llm):
+        return [
+            await llm.acompletion_text(messages, stream=True),
+            await llm.acompletion_text(messages, stream=False),
+        ]
+
+    assert asyncio.run(_run(stub, calls)) == ["Hello, world", "Hello, world"]
+    assert stub.requests[0]["payload"]["message"]["text"] == messages
+    assert stub.requests[0]["parameter"]["chat"]["domain"] == "generalv2"
+
+
+def test_spark_reuses_connection():
+    stub = SparkStub()
+
+    async def calls(llm):
+        for _ in range(3):
+            await llm.acompletion_text([{"role": "user", "content": "hi"}])
+
+    asyncio.run(_run(stub, calls))
+    assert stub.connections == 1
+    assert len(stub.requests) == 3
+
+
+def test_spark_reconnects_when_server_closes():
+    stub = SparkStub(close_after_answer=True)
+
+    async def calls(llm):
+        return [await llm.acompletion_text([{"role": "user", "content": "hi"}]) for _ in range(2)]
+
+    assert asyncio.run(_run(stub, calls)) == ["Hello, world", "Hello, world"]
+    assert stub.connections == 2
+
+
+def test_spark_concurrent_requests():
+    stub = SparkStub()
+
+    async def calls(llm):
+        return await asyncio.gather(*[llm.acompletion_text([{"role": "user", "content": str(i)}]) for i in range(5)])
+
+    assert asyncio.run(_run(stub, calls)) == ["Hello, world"] * 5
+    assert len(stub.requests) == 5
+
+
+def test_spark_error_code():
+    stub = SparkStub(code=10013)
+
+    async def calls(llm):
+        return await llm._achat_completion([{"role": "user", "content": "hi"}])
+
+    with pytest.raises(RuntimeError, match="10013"):
+        asyncio.run(_run(stub, calls))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : test_s3.py
+@Desc    : S3 against `MemoryS3Client`, standing in for the service.
+"""
+import asyncio
+
+import pytest
+
+from metagpt.utils import s3 as s3_module
+from metagpt.utils.s3 import MIN_PART_SIZE, S3, MemoryS3Client
+
+
+@pytest.fixture
+def memory_s3():
+    client = MemoryS3Client()
+    S3.use_client(client)
+    yield client
+    S3.use_client(None)
+
+
+def test_s3_upload_bytes_in_one_request(memory_s3):
+    s3 = S3()
+    asyncio.run(s3.upload_bytes(bucket="bucket", data=b"hello", object_name="a/b.txt"))
+    assert memory_s3.objects[("bucket", "a/b.txt")] == b"hello"
+    assert asyncio.run(s3.get_object(bucket="bucket", object_name="a/b.txt")) == b"hello"
+
+
+def test_s3_upload_file_in_parts(memory_s3, tmp_path):
+    data = bytes(range(256)) * (MIN_PART_SIZE * 2 // 256 + 100)  # two full parts and a last smaller one
+    source, target = tmp_path / "source.bin", tmp_path / "target.bin"
+    source.write_bytes(data)
+    s3 = S3()
+    s3.part_size = MIN_PART_SIZE
+
+    async def roundtrip():
+        await s3.upload_file(bucket="bucket", local_path=str(source), object_name="big.bin")
+        await s3.download_file(bucket="bucket", object_name="big.bin", local_path=str(target), chunk_size=1 << 20)
+
+    asyncio.run(roundtrip())
+    assert memory_s3.objects[("bucket", "big.bin")] == data
+    assert target.read_bytes() == data
+
+
+def test_s3_presigned_url(memory_s3):
+    s3 = S3()
+    s3.url_expires = 60
+    url = asyncio.run(s3.get_object_url(bucket="bucket", object_name="a b.txt"))
+    assert url == "http://s3.local/bucket/a%20b.txt?X-Amz-Expires=60"
+
+
+def test_s3_cache(memory_s3, monkeypatch):
+    monkeypatch.setattr(s3_module.CONFIG, "S3_BUCKET", "bucket", raising=False)
+    url = asyncio.run(S3().cache("hello", ".txt"))
+    assert url.startswith("http://s3.local/bucket/bucket/")
+    assert list(memory_s3.objects.values()) == [b"hello"]
+
+
+class _ClientContext:
+    """The context of an aioboto3 client, opening `MemoryS3Client`s slowly."""
+
+    opened = 0
+    closed = 0
+
+    async def __aenter__(self):
+        await asyncio.sleep(0.01)
+        _ClientContext.opened += 1
+        return MemoryS3Client()
+
+    async def __aexit__(self, *args):
+        _ClientContext.closed += 1
+
+
+def test_s3_shares_one_client_per_loop(monkeypatch):
+    monkeypatch.setattr(s3_module.aioboto3.Session, "client", lambda self, **kwargs: _ClientContext())
+    _ClientContext.opened = _ClientContext.closed = 0
+
+    async def upload_concurrently():
+        await asyncio.gather(*[S3().upload_bytes("bucket", b"x", f"{i}.txt") for i in range(5)])
+        return _ClientContext.closed
+
+    closed_while_running = asyncio.run(upload_concurrently())
+    assert _ClientContext.opened == 1
+    assert closed_while_running == 0
+    assert _ClientContext.closed == 1  # closed when the loop shut down